@@ -0,0 +1,89 @@
+"""
+Price alert endpoints: sync active alerts, collect triggered ones
+"""
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+import logging
+
+from app.api.dependencies import get_alert_engine
+from app.api.metrics import InstrumentedRoute
+from app.services.alert_engine import AlertEngine
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+# Pydantic models
+class Alert(BaseModel):
+    id: str
+    ticker: Optional[str] = None
+    type: Literal["PRICE_TARGET", "PERCENT_CHANGE", "DROPS_BELOW", "RISES_ABOVE"]
+    targetPrice: Optional[float] = None
+    targetChangePercent: Optional[float] = None
+    active: bool = True
+    triggered: bool = False
+
+
+class AlertsRequest(BaseModel):
+    alerts: List[Alert]
+
+
+class AcknowledgeRequest(BaseModel):
+    ids: List[str]
+
+
+@router.put("/")
+async def upsert_alerts(
+    request: AlertsRequest,
+    engine: AlertEngine = Depends(get_alert_engine)
+):
+    """
+    Create or replace alerts
+
+    Inactive or already triggered alerts are removed from evaluation.
+    Every worker picks up the change immediately.
+    """
+    active = await engine.upsert([alert.model_dump() for alert in request.alerts])
+    return {"received": len(request.alerts), "active": active}
+
+
+@router.delete("/{alert_id}")
+async def delete_alert(
+    alert_id: str,
+    engine: AlertEngine = Depends(get_alert_engine)
+):
+    """Stop evaluating an alert"""
+    await engine.delete([alert_id])
+    return {"id": alert_id, "deleted": True}
+
+
+@router.get("/triggered")
+async def get_triggered_alerts(
+    limit: int = Query(1000, ge=1, le=10000),
+    engine: AlertEngine = Depends(get_alert_engine)
+):
+    """
+    Triggered alerts not yet acknowledged, oldest first
+
+    Each record has id, ticker, price, changePercent and triggeredAt.
+    Acknowledge them once stored (POST /triggered/ack).
+    """
+    return {"alerts": await engine.triggered(limit)}
+
+
+@router.post("/triggered/ack")
+async def acknowledge_triggered_alerts(
+    request: AcknowledgeRequest,
+    engine: AlertEngine = Depends(get_alert_engine)
+):
+    """Forget triggered alerts that the caller has persisted"""
+    return {"acknowledged": await engine.acknowledge(request.ids)}
+
+
+@router.get("/stats")
+async def get_alert_stats(engine: AlertEngine = Depends(get_alert_engine)):
+    """Active alert count and evaluation counters of this worker"""
+    return engine.stats()
@@ -3,14 +3,36 @@ Quantitative calculations endpoints
 """
 
 from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Tuple
+from pydantic import BaseModel, Field
+from typing import Iterator, List, Literal, Optional, Dict, Tuple
 from datetime import datetime, timedelta
+import asyncio
 import logging
 
+import numpy as np
+
+from app.api.dependencies import (
+    get_fundamentals_service,
+    get_fx_service,
+    get_portfolio_service,
+    get_quant_service,
+    get_replay_service,
+    get_risk_service,
+    get_yfinance_service,
+)
+from app.api.metrics import InstrumentedRoute
+from app.api.streaming import StreamFormat, stream_format, streaming_response
+from app.services.fundamentals_service import FundamentalsService
+from app.services.fx_service import FxService
+from app.services.portfolio_service import PortfolioService, align_closes
+from app.services.quant_service import QuantService
+from app.services.replay_service import TRANSACTION_TYPES, ReplayService
+from app.services.risk_service import MC_MAX_PATHS, RiskService, parametric_var
+from app.services.yfinance_service import YFinanceService
+
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 # Pydantic models
@@ -24,11 +46,28 @@ class PositionMetrics(BaseModel):
     dailyChangePercent: float
 
 
+class CashFlow(BaseModel):
+    date: str  # ISO date
+    amount: float  # Negative = money in (buy), positive = money out (sell)
+
+
+class Transaction(BaseModel):
+    ticker: Optional[str] = None
+    type: str  # BUY, SELL, DIVIDEND, FEE, DEPOSIT, WITHDRAWAL
+    date: str  # ISO date or datetime
+    quantity: float = 0
+    price: float = 0
+    fees: float = 0
+
+
 class PortfolioMetricsRequest(BaseModel):
-    positions: List[dict]  # Array of Position objects
+    positions: List[dict]  # Position objects (amounts in their "currency"), optionally with cashFlows
     baseCurrency: str = "EUR"
     benchmark: str = "SPY"
     riskFreeRate: float = 0.03
+    cashFlows: Optional[List[CashFlow]] = None  # Portfolio-level flows
+    transactions: Optional[List[Transaction]] = None  # Enables a real TWR
+    portfolioId: Optional[str] = None  # Enables incremental replay
 
 
 class PortfolioMetricsResponse(BaseModel):
@@ -42,10 +81,75 @@ class PortfolioMetricsResponse(BaseModel):
     beta: Optional[float]
     maxDrawdown: Optional[float]
     var95: Optional[float]
+    twr: Optional[float] = Field(
+        description="Time-weighted return replayed from transactions when they are "
+                    "given; otherwise the 1y return of the current holdings"
+    )
+    irr: Optional[float] = Field(
+        description="Annualized XIRR of the portfolio cash flows; null without flows "
+                    "or when the flows have no IRR (no sign change)"
+    )
+    positionIrr: Optional[Dict[str, Optional[float]]] = Field(
+        None,
+        description="XIRR per ticker with cashFlows; a value is null when that "
+                    "position's flows have no IRR"
+    )
+
+
+class PortfolioHistoryRequest(BaseModel):
+    transactions: List[Transaction]
+    portfolioId: Optional[str] = None  # Enables incremental replay
+
+
+class PortfolioHistoryResponse(BaseModel):
+    dates: List[str]
+    holdings: Dict[str, List[float]]
+    costBasis: List[float]
+    cashFlows: List[float]
+    realizedPnL: List[float]
+    value: List[float]
     twr: Optional[float]
     irr: Optional[float]
 
 
+RollingMetric = Literal["volatility", "sharpe", "beta", "correlation", "drawdown"]
+
+
+class RollingMetricsRequest(BaseModel):
+    tickers: List[str]
+    benchmark: str = "SPY"
+    range: Literal["3mo", "6mo", "1y", "2y", "5y", "10y"] = "1y"
+    windows: List[int] = [30, 90, 252]
+    metrics: List[RollingMetric] = ["volatility", "sharpe", "beta", "correlation", "drawdown"]
+    riskFreeRate: float = 0.03
+
+
+class RiskPosition(BaseModel):
+    ticker: str
+    currentValue: float
+
+
+class RiskRequest(BaseModel):
+    positions: List[RiskPosition]
+    confidence: float = Field(0.95, gt=0.5, lt=1)
+    horizonDays: int = Field(1, ge=1, le=252)
+    range: Literal["6mo", "1y", "2y", "5y"] = "1y"
+    simulations: int = Field(100_000, ge=0, le=MC_MAX_PATHS)  # 0 = parametric only
+    seed: int = 42
+    distribution: Literal["normal", "t"] = "normal"
+    dof: float = Field(5.0, gt=2)  # Student-t degrees of freedom
+
+
+class BreakdownRequest(BaseModel):
+    positions: List[RiskPosition]  # Values in one currency
+
+
+class BulkConvertRequest(BaseModel):
+    amounts: List[float]
+    currencies: List[str]  # Currency of each amount
+    to: str = "EUR"
+
+
 class PositionMetricsRequest(BaseModel):
     ticker: str
     quantity: float
@@ -55,6 +159,19 @@ class PositionMetricsRequest(BaseModel):
     lookbackDays: int = 90
 
 
+class PositionInput(BaseModel):
+    ticker: str
+    quantity: float
+    avgCost: float
+    currentPrice: float
+
+
+class BatchPositionMetricsRequest(BaseModel):
+    positions: List[PositionInput]
+    benchmark: str = "SPY"
+    range: Literal["3mo", "6mo", "1y"] = "3mo"
+
+
 class PositionMetricsResponse(BaseModel):
     ticker: str
     currentValue: float
@@ -70,26 +187,20 @@ class PositionMetricsResponse(BaseModel):
     maxDrawdown: Optional[float]
 
 
-def get_cache_service():
-    """Dependency to get cache service"""
-    from app.services.cache_service import CacheService
-    import redis
-    import os
-
-    redis_client = redis.from_url(
-        os.getenv("REDIS_URL", "redis://localhost:6379"),
-        decode_responses=True
-    )
-    return CacheService(redis_client)
-
-
 @router.post("/portfolio", response_model=PortfolioMetricsResponse)
 async def calculate_portfolio_metrics(
     request: PortfolioMetricsRequest,
-    cache_service = Depends(get_cache_service)
+    yf_service: YFinanceService = Depends(get_yfinance_service),
+    quant_service: QuantService = Depends(get_quant_service),
+    portfolio_service: PortfolioService = Depends(get_portfolio_service),
+    replay_service: ReplayService = Depends(get_replay_service),
+    fx_service: FxService = Depends(get_fx_service)
 ):
     """
-    Calculate portfolio-level metrics
+    Calculate portfolio-level metrics in baseCurrency
+
+    Position amounts are in each position's "currency" (baseCurrency when
+    absent) and are converted with one FX matrix lookup.
 
     Includes:
     - Total value, P&L
@@ -97,23 +208,34 @@ async def calculate_portfolio_metrics(
     - Beta vs benchmark
     - Max drawdown
     - VaR (95%)
-    - TWR and IRR
+    - TWR (replayed from transactions when given) and IRR
     """
-    from app.services.quant_service import QuantService
-    from app.services.yfinance_service import YFinanceService
-
     positions = request.positions
-    quant_service = QuantService()
-    yf_service = YFinanceService(cache_service)
+    base_currency = request.baseCurrency.upper()
+
+    # Rate from each position's currency into the base currency
+    currencies = [str(p.get("currency") or base_currency).upper() for p in positions]
+    fx = np.ones(len(positions))
+    if any(currency != base_currency for currency in currencies):
+        fx = (await fx_service.get_matrix(currencies + [base_currency])).factors(currencies, base_currency)
+        unknown = sorted({c for c, rate in zip(currencies, fx) if not np.isfinite(rate)})
+        if unknown:
+            raise HTTPException(
+                status_code=404,
+                detail=f"FX rate not found for {', '.join(unknown)}/{base_currency}"
+            )
+
+    def column(field: str) -> np.ndarray:
+        return np.array([p.get(field, 0) or 0 for p in positions], dtype=np.float64)
 
     # Basic calculations
-    total_value = sum(p.get("currentValue", 0) for p in positions)
-    total_cost = sum(p.get("costBasis", 0) for p in positions)
+    total_value = float(column("currentValue") @ fx)
+    total_cost = float(column("costBasis") @ fx)
 
     total_pnl = total_value - total_cost
     total_pnl_percent = (total_pnl / total_cost * 100) if total_cost > 0 else 0
 
-    daily_pnl = sum(p.get("dailyChange", 0) * p.get("quantity", 0) for p in positions)
+    daily_pnl = float((column("dailyChange") * column("quantity")) @ fx)
     daily_pnl_percent = (daily_pnl / total_value * 100) if total_value > 0 else 0
 
     # Advanced metrics (require historical data)
@@ -124,35 +246,70 @@ async def calculate_portfolio_metrics(
     var_95 = None
     twr = None
     irr = None
+    position_irr = None
+
+    # IRR: every position plus the portfolio, solved in one batch
+    try:
+        today = datetime.now()
+        with_flows = [i for i, p in enumerate(positions) if p.get("ticker") and p.get("cashFlows")]
+        irr_tickers = [positions[i]["ticker"] for i in with_flows]
+        position_flows = [_parse_cash_flows(positions[i]["cashFlows"]) for i in with_flows]
+
+        # Without explicit portfolio flows, pool the position flows (in base currency)
+        if request.cashFlows:
+            portfolio_flows = _parse_cash_flows(request.cashFlows)
+            portfolio_value = total_value
+        else:
+            portfolio_flows = [
+                (day, amount * fx[i])
+                for i, flows in zip(with_flows, position_flows)
+                for day, amount in flows
+            ]
+            portfolio_value = sum(positions[i].get("currentValue", 0) * fx[i] for i in with_flows)
+
+        # Current value is the final inflow of each set
+        flow_sets = [
+            flows + [(today, positions[i].get("currentValue", 0))]
+            for i, flows in zip(with_flows, position_flows)
+        ]
+        if portfolio_flows:
+            portfolio_flows = portfolio_flows + [(today, portfolio_value)]
+
+        if flow_sets or portfolio_flows:
+            solved = quant_service.calculate_xirr_batch(flow_sets + [portfolio_flows])
+            position_irr = dict(zip(irr_tickers, solved[:-1]))
+            irr = solved[-1] if portfolio_flows else None
+    except Exception as e:
+        logger.warning(f"Could not calculate IRR: {e}")
 
     try:
-        # Get historical data for the portfolio
-        tickers = [p.get("ticker") for p in positions if p.get("ticker")]
-        if not tickers:
+        # Current holdings (a ticker may appear in several positions)
+        holdings: Dict[str, float] = {}
+        for p in positions:
+            if p.get("ticker"):
+                holdings[p["ticker"]] = holdings.get(p["ticker"], 0) + p.get("quantity", 0)
+        if not holdings:
             raise ValueError("No valid tickers in positions")
 
-        # Fetch historical data for portfolio (1 year)
-        portfolio_history = yf_service.get_history(
-            request.benchmark,
+        # Weighted value series of the holdings (1 year)
+        portfolio_series = await portfolio_service.get_value_series(
+            holdings,
             range="1y",
-            interval="1d"
+            currency=base_currency
         )
 
-        benchmark_history = yf_service.get_history(
+        benchmark_history = await yf_service.get_history_frame(
             request.benchmark,
             range="1y",
             interval="1d"
         )
 
-        if portfolio_history and benchmark_history:
+        if portfolio_series and len(portfolio_series):
             # Calculate returns
-            portfolio_prices = [d["close"] for d in portfolio_history["data"]]
-            benchmark_prices = [d["close"] for d in benchmark_history["data"]]
+            portfolio_values = portfolio_series.values
+            portfolio_returns = quant_service.calculate_returns(portfolio_values)
 
-            portfolio_returns = quant_service.calculate_returns(portfolio_prices)
-            benchmark_returns = quant_service.calculate_returns(benchmark_prices)
-
-            if portfolio_returns:
+            if len(portfolio_returns):
                 # Sharpe Ratio
                 sharpe = quant_service.calculate_sharpe_ratio(
                     portfolio_returns,
@@ -166,7 +323,7 @@ async def calculate_portfolio_metrics(
                 )
 
                 # Max Drawdown
-                max_dd = quant_service.calculate_max_drawdown(portfolio_prices)
+                max_dd = quant_service.calculate_max_drawdown(portfolio_values)
 
                 # VaR (95%)
                 var_95 = quant_service.calculate_var(
@@ -175,20 +332,39 @@ async def calculate_portfolio_metrics(
                     0.95
                 )
 
-                # Beta
-                if len(portfolio_returns) == len(benchmark_returns):
-                    beta = quant_service.calculate_beta(
-                        portfolio_returns,
-                        benchmark_returns
+                # Beta (on the days both series have)
+                if benchmark_history:
+                    _, portfolio_idx, benchmark_idx = np.intersect1d(
+                        portfolio_series.days,
+                        benchmark_history.session_days(),
+                        return_indices=True
                     )
+                    if len(portfolio_idx) > 2:
+                        beta = quant_service.calculate_beta(
+                            quant_service.calculate_returns(portfolio_values[portfolio_idx]),
+                            quant_service.calculate_returns(benchmark_history.close[benchmark_idx])
+                        )
 
-            # TWR (using portfolio value series)
-            twr = quant_service.calculate_twr(portfolio_prices, {})
+            # Without transactions: return of the current holdings
+            if not request.transactions:
+                twr = quant_service.calculate_twr(portfolio_values, {})
 
     except Exception as e:
         logger.warning(f"Could not calculate advanced metrics: {e}")
         # Advanced metrics remain None if calculation fails
 
+    # TWR from the replayed value series and external cash flows
+    if request.transactions:
+        try:
+            history = await replay_service.replay(
+                [t.model_dump() for t in request.transactions],
+                portfolio_id=request.portfolioId
+            )
+            if history is not None:
+                twr = quant_service.calculate_twr(history.value, history.cash_flows)
+        except Exception as e:
+            logger.warning(f"Could not replay transactions for TWR: {e}")
+
     return PortfolioMetricsResponse(
         totalValue=total_value,
         dailyPnL=daily_pnl,
@@ -202,14 +378,57 @@ async def calculate_portfolio_metrics(
         var95=var_95,
         twr=twr,
         irr=irr,
+        positionIrr=position_irr,
+    )
+
+
+def _parse_cash_flows(flows: List) -> List[Tuple[datetime, float]]:
+    """(date, amount) tuples from CashFlow models or plain dicts"""
+    result = []
+    for flow in flows:
+        if isinstance(flow, CashFlow):
+            flow = flow.model_dump()
+        result.append((datetime.fromisoformat(str(flow["date"])[:10]), float(flow["amount"])))
+    return result
+
+
+@router.post("/portfolio/history", response_model=PortfolioHistoryResponse)
+async def calculate_portfolio_history(
+    request: PortfolioHistoryRequest,
+    replay_service: ReplayService = Depends(get_replay_service),
+    quant_service: QuantService = Depends(get_quant_service)
+):
+    """
+    Replay a portfolio's transactions into daily history
+
+    Includes:
+    - Holdings per ticker, cost basis (average cost), realized P&L
+    - External cash flows and market value
+    - TWR and IRR from the replayed cash flows
+    """
+    unknown = {t.type for t in request.transactions} - set(TRANSACTION_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown transaction types: {sorted(unknown)}")
+
+    history = await replay_service.replay(
+        [t.model_dump() for t in request.transactions],
+        portfolio_id=request.portfolioId
     )
+    if history is None:
+        raise HTTPException(status_code=400, detail="No transactions")
+
+    twr = quant_service.calculate_twr(history.value, history.cash_flows)
+    irr = quant_service.calculate_xirr(history.xirr_flows())
+
+    return PortfolioHistoryResponse(**history.to_dict(), twr=twr, irr=irr)
 
 
 @router.post("/position/{ticker}", response_model=PositionMetricsResponse)
 async def calculate_position_metrics(
     ticker: str,
     request: PositionMetricsRequest,
-    cache_service = Depends(get_cache_service)
+    yf_service: YFinanceService = Depends(get_yfinance_service),
+    quant_service: QuantService = Depends(get_quant_service)
 ):
     """
     Calculate position-level metrics
@@ -221,12 +440,6 @@ async def calculate_position_metrics(
     - VaR
     - Max Drawdown
     """
-    from app.services.quant_service import QuantService
-    from app.services.yfinance_service import YFinanceService
-
-    quant_service = QuantService()
-    yf_service = YFinanceService(cache_service)
-
     # Basic position metrics
     current_value = request.quantity * request.currentPrice
     cost_basis = request.quantity * request.avgCost
@@ -234,7 +447,7 @@ async def calculate_position_metrics(
     unrealized_pnl_percent = (unrealized_pnl / cost_basis * 100) if cost_basis > 0 else 0
 
     # Get historical quote for daily change
-    quote = yf_service.get_quote(ticker)
+    quote = await yf_service.get_quote(ticker)
     daily_change = quote.get("change", 0) if quote else 0
     daily_change_percent = quote.get("changePercent", 0) if quote else 0
 
@@ -247,13 +460,13 @@ async def calculate_position_metrics(
 
     try:
         # Get historical data
-        history_90d = yf_service.get_history(ticker, range="3mo", interval="1d")
+        history_90d = await yf_service.get_history_frame(ticker, range="3mo", interval="1d")
 
-        if history_90d and len(history_90d["data"]) >= 30:
-            prices = [d["close"] for d in history_90d["data"]]
+        if history_90d and len(history_90d) >= 30:
+            prices = history_90d.close
             returns = quant_service.calculate_returns(prices)
 
-            if returns:
+            if len(returns):
                 # Volatility 90d
                 volatility_90d = quant_service.calculate_volatility(returns, annualize=True)
 
@@ -269,9 +482,9 @@ async def calculate_position_metrics(
                 var_95 = quant_service.calculate_var(returns, current_value, 0.95)
 
                 # Beta vs benchmark
-                benchmark_history = yf_service.get_history(request.benchmark, range="3mo", interval="1d")
-                if benchmark_history and len(benchmark_history["data"]) >= len(returns):
-                    benchmark_prices = [d["close"] for d in benchmark_history["data"][-len(returns):]]
+                benchmark_history = await yf_service.get_history_frame(request.benchmark, range="3mo", interval="1d")
+                if benchmark_history and len(benchmark_history) >= len(prices):
+                    benchmark_prices = benchmark_history.close[-len(prices):]
                     benchmark_returns = quant_service.calculate_returns(benchmark_prices)
 
                     if len(returns) == len(benchmark_returns):
@@ -296,22 +509,297 @@ async def calculate_position_metrics(
     )
 
 
+@router.post("/positions")
+async def calculate_positions_metrics(
+    request: BatchPositionMetricsRequest,
+    yf_service: YFinanceService = Depends(get_yfinance_service),
+    quant_service: QuantService = Depends(get_quant_service),
+    format: StreamFormat = Depends(stream_format)
+):
+    """
+    Calculate position-level metrics for every position at once
+
+    Batch form of POST /position/{ticker}: each distinct ticker and the
+    benchmark are fetched once (one quote batch, one history MGET), and
+    every metric is computed per column of an aligned price matrix.
+
+    Returns:
+        List of PositionMetricsResponse objects in request order, or, with
+        ?stream=ndjson|sse, a stream of one "position" event per position
+    """
+    positions = request.positions
+    tickers = list(dict.fromkeys(p.ticker for p in positions))
+
+    quotes, frames = await asyncio.gather(
+        yf_service.get_quotes_batch(tickers),
+        yf_service.get_history_frames(
+            list(dict.fromkeys(tickers + [request.benchmark])),
+            range=request.range,
+            interval="1d"
+        ),
+    )
+
+    quantity = np.array([p.quantity for p in positions], dtype=np.float64)
+    current_value = quantity * np.array([p.currentPrice for p in positions], dtype=np.float64)
+    cost_basis = quantity * np.array([p.avgCost for p in positions], dtype=np.float64)
+    unrealized_pnl = current_value - cost_basis
+    unrealized_pnl_percent = np.divide(
+        unrealized_pnl * 100, cost_basis, out=np.zeros_like(cost_basis), where=cost_basis > 0
+    )
+
+    # Per-ticker metrics over the aligned matrix (NaN = not available)
+    available = [t for t in tickers if frames.get(t) is not None and len(frames[t]) >= 30]
+    n = len(available)
+    volatility_30d = volatility_90d = beta = unit_var = max_dd = np.full(n, np.nan)
+    if available:
+        benchmark = frames.get(request.benchmark)
+        has_benchmark = benchmark is not None and len(benchmark) > 1
+        columns = available + ([request.benchmark] if has_benchmark else [])
+        days, closes = align_closes(frames, columns, trim=False)
+
+        # Only returns into a ticker's own sessions: forward-filled days
+        # (another exchange's sessions) would add zero returns
+        traded = np.column_stack([np.isin(days, frames[t].session_days()) for t in columns])
+        returns = np.where(traded[1:], quant_service.calculate_returns(closes), np.nan)
+        asset_returns = returns[:, :n]
+        observed = np.isfinite(asset_returns).sum(axis=0)
+
+        # 30d: the last 30 returns of each ticker, as POST /position does
+        finite = np.isfinite(asset_returns)
+        recent = finite & (np.cumsum(finite[::-1], axis=0)[::-1] <= 30)
+        returns_30d = np.where(recent, asset_returns, np.nan)
+
+        volatility_90d = quant_service.calculate_volatility(asset_returns)
+        volatility_30d = np.where(
+            np.isfinite(returns_30d).sum(axis=0) >= 30,
+            quant_service.calculate_volatility(returns_30d),
+            np.nan
+        )
+        max_dd = quant_service.calculate_max_drawdown(closes[:, :n])
+        unit_var = quant_service.calculate_var(asset_returns, 1.0, 0.95)
+        if has_benchmark:
+            beta = quant_service.calculate_beta(asset_returns, returns[:, -1])
+
+        enough = observed > 0
+        volatility_90d, max_dd, unit_var = (np.where(enough, column, np.nan) for column in (volatility_90d, max_dd, unit_var))
+
+    # Gather ticker columns onto positions (index n = not available)
+    column_of = {ticker: i for i, ticker in enumerate(available)}
+    index = np.array([column_of.get(p.ticker, n) for p in positions], dtype=np.intp)
+
+    def per_position(values: np.ndarray) -> List[Optional[float]]:
+        return _nan_to_none(np.append(values, np.nan)[index]).tolist()
+
+    daily_change, daily_change_percent = (
+        [(quotes.get(p.ticker) or {}).get(field, 0) for p in positions]
+        for field in ("change", "changePercent")
+    )
+    columns = {
+        "currentValue": current_value.tolist(),
+        "costBasis": cost_basis.tolist(),
+        "unrealizedPnL": unrealized_pnl.tolist(),
+        "unrealizedPnLPercent": unrealized_pnl_percent.tolist(),
+        "dailyChange": daily_change,
+        "dailyChangePercent": daily_change_percent,
+        "volatility30d": per_position(volatility_30d),
+        "volatility90d": per_position(volatility_90d),
+        "beta": per_position(beta),
+        "var95": _nan_to_none(np.append(unit_var, np.nan)[index] * current_value).tolist(),
+        "maxDrawdown": per_position(max_dd),
+    }
+
+    def rows() -> Iterator[Dict]:
+        for i, position in enumerate(positions):
+            row = {"ticker": position.ticker}
+            row.update((name, values[i]) for name, values in columns.items())
+            yield row
+
+    if format == "json":
+        return list(rows())
+    return streaming_response((("position", row) for row in rows()), format)
+
+
+@router.post("/rolling")
+async def calculate_rolling_metrics(
+    request: RollingMetricsRequest,
+    yf_service: YFinanceService = Depends(get_yfinance_service),
+    quant_service: QuantService = Depends(get_quant_service)
+):
+    """
+    Calculate rolling-window metric series for many tickers
+
+    Every metric is computed for all tickers at once over an aligned
+    (days x tickers) matrix with O(n) window kernels.
+
+    Returns:
+        {"dates", "series": {ticker: {metric: {window: [...]}}}, "missing"}
+        with null where a window is incomplete
+    """
+    if any(window < 2 for window in request.windows):
+        raise HTTPException(status_code=400, detail="Windows must be at least 2 observations")
+
+    tickers = list(dict.fromkeys(request.tickers))
+    frames = await yf_service.get_history_frames(
+        list(dict.fromkeys(tickers + [request.benchmark])),
+        range=request.range,
+        interval="1d"
+    )
+    available = [t for t in tickers if frames.get(t) is not None and len(frames[t]) > 1]
+    if not available:
+        raise HTTPException(status_code=404, detail="Historical data not found for any ticker")
+
+    benchmark = frames.get(request.benchmark)
+    has_benchmark = benchmark is not None and len(benchmark) > 1
+    columns = available + ([request.benchmark] if has_benchmark else [])
+    days, closes = align_closes(frames, columns, trim=False)
+
+    returns = quant_service.calculate_returns(closes)
+    prices = closes[1:, :len(available)]
+    asset_returns = returns[:, :len(available)]
+    benchmark_returns = returns[:, -1] if has_benchmark else None
+
+    windows = sorted(set(request.windows))
+    results: Dict[str, Dict[int, np.ndarray]] = {}
+    for metric in dict.fromkeys(request.metrics):
+        if metric == "volatility":
+            by_window = quant_service.calculate_rolling_volatility(asset_returns, windows)
+        elif metric == "sharpe":
+            by_window = quant_service.calculate_rolling_sharpe(asset_returns, windows, request.riskFreeRate)
+        elif metric == "drawdown":
+            by_window = quant_service.calculate_rolling_drawdown(prices, windows)
+        elif benchmark_returns is None:
+            continue
+        elif metric == "beta":
+            by_window = quant_service.calculate_rolling_beta(asset_returns, benchmark_returns, windows)
+        else:
+            by_window = quant_service.calculate_rolling_correlation(asset_returns, benchmark_returns, windows)
+        results[metric] = {window: _nan_to_none(values) for window, values in by_window.items()}
+
+    series = {
+        ticker: {
+            metric: {str(window): values[:, i].tolist() for window, values in by_window.items()}
+            for metric, by_window in results.items()
+        }
+        for i, ticker in enumerate(available)
+    }
+
+    return {
+        "dates": np.datetime_as_string(days[1:].astype("datetime64[D]")).tolist(),
+        "benchmark": request.benchmark if has_benchmark else None,
+        "series": series,
+        "missing": [t for t in tickers if t not in available],
+    }
+
+
+@router.post("/risk")
+async def calculate_risk(
+    request: RiskRequest,
+    risk_service: RiskService = Depends(get_risk_service)
+):
+    """
+    Calculate portfolio Value at Risk and Expected Shortfall
+
+    Uses a Ledoit-Wolf shrinkage covariance of daily log returns (cached
+    per ticker universe and day). Parametric VaR/CVaR come with marginal
+    and component VaR per position; Monte Carlo VaR/CVaR revalue the
+    portfolio on simulated normal or Student-t paths (seeded, so repeated
+    requests give the same numbers).
+
+    Returns:
+        Losses as positive amounts in the positions' currency
+    """
+    values_by_ticker: Dict[str, float] = {}
+    for position in request.positions:
+        values_by_ticker[position.ticker] = values_by_ticker.get(position.ticker, 0.0) + position.currentValue
+    if not values_by_ticker:
+        raise HTTPException(status_code=400, detail="No positions")
+
+    estimate = await risk_service.get_covariance(list(values_by_ticker), range=request.range)
+    if estimate is None:
+        raise HTTPException(status_code=404, detail="Historical data not found for any ticker")
+
+    tickers = [t for t in values_by_ticker if t in estimate.tickers]
+    values = np.array([values_by_ticker[t] for t in tickers])
+    mean, cov = estimate.subset(tickers)
+
+    parametric = parametric_var(values, mean, cov, request.confidence, request.horizonDays)
+
+    monte_carlo = None
+    if request.simulations > 0:
+        monte_carlo = await risk_service.simulate(
+            values, mean, cov,
+            confidence=request.confidence,
+            horizon_days=request.horizonDays,
+            paths=request.simulations,
+            seed=request.seed,
+            dof=request.dof if request.distribution == "t" else None
+        )
+
+    return {
+        "totalValue": float(values.sum()),
+        "confidence": request.confidence,
+        "horizonDays": request.horizonDays,
+        "parametric": {
+            "var": parametric["var"],
+            "cvar": parametric["cvar"],
+            "volatility": parametric["volatility"],
+        },
+        "monteCarlo": monte_carlo,
+        "positions": {
+            ticker: {
+                "value": values_by_ticker[ticker],
+                "marginalVar": float(parametric["marginal"][i]),
+                "componentVar": float(parametric["component"][i]),
+            }
+            for i, ticker in enumerate(tickers)
+        },
+        "covariance": {
+            "observations": estimate.observations,
+            "shrinkage": estimate.shrinkage,
+            "asOf": str(np.datetime64(estimate.as_of, "D")),
+        },
+        "missing": [t for t in values_by_ticker if t not in estimate.tickers],
+    }
+
+
+@router.post("/breakdown")
+async def calculate_breakdown(
+    request: BreakdownRequest,
+    fundamentals: FundamentalsService = Depends(get_fundamentals_service)
+):
+    """
+    Sector and industry breakdown of position values
+
+    Classifications come from the in-memory sector index; only tickers
+    it has not seen yet are looked up (from the fundamentals cache first).
+    """
+    values: Dict[str, float] = {}
+    for position in request.positions:
+        values[position.ticker] = values.get(position.ticker, 0) + position.currentValue
+
+    return await fundamentals.breakdown(values)
+
+
+def _nan_to_none(values: np.ndarray) -> np.ndarray:
+    """Object array with None in place of NaN (JSON null)"""
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result
+
+
 @router.post("/convert")
 async def convert_currency(
     amount: float,
     from_currency: str,
     to_currency: str,
-    cache_service
+    fx_service: FxService = Depends(get_fx_service)
 ):
     """
     Convert amount between currencies using FX rates
 
-    Uses yfinance FX pairs (EURUSD=X, etc.)
+    Cross rates are triangulated through USD (USDEUR=X, USDJPY=X, etc.)
     """
-    from app.services.yfinance_service import YFinanceService
-
-    yf_service = YFinanceService(cache_service)
-    rate = yf_service.get_fx_rate(from_currency, to_currency)
+    rate = await fx_service.get_rate(from_currency, to_currency)
 
     if rate is None:
         raise HTTPException(
@@ -326,3 +814,78 @@ async def convert_currency(
         "rate": rate,
         "result": amount * rate
     }
+
+
+@router.post("/convert/batch")
+async def convert_currency_batch(
+    request: BulkConvertRequest,
+    fx_service: FxService = Depends(get_fx_service)
+):
+    """
+    Convert many amounts, each in its own currency, into one currency
+
+    Every distinct currency costs one cached USD rate, whatever the
+    number of amounts.
+
+    Returns:
+        results in request order (null where the rate is unknown), the
+        rate used per currency and the currencies without a rate
+    """
+    if len(request.amounts) != len(request.currencies):
+        raise HTTPException(status_code=400, detail="amounts and currencies must have the same length")
+
+    to = request.to.upper()
+    currencies = [c.upper() for c in request.currencies]
+    matrix = await fx_service.get_matrix(currencies + [to])
+    results = matrix.convert(np.asarray(request.amounts, dtype=np.float64), currencies, to)
+
+    distinct = list(dict.fromkeys(currencies))
+    return {
+        "to": to,
+        "results": _nan_to_none(results).tolist(),
+        "rates": {currency: matrix.rate(currency, to) for currency in distinct},
+        "missing": [c for c in matrix.missing if c in distinct or c == to],
+    }
+
+
+@router.get("/fx/matrix")
+async def get_fx_matrix(
+    currencies: str,
+    fx_service: FxService = Depends(get_fx_service)
+):
+    """
+    Cross rates between currencies (comma-separated ISO codes)
+
+    rates[i][j] is the amount of currencies[j] per 1 currencies[i].
+    """
+    codes = [c.strip() for c in currencies.split(",") if c.strip()]
+    if not codes:
+        raise HTTPException(status_code=400, detail="No currencies given")
+    return (await fx_service.get_matrix(codes)).to_dict()
+
+
+@router.get("/fx/history")
+async def get_fx_history(
+    currencies: str,
+    base: str = "EUR",
+    range: Literal["1mo", "3mo", "6mo", "1y", "2y", "5y", "10y"] = "1y",
+    fx_service: FxService = Depends(get_fx_service)
+):
+    """
+    Daily rates of currencies (comma-separated) per 1 base over a range
+
+    Rates are carried forward over days without a bar, on the same
+    calendar-day grid as price history.
+    """
+    codes = [c.strip().upper() for c in currencies.split(",") if c.strip()]
+    if not codes:
+        raise HTTPException(status_code=400, detail="No currencies given")
+
+    base = base.upper()
+    history = await fx_service.get_history(codes + [base], range=range)
+    if not len(history):
+        raise HTTPException(status_code=404, detail="No FX history found")
+
+    data = history.to_dict(base)
+    data["rates"] = {code: data["rates"][code] for code in dict.fromkeys(codes)}
+    return data
@@ -0,0 +1,82 @@
+"""
+Shared FastAPI dependencies
+
+Services live on the process-wide ServiceContainer created in the app
+lifespan; these dependencies just hand out the shared instances.
+"""
+
+from fastapi import Request
+from starlette.requests import HTTPConnection
+
+from app.services.alert_engine import AlertEngine
+from app.services.cache_service import CacheService
+from app.services.container import ServiceContainer
+from app.services.fundamentals_service import FundamentalsService
+from app.services.fx_service import FxService
+from app.services.portfolio_service import PortfolioService
+from app.services.quant_service import QuantService
+from app.services.quote_feed import QuoteFeed
+from app.services.replay_service import ReplayService
+from app.services.risk_service import RiskService
+from app.services.snapshot_store import SnapshotStore
+from app.services.yfinance_service import YFinanceService
+
+
+def get_services(request: HTTPConnection) -> ServiceContainer:
+    """Dependency to get the service container (HTTP or WebSocket)"""
+    return request.app.state.services
+
+
+def get_cache_service(request: Request) -> CacheService:
+    """Dependency to get cache service"""
+    return get_services(request).cache
+
+
+def get_yfinance_service(request: Request) -> YFinanceService:
+    """Dependency to get market data service"""
+    return get_services(request).yfinance
+
+
+def get_quant_service(request: Request) -> QuantService:
+    """Dependency to get quant service"""
+    return get_services(request).quant
+
+
+def get_fx_service(request: Request) -> FxService:
+    """Dependency to get FX rate service"""
+    return get_services(request).fx
+
+
+def get_portfolio_service(request: Request) -> PortfolioService:
+    """Dependency to get portfolio series service"""
+    return get_services(request).portfolio
+
+
+def get_replay_service(request: Request) -> ReplayService:
+    """Dependency to get transaction replay service"""
+    return get_services(request).replay
+
+
+def get_risk_service(request: Request) -> RiskService:
+    """Dependency to get risk service"""
+    return get_services(request).risk
+
+
+def get_snapshot_store(request: Request) -> SnapshotStore:
+    """Dependency to get portfolio snapshot store"""
+    return get_services(request).snapshots
+
+
+def get_quote_feed(connection: HTTPConnection) -> QuoteFeed:
+    """Dependency to get the live quote feed (HTTP or WebSocket)"""
+    return get_services(connection).quote_feed
+
+
+def get_alert_engine(request: Request) -> AlertEngine:
+    """Dependency to get the alert engine"""
+    return get_services(request).alerts
+
+
+def get_fundamentals_service(request: Request) -> FundamentalsService:
+    """Dependency to get fundamentals service"""
+    return get_services(request).fundamentals
@@ -2,17 +2,20 @@
 Market data endpoints: historical data
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import Literal
+from typing import Iterator, List, Literal, Tuple
 import logging
 
+from app.services.history_frame import HistoryFrame
 from app.services.yfinance_service import YFinanceService
-from app.services.cache_service import CacheService
+from app.api.dependencies import get_yfinance_service
+from app.api.metrics import InstrumentedRoute
+from app.api.streaming import StreamFormat, stream_format, streaming_response
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 # Pydantic models
@@ -22,33 +25,86 @@ class HistoryRequest(BaseModel):
     interval: Literal["1m", "5m", "1h", "1d"] = "1d"
 
 
+class BatchHistoryRequest(BaseModel):
+    tickers: List[str]
+    range: Literal["1d", "5d", "1mo", "6mo", "1y", "5y"] = "1mo"
+    interval: Literal["1m", "5m", "1h", "1d"] = "1d"
+
+
+# Bars per streamed chunk
+STREAM_CHUNK_ROWS = 1000
+
+
+def _frame_events(frame: HistoryFrame) -> Iterator[Tuple[str, object]]:
+    """A "meta" event, then "bars" events of at most STREAM_CHUNK_ROWS rows"""
+    yield "meta", {"ticker": frame.ticker, "count": len(frame)}
+    for rows in frame.iter_rows(STREAM_CHUNK_ROWS):
+        yield "bars", rows
+
+
 @router.post("/")
 async def get_history(
     request: HistoryRequest,
-    cache_service: CacheService
+    yf_service: YFinanceService = Depends(get_yfinance_service),
+    format: StreamFormat = Depends(stream_format)
 ):
     """
     Get historical OHLCV data for a ticker
 
-    Caches data with TTL based on range:
-    - 1d: 5 min
-    - 5d: 15 min
-    - 1mo: 30 min
-    - 6mo: 1 hour
-    - 1y: 2 hours
-    - 5y: 4 hours
+    Every range is served from one cached bar series per ticker and
+    interval: only bars newer than the last stored one are fetched, and a
+    longer range than the series covers triggers a one-off backfill.
+
+    With ?stream=ndjson|sse (or a matching Accept header) the bars are
+    streamed in chunks rendered from the cached columns as they are sent.
     """
-    yf_service = YFinanceService(cache_service)
-    data = yf_service.get_history(
+    frame = await yf_service.get_history_frame(
         request.ticker,
         range=request.range,
         interval=request.interval
     )
 
-    if not data:
+    if frame is None:
         raise HTTPException(
             status_code=404,
             detail=f"Historical data not found for {request.ticker}"
         )
 
-    return data
+    if format != "json":
+        return streaming_response(_frame_events(frame), format)
+    return frame.to_dict()
+
+
+@router.post("/batch")
+async def get_history_batch(
+    request: BatchHistoryRequest,
+    yf_service: YFinanceService = Depends(get_yfinance_service),
+    format: StreamFormat = Depends(stream_format)
+):
+    """
+    Get historical OHLCV data for several tickers
+
+    Cached series are read with one MGET. Streaming modes send each
+    ticker's "meta" and "bars" events in turn, then a "missing" event
+    listing tickers without data.
+
+    Returns:
+        {"history": {ticker: {"ticker", "data"}}, "missing": [...]}
+    """
+    tickers = list(dict.fromkeys(request.tickers))
+    frames = await yf_service.get_history_frames(tickers, range=request.range, interval=request.interval)
+    missing = [ticker for ticker in tickers if frames.get(ticker) is None]
+
+    if format == "json":
+        return {
+            "history": {ticker: frame.to_dict() for ticker, frame in frames.items() if frame is not None},
+            "missing": missing,
+        }
+
+    def events() -> Iterator[Tuple[str, object]]:
+        for ticker in tickers:
+            if frames.get(ticker) is not None:
+                yield from _frame_events(frames[ticker])
+        yield "missing", missing
+
+    return streaming_response(events(), format)
@@ -0,0 +1,101 @@
+"""
+Prometheus endpoint and request instrumentation
+"""
+
+import functools
+import time
+from typing import Callable
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+from app.services import metrics
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    Route that records when its endpoint runs
+
+    Everything after the endpoint returns (response model validation,
+    JSON rendering) is the request's "serialize" stage.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _timed(endpoint), **kwargs)
+
+
+def _timed(endpoint: Callable) -> Callable:
+    # include_router may rebuild routes from an already timed endpoint
+    endpoint = getattr(endpoint, "__untimed__", endpoint)
+
+    # functools.wraps keeps the signature FastAPI reads parameters from
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        timings = metrics.current_timings()
+        if timings is None:
+            return await endpoint(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings.endpoint = (started, time.perf_counter())
+
+    timed.__untimed__ = endpoint
+    return timed
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency and stage timings of HTTP requests
+
+    The request is timed until its last body byte, so streamed responses
+    count in full. Routes are labelled by path template; requests that
+    match no instrumented route are labelled "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings, token = metrics.begin_request()
+        status = 500
+        started = time.perf_counter()
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings.response_started = time.perf_counter()
+            await send(message)
+
+        try:
+            with metrics.span(f"{scope['method']} {scope['path']}", {"http.method": scope["method"]}):
+                await self.app(scope, receive, send_timed)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe_request(scope["method"], _route_path(scope), status, elapsed, timings)
+            metrics.end_request(token)
+
+
+def _route_path(scope) -> str:
+    """Path template of the matched route, including the router prefix"""
+    # Routers included lazily keep their own (unprefixed) route objects;
+    # FastAPI records the effective, prefixed route in the scope
+    effective = scope.get("fastapi", {}).get("effective_route_context")
+    path = getattr(effective, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Process metrics in the Prometheus text format"""
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
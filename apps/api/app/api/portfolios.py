@@ -0,0 +1,123 @@
+"""
+Portfolio snapshot endpoints: end-of-day pipeline and history queries
+"""
+
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+from datetime import date
+import logging
+
+import numpy as np
+
+from app.api.calculations import Transaction
+from app.api.dependencies import get_replay_service, get_snapshot_store
+from app.api.metrics import InstrumentedRoute
+from app.services.replay_service import ReplayService
+from app.services.snapshot_store import SnapshotStore, build_snapshots
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+# Pydantic models
+class SnapshotRequest(BaseModel):
+    transactions: List[Transaction]
+    rebuild: bool = False  # Rewrite stored history (after a backdated trade)
+
+
+def _to_day(value: Optional[date]) -> Optional[int]:
+    return int(np.datetime64(value, "D").astype(np.int64)) if value else None
+
+
+def _to_date(day: int) -> str:
+    return str(np.datetime64(day, "D"))
+
+
+@router.post("/{portfolio_id}/snapshots")
+async def record_snapshots(
+    portfolio_id: str,
+    request: SnapshotRequest,
+    replay_service: ReplayService = Depends(get_replay_service),
+    snapshot_store: SnapshotStore = Depends(get_snapshot_store)
+):
+    """
+    Record end-of-day snapshots of a portfolio
+
+    Replays the transactions (incrementally, from the portfolio's
+    checkpoint) and appends the days after the last stored snapshot;
+    days from the earliest new transaction on are rewritten. Meant to run
+    once per day after the close, and after new trades.
+    """
+    history = await replay_service.replay(
+        [t.model_dump() for t in request.transactions],
+        portfolio_id=portfolio_id
+    )
+    if history is None:
+        raise HTTPException(status_code=400, detail="No transactions")
+
+    written = await snapshot_store.append(
+        portfolio_id,
+        build_snapshots(history),
+        changed_from=history.changed_from,
+        rebuild=request.rebuild
+    )
+
+    return {
+        "portfolioId": portfolio_id,
+        "written": written,
+        "lastDate": _to_date(int(history.days[-1])),
+    }
+
+
+@router.get("/{portfolio_id}/snapshots")
+async def get_snapshots(
+    portfolio_id: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: Literal["day", "week", "month"] = "day",
+    snapshot_store: SnapshotStore = Depends(get_snapshot_store)
+):
+    """
+    Get stored snapshots of a portfolio over a date range
+
+    day returns daily rows (value, P&L, weights, risk metrics); week and
+    month return the pre-aggregated rollups (open/high/low/close value,
+    cash flow, P&L and time-weighted return of the period).
+    """
+    rows = await snapshot_store.query(portfolio_id, _to_day(start), _to_day(end), granularity)
+
+    if granularity == "day":
+        data = [
+            {
+                "date": _to_date(row["day"]),
+                "value": row["value"],
+                "costBasis": row["cost_basis"],
+                "pnl": row["pnl"],
+                "dailyPnL": row["daily_pnl"],
+                "cashFlow": row["cash_flow"],
+                "twrIndex": row["twr_index"],
+                "volatility": row["volatility"],
+                "drawdown": row["drawdown"],
+                "weights": row["weights"],
+            }
+            for row in rows
+        ]
+    else:
+        data = [
+            {
+                "date": _to_date(row["start_day"]),
+                "endDate": _to_date(row["end_day"]),
+                "open": row["open"],
+                "high": row["high"],
+                "low": row["low"],
+                "value": row["close"],
+                "cashFlow": row["cash_flow"],
+                "pnl": row["pnl"],
+                "return": row["period_return"],
+            }
+            for row in rows
+        ]
+
+    return {"portfolioId": portfolio_id, "granularity": granularity, "data": data}
@@ -2,17 +2,23 @@
 Market data endpoints: quotes
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from typing import AsyncIterator, List, Optional, Tuple
 from pydantic import BaseModel
+import asyncio
+import contextlib
 import logging
 
+from app.services.fundamentals_service import FundamentalsService
+from app.services.quote_feed import QuoteFeed
 from app.services.yfinance_service import YFinanceService
-from app.services.cache_service import CacheService
+from app.api.dependencies import get_fundamentals_service, get_quote_feed, get_yfinance_service
+from app.api.metrics import InstrumentedRoute
+from app.api.streaming import StreamFormat, stream_format, streaming_response
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 # Pydantic models
@@ -42,20 +48,34 @@ class QuotesBatchResponse(BaseModel):
 @router.post("/", response_model=QuotesBatchResponse)
 async def get_quotes(
     request: QuoteRequest,
-    cache_service: CacheService
-) -> QuotesBatchResponse:
+    yf_service: YFinanceService = Depends(get_yfinance_service),
+    format: StreamFormat = Depends(stream_format)
+):
     """
     Get current quotes for multiple tickers
 
-    Caches quotes for 30 seconds to reduce yfinance API calls.
+    Caches quotes for 30 seconds to reduce yfinance API calls; older quotes
+    are served while a background refresh runs.
+
+    With ?stream=ndjson|sse (or a matching Accept header) cached quotes are
+    sent immediately as "quote" events and uncached ones follow once
+    fetched ("error" events for failures).
     """
-    yf_service = YFinanceService(cache_service)
+    if format != "json":
+        async def events() -> AsyncIterator[Tuple[str, dict]]:
+            async for ticker, data in yf_service.iter_quotes(request.tickers):
+                if data:
+                    yield "quote", QuoteResponse(**data).model_dump()
+                else:
+                    yield "error", {"ticker": ticker, "error": "Failed to fetch quote"}
+
+        return streaming_response(events(), format)
 
     quotes = []
     errors = []
 
     # Fetch quotes (with caching)
-    results = yf_service.get_quotes_batch(request.tickers)
+    results = await yf_service.get_quotes_batch(request.tickers)
 
     for ticker, data in results.items():
         if data:
@@ -69,16 +89,123 @@ async def get_quotes(
     return QuotesBatchResponse(quotes=quotes, errors=errors)
 
 
+@router.post("/info")
+async def get_tickers_info(
+    request: QuoteRequest,
+    fundamentals: FundamentalsService = Depends(get_fundamentals_service)
+):
+    """
+    Get ticker information for multiple tickers
+
+    Cached fundamentals are read in one round trip; only uncached tickers
+    are fetched from yfinance (concurrently).
+    """
+    results = await fundamentals.get_infos(request.tickers)
+
+    return {
+        "info": [info for info in results.values() if info],
+        "errors": [
+            QuoteError(ticker=ticker, error="Info not found")
+            for ticker, info in results.items() if not info
+        ],
+    }
+
+
+@router.websocket("/ws")
+async def quote_feed_socket(
+    websocket: WebSocket,
+    feed: QuoteFeed = Depends(get_quote_feed)
+):
+    """
+    Live quotes over WebSocket
+
+    Client messages: {"action": "subscribe" | "unsubscribe", "tickers": [...]}.
+    Server messages: {"event": "quote", "data": QuoteResponse}, sent once
+    on subscribe and then whenever the price changes, and
+    {"event": "error", "data": {"error": str}} for a message that is not
+    understood or would exceed the per-connection ticker limit.
+    """
+    await websocket.accept()
+    subscription = feed.subscribe()
+
+    async def forward() -> None:
+        try:
+            async for quote in subscription:
+                await websocket.send_json({"event": "quote", "data": quote})
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # Socket closed while sending
+
+    async def send_error(error: str) -> None:
+        await websocket.send_json({"event": "error", "data": {"error": error}})
+
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if not isinstance(message, dict):
+                await send_error("Expected a JSON object")
+                continue
+
+            action = message.get("action")
+            tickers = message.get("tickers") or []
+            if (
+                action not in ("subscribe", "unsubscribe")
+                or not isinstance(tickers, list)
+                or not all(isinstance(ticker, str) for ticker in tickers)
+            ):
+                await send_error('Expected {"action": "subscribe" | "unsubscribe", "tickers": [...]}')
+                continue
+
+            if action == "unsubscribe":
+                subscription.remove(tickers)
+            elif len(subscription.tickers.union(tickers)) > feed.max_tickers:
+                await send_error(f"At most {feed.max_tickers} tickers per connection")
+            else:
+                await subscription.add(tickers)
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await sender
+        subscription.close()
+
+
+@router.get("/stream")
+async def quote_feed_stream(
+    tickers: str = Query(..., description="Comma-separated tickers"),
+    feed: QuoteFeed = Depends(get_quote_feed)
+):
+    """
+    Live quotes as Server-Sent Events ("quote" events, as over WebSocket)
+    """
+    symbols = [t.strip() for t in tickers.split(",") if t.strip()]
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No tickers")
+    if len(set(symbols)) > feed.max_tickers:
+        raise HTTPException(status_code=400, detail=f"At most {feed.max_tickers} tickers per stream")
+
+    async def events() -> AsyncIterator[Tuple[str, dict]]:
+        subscription = feed.subscribe()
+        try:
+            await subscription.add(symbols)
+            async for quote in subscription:
+                yield "quote", quote
+        finally:
+            subscription.close()
+
+    return streaming_response(events(), "sse")
+
+
 @router.get("/{ticker}", response_model=QuoteResponse)
 async def get_quote(
     ticker: str,
-    cache_service: CacheService
+    yf_service: YFinanceService = Depends(get_yfinance_service)
 ) -> QuoteResponse:
     """
     Get current quote for a single ticker
     """
-    yf_service = YFinanceService(cache_service)
-    data = yf_service.get_quote(ticker)
+    data = await yf_service.get_quote(ticker)
 
     if not data:
         raise HTTPException(status_code=404, detail=f"Quote not found for {ticker}")
@@ -89,15 +216,16 @@ async def get_quote(
 @router.get("/{ticker}/info")
 async def get_ticker_info(
     ticker: str,
-    cache_service: CacheService
+    fundamentals: FundamentalsService = Depends(get_fundamentals_service)
 ):
     """
     Get comprehensive ticker information
 
     Includes: market cap, P/E, EPS, dividend yield, beta, sector, etc.
+    Cached for a day (profile fields for a week); market cap and P/E
+    follow the latest quote.
     """
-    yf_service = YFinanceService(cache_service)
-    info = yf_service.get_info(ticker)
+    info = (await fundamentals.get_infos([ticker]))[ticker]
 
     if not info:
         raise HTTPException(status_code=404, detail=f"Info not found for {ticker}")
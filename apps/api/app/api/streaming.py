@@ -0,0 +1,76 @@
+"""
+Streaming response helpers: NDJSON and Server-Sent Events
+
+Endpoints produce (event, data) pairs from a generator; these helpers
+serialize them one at a time, so the server never holds more than the
+chunk being written and clients can render before the response ends.
+"""
+
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Literal, Optional, Tuple, Union
+
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+
+StreamFormat = Literal["json", "ndjson", "sse"]
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+Events = Union[Iterable[Tuple[str, Any]], AsyncIterable[Tuple[str, Any]]]
+
+
+def stream_format(
+    request: Request,
+    stream: Optional[StreamFormat] = Query(None, description="json, ndjson or sse (default from Accept)")
+) -> StreamFormat:
+    """
+    Dependency resolving the response format of a streamable endpoint
+
+    An explicit ?stream= wins; otherwise an Accept header of
+    application/x-ndjson or text/event-stream selects streaming. Plain
+    JSON is the default so existing clients are unaffected.
+    """
+    if stream:
+        return stream
+    accept = request.headers.get("accept", "")
+    if NDJSON_MEDIA_TYPE in accept:
+        return "ndjson"
+    if SSE_MEDIA_TYPE in accept:
+        return "sse"
+    return "json"
+
+
+def streaming_response(events: Events, format: StreamFormat) -> StreamingResponse:
+    """
+    Stream (event, data) pairs as NDJSON lines or SSE messages
+
+    NDJSON writes one {"event": ..., "data": ...} object per line; SSE
+    writes "event:" / "data:" messages. A final "end" event marks a
+    complete response, so clients can tell it from a dropped connection.
+    """
+    if format == "sse":
+        return StreamingResponse(
+            _encode(events, _sse_message),
+            media_type=SSE_MEDIA_TYPE,
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return StreamingResponse(_encode(events, _ndjson_line), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def _encode(events: Events, encode) -> AsyncIterator[str]:
+    if hasattr(events, "__aiter__"):
+        async for event, data in events:
+            yield encode(event, data)
+    else:
+        for event, data in events:
+            yield encode(event, data)
+    yield encode("end", None)
+
+
+def _ndjson_line(event: str, data: Any) -> str:
+    return json.dumps({"event": event, "data": data}, separators=(",", ":")) + "\n"
+
+
+def _sse_message(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
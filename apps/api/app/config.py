@@ -0,0 +1,79 @@
+"""
+Runtime configuration read from environment variables
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class RedisSettings:
+    """Connection pool settings for the shared Redis client"""
+
+    url: str = "redis://localhost:6379"
+    max_connections: int = 50
+    pool_timeout: float = 5.0            # seconds to wait for a free connection
+    socket_timeout: float = 5.0
+    socket_connect_timeout: float = 2.0
+    health_check_interval: int = 30      # seconds between PINGs on idle connections
+
+    @classmethod
+    def from_env(cls) -> "RedisSettings":
+        return cls(
+            url=os.getenv("REDIS_URL", cls.url),
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", cls.max_connections)),
+            pool_timeout=float(os.getenv("REDIS_POOL_TIMEOUT", cls.pool_timeout)),
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", cls.socket_timeout)),
+            socket_connect_timeout=float(
+                os.getenv("REDIS_CONNECT_TIMEOUT", cls.socket_connect_timeout)
+            ),
+            health_check_interval=int(
+                os.getenv("REDIS_HEALTH_CHECK_INTERVAL", cls.health_check_interval)
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    """In-process L1 cache settings"""
+
+    l1_enabled: bool = True
+    l1_max_entries: int = 10000
+
+    @classmethod
+    def from_env(cls) -> "CacheSettings":
+        return cls(
+            l1_enabled=os.getenv("L1_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            l1_max_entries=int(os.getenv("L1_CACHE_MAX_ENTRIES", cls.l1_max_entries)),
+        )
+
+
+@dataclass(frozen=True)
+class ProviderSettings:
+    """Market-data provider chain settings"""
+
+    providers: Tuple[str, ...] = ("yfinance",)  # Priority order: yfinance, replay
+    hedge_after_ms: Optional[float] = None       # Also ask the next provider after this long
+    replay_dir: str = "replay_data"
+    replay_latency_ms: float = 0.0
+    replay_jitter_ms: float = 0.0
+    replay_failure_rate: float = 0.0
+    replay_seed: int = 0
+    replay_as_of: Optional[str] = None           # ISO date treated as "today"
+
+    @classmethod
+    def from_env(cls) -> "ProviderSettings":
+        hedge = os.getenv("PROVIDER_HEDGE_MS")
+        return cls(
+            providers=tuple(
+                name.strip() for name in os.getenv("MARKET_DATA_PROVIDERS", "yfinance").split(",") if name.strip()
+            ),
+            hedge_after_ms=float(hedge) if hedge else None,
+            replay_dir=os.getenv("REPLAY_DATA_DIR", cls.replay_dir),
+            replay_latency_ms=float(os.getenv("REPLAY_LATENCY_MS", cls.replay_latency_ms)),
+            replay_jitter_ms=float(os.getenv("REPLAY_JITTER_MS", cls.replay_jitter_ms)),
+            replay_failure_rate=float(os.getenv("REPLAY_FAILURE_RATE", cls.replay_failure_rate)),
+            replay_seed=int(os.getenv("REPLAY_SEED", cls.replay_seed)),
+            replay_as_of=os.getenv("REPLAY_AS_OF") or None,
+        )
@@ -2,22 +2,14 @@
 FastAPI application for Investment Dashboard
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-import redis
 import os
 
-from app.api import quotes, history, calculations
-from app.services.cache_service import CacheService
-
-# Redis client
-redis_client = redis.from_url(
-    os.getenv("REDIS_URL", "redis://localhost:6379"),
-    decode_responses=True
-)
-
-cache_service = CacheService(redis_client)
+from app.api import quotes, history, calculations, portfolios, alerts, metrics
+from app.config import RedisSettings
+from app.services.container import ServiceContainer
 
 
 @asynccontextmanager
@@ -25,10 +17,14 @@ async def lifespan(app: FastAPI):
     """Lifespan events"""
     # Startup
     print("🚀 Investment Dashboard API starting...")
-    print(f"📊 Redis connected: {os.getenv('REDIS_URL', 'redis://localhost:6379')}")
+    settings = RedisSettings.from_env()
+    app.state.services = ServiceContainer(settings)
+    await app.state.services.start()
+    print(f"📊 Redis pool: {settings.url} (max {settings.max_connections} connections)")
     yield
     # Shutdown
     print("👋 Investment Dashboard API shutting down...")
+    await app.state.services.close()
 
 
 app = FastAPI(
@@ -52,11 +48,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency and per-stage timings (GET /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 # Include routers
 app.include_router(quotes.router, prefix="/api/quotes", tags=["Market Data"])
 app.include_router(history.router, prefix="/api/history", tags=["Market Data"])
 app.include_router(calculations.router, prefix="/api/calculations", tags=["Quant"])
+app.include_router(portfolios.router, prefix="/api/portfolios", tags=["Portfolios"])
+app.include_router(alerts.router, prefix="/api/alerts", tags=["Alerts"])
+app.include_router(metrics.router, tags=["Monitoring"])
 
 
 @app.get("/")
@@ -69,19 +71,24 @@ async def root():
 
 
 @app.get("/health")
-async def health():
+async def health(request: Request):
     """Health check endpoint"""
+    services = request.app.state.services
     try:
         # Test Redis
-        redis_client.ping()
+        await services.redis.ping()
         return {
             "status": "healthy",
-            "redis": "connected"
+            "redis": "connected",
+            "pool": services.pool_stats(),
+            "cache": services.cache.stats(),
+            "providers": services.provider.stats()
         }
     except Exception as e:
         return {
             "status": "degraded",
-            "redis": f"disconnected: {str(e)}"
+            "redis": f"disconnected: {str(e)}",
+            "pool": services.pool_stats()
         }
 
 
@@ -0,0 +1,547 @@
+"""
+Alert evaluation: per-ticker sorted threshold indexes fed by the quote feed
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from .quote_feed import QuoteFeed, QuoteSubscription
+
+logger = logging.getLogger(__name__)
+
+# Alert types (AlertType enum of the database schema)
+ALERT_TYPES = ("PRICE_TARGET", "PERCENT_CHANGE", "DROPS_BELOW", "RISES_ABOVE")
+
+# Index sides: (quote field, direction). Falling sides store negated
+# thresholds so every side triggers on value >= threshold.
+_PRICE_UP, _PRICE_DOWN, _CHANGE_UP, _CHANGE_DOWN = range(4)
+_PENDING = -1  # PRICE_TARGET waiting for a first price to pick a side
+
+# Change listener reconnect delay: doubles per failed attempt up to the cap
+_RECONNECT_DELAY = 1.0
+_RECONNECT_MAX_DELAY = 30.0
+
+
+class _Side:
+    """Thresholds of one side in ascending order with their alert ids"""
+
+    __slots__ = ("thresholds", "ids")
+
+    def __init__(self):
+        self.thresholds: List[float] = []
+        self.ids: List[str] = []
+
+    def add(self, threshold: float, alert_id: str) -> None:
+        i = bisect_right(self.thresholds, threshold)
+        self.thresholds.insert(i, threshold)
+        self.ids.insert(i, alert_id)
+
+    def load(self, pairs: List[Tuple[float, str]]) -> None:
+        """Bulk insert: one sort instead of one insert per alert"""
+        pairs = sorted(list(zip(self.thresholds, self.ids)) + pairs)
+        self.thresholds = [threshold for threshold, _ in pairs]
+        self.ids = [alert_id for _, alert_id in pairs]
+
+    def remove(self, threshold: float, alert_id: str) -> bool:
+        lo = bisect_left(self.thresholds, threshold)
+        hi = bisect_right(self.thresholds, threshold, lo)
+        for i in range(lo, hi):
+            if self.ids[i] == alert_id:
+                del self.thresholds[i]
+                del self.ids[i]
+                return True
+        return False
+
+    def pop_crossed(self, value: float) -> List[str]:
+        """Remove and return every alert with threshold <= value"""
+        k = bisect_right(self.thresholds, value)
+        if k == 0:
+            return []
+        crossed = self.ids[:k]
+        del self.thresholds[:k]
+        del self.ids[:k]
+        return crossed
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class _TickerBook:
+    """Every active alert of one ticker"""
+
+    __slots__ = ("sides", "pending", "last_price")
+
+    def __init__(self):
+        self.sides = [_Side(), _Side(), _Side(), _Side()]
+        self.pending: Dict[str, float] = {}
+        self.last_price: Optional[float] = None
+
+    def __len__(self) -> int:
+        return sum(len(side) for side in self.sides) + len(self.pending)
+
+
+class AlertIndex:
+    """
+    In-memory index of active alerts
+
+    Each ticker keeps four sorted threshold lists (price rising / falling,
+    day change rising / falling). A quote update pops the crossed prefix
+    of each list after a binary search, so its cost is O(log n + k) for k
+    triggered alerts, independent of how many alerts are active.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, _TickerBook] = {}
+        self._alerts: Dict[str, Tuple[str, int, float]] = {}  # id -> (ticker, side, stored threshold)
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def __contains__(self, alert_id: str) -> bool:
+        return alert_id in self._alerts
+
+    def tickers(self) -> List[str]:
+        return list(self._books)
+
+    def add(self, alert: Dict) -> bool:
+        """
+        Index an alert (replacing any alert with the same id)
+
+        Args:
+            alert: {"id", "ticker", "type", "targetPrice", "targetChangePercent",
+                "active", "triggered"}
+
+        Returns:
+            False if the alert is inactive, triggered or has no usable target
+        """
+        self.remove(alert["id"])
+        placed = self._place(alert)
+        if placed is None:
+            return False
+
+        ticker, side, threshold = placed
+        book = self._books.setdefault(ticker, _TickerBook())
+        if side == _PENDING:
+            self._place_pending(ticker, book, alert["id"], threshold)
+        else:
+            book.sides[side].add(threshold, alert["id"])
+            self._alerts[alert["id"]] = (ticker, side, threshold)
+        return True
+
+    def load(self, alerts: Iterable[Dict]) -> int:
+        """Bulk-index alerts (sorted once per side); returns the number indexed"""
+        grouped: Dict[Tuple[str, int], List[Tuple[float, str]]] = {}
+        count = 0
+        for alert in alerts:
+            self.remove(alert["id"])
+            placed = self._place(alert)
+            if placed is None:
+                continue
+            ticker, side, threshold = placed
+            book = self._books.setdefault(ticker, _TickerBook())
+            if side == _PENDING:
+                self._place_pending(ticker, book, alert["id"], threshold)
+            else:
+                grouped.setdefault((ticker, side), []).append((threshold, alert["id"]))
+                self._alerts[alert["id"]] = placed
+            count += 1
+
+        for (ticker, side), pairs in grouped.items():
+            self._books[ticker].sides[side].load(pairs)
+        return count
+
+    def remove(self, alert_id: str) -> bool:
+        """Drop an alert from the index"""
+        placed = self._alerts.pop(alert_id, None)
+        if placed is None:
+            return False
+        ticker, side, threshold = placed
+        book = self._books[ticker]
+        if side == _PENDING:
+            book.pending.pop(alert_id, None)
+        else:
+            book.sides[side].remove(threshold, alert_id)
+        if not len(book):
+            del self._books[ticker]
+        return True
+
+    def evaluate(self, ticker: str, price: float, change_percent: float) -> List[str]:
+        """
+        Apply a quote update and return the ids of the alerts it triggers
+
+        Triggered alerts are removed from the index.
+        """
+        book = self._books.get(ticker)
+        if book is None:
+            return []
+
+        book.last_price = price
+        if book.pending:
+            self._resolve_pending(ticker, book)
+
+        sides = book.sides
+        triggered = sides[_PRICE_UP].pop_crossed(price)
+        triggered += sides[_PRICE_DOWN].pop_crossed(-price)
+        triggered += sides[_CHANGE_UP].pop_crossed(change_percent)
+        triggered += sides[_CHANGE_DOWN].pop_crossed(-change_percent)
+
+        if triggered:
+            for alert_id in triggered:
+                del self._alerts[alert_id]
+            if not len(book):
+                del self._books[ticker]
+        return triggered
+
+    @staticmethod
+    def is_indexable(alert: Dict) -> bool:
+        """Whether an alert is active and has a target it can be evaluated on"""
+        return AlertIndex._place(alert) is not None
+
+    @staticmethod
+    def _place(alert: Dict) -> Optional[Tuple[str, int, float]]:
+        """(ticker, side, stored threshold) of an alert, or None if not indexable"""
+        if not alert.get("active", True) or alert.get("triggered") or not alert.get("ticker"):
+            return None
+
+        kind = alert.get("type")
+        price = alert.get("targetPrice")
+        change = alert.get("targetChangePercent")
+        ticker = alert["ticker"]
+
+        if kind == "RISES_ABOVE" and price is not None:
+            return ticker, _PRICE_UP, float(price)
+        if kind == "DROPS_BELOW" and price is not None:
+            return ticker, _PRICE_DOWN, -float(price)
+        if kind == "PRICE_TARGET" and price is not None:
+            return ticker, _PENDING, float(price)
+        if kind == "PERCENT_CHANGE" and change is not None:
+            if change >= 0:
+                return ticker, _CHANGE_UP, float(change)
+            return ticker, _CHANGE_DOWN, -float(change)
+        return None
+
+    def _resolve_pending(self, ticker: str, book: _TickerBook) -> None:
+        """Move price targets waiting for a first price onto their side"""
+        up, down = [], []
+        for alert_id, target in book.pending.items():
+            if target >= book.last_price:
+                up.append((target, alert_id))
+                self._alerts[alert_id] = (ticker, _PRICE_UP, target)
+            else:
+                down.append((-target, alert_id))
+                self._alerts[alert_id] = (ticker, _PRICE_DOWN, -target)
+        book.pending = {}
+        book.sides[_PRICE_UP].load(up)
+        book.sides[_PRICE_DOWN].load(down)
+
+    def _place_pending(self, ticker: str, book: _TickerBook, alert_id: str, target: float) -> None:
+        """
+        A price target fires when the price reaches it from either side:
+        it watches upward if the last price is below it, downward otherwise
+        """
+        if book.last_price is None:
+            book.pending[alert_id] = target
+            self._alerts[alert_id] = (ticker, _PENDING, target)
+        elif target >= book.last_price:
+            book.sides[_PRICE_UP].add(target, alert_id)
+            self._alerts[alert_id] = (ticker, _PRICE_UP, target)
+        else:
+            book.sides[_PRICE_DOWN].add(-target, alert_id)
+            self._alerts[alert_id] = (ticker, _PRICE_DOWN, -target)
+
+
+class AlertEngine:
+    """
+    Evaluates active alerts against live quotes
+
+    Active alerts are stored in a Redis hash (written through the alerts
+    API) and indexed in memory by every worker; changes are broadcast on a
+    pub/sub channel. The engine watches every ticker with an alert through
+    the quote feed and evaluates each quote update against the index.
+    Triggered alerts are buffered and written back in one pipeline per
+    flush: HSETNX into the triggered hash (so a trigger seen by several
+    workers is recorded once), HDEL from the active hash, and a
+    notification on the triggered channel for each newly recorded alert.
+    """
+
+    ACTIVE = "alerts:active"
+    TRIGGERED = "alerts:triggered"
+    CHANGES_CHANNEL = "alerts:changes"
+    TRIGGERED_CHANNEL = "alerts:triggered"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        feed: QuoteFeed,
+        flush_interval: Optional[float] = None,
+        flush_size: int = 1000
+    ):
+        self.redis = redis_client
+        self.feed = feed
+        self.flush_interval = flush_interval or float(os.getenv("ALERT_FLUSH_INTERVAL", "1"))
+        self.flush_size = flush_size
+        self.instance_id = uuid.uuid4().hex
+
+        self.index = AlertIndex()
+        self.counters = {"quotes": 0, "triggered": 0, "recorded": 0}
+        self._buffer: List[Dict] = []
+        self._flushed = asyncio.Event()
+        self._subscription: Optional[QuoteSubscription] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Load active alerts and start evaluating"""
+        if self._tasks:
+            return
+
+        loaded = self.index.load(await self._read_active())
+        logger.info(f"Alert engine: {loaded} active alerts on {len(self.index.tickers())} tickers")
+
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(self.CHANGES_CHANNEL)
+        except Exception:
+            await pubsub.aclose()
+            raise
+
+        # Quote updates for every alert ticker, however many arrive per poll
+        self._subscription = self.feed.subscribe(max_pending=1_000_000)
+        self._tasks = [
+            asyncio.create_task(self._evaluate_loop()),
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._listen(pubsub)),
+        ]
+        await self._subscription.add(self.index.tickers())
+
+    async def close(self) -> None:
+        """Stop evaluating and write back pending triggers"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
+        await self.flush()
+
+    async def upsert(self, alerts: List[Dict]) -> int:
+        """
+        Create or replace alerts (inactive or triggered ones are removed)
+
+        Returns:
+            Number of alerts now active
+        """
+        indexable = [alert for alert in alerts if AlertIndex.is_indexable(alert)]
+        removed = [alert["id"] for alert in alerts if not AlertIndex.is_indexable(alert)]
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if indexable:
+                pipe.hset(self.ACTIVE, mapping={alert["id"]: json.dumps(alert) for alert in indexable})
+            if removed:
+                pipe.hdel(self.ACTIVE, *removed)
+            self._publish_changes(pipe, upsert=alerts)
+            await pipe.execute()
+
+        await self._apply(upsert=alerts)
+        return len(indexable)
+
+    async def delete(self, alert_ids: List[str]) -> None:
+        """Remove alerts"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hdel(self.ACTIVE, *alert_ids)
+            self._publish_changes(pipe, remove=alert_ids)
+            await pipe.execute()
+        await self._apply(remove=alert_ids)
+
+    async def triggered(self, limit: int = 1000) -> List[Dict]:
+        """Recorded triggers not yet acknowledged"""
+        records = []
+        async for _, raw in self.redis.hscan_iter(self.TRIGGERED, count=1000):
+            records.append(json.loads(raw))
+            if len(records) >= limit:
+                break
+        return sorted(records, key=lambda record: record["triggeredAt"])
+
+    async def acknowledge(self, alert_ids: List[str]) -> int:
+        """Forget recorded triggers (once persisted by the caller)"""
+        if not alert_ids:
+            return 0
+        return await self.redis.hdel(self.TRIGGERED, *alert_ids)
+
+    def evaluate(self, quote: Dict) -> List[str]:
+        """Evaluate one quote update; triggers are buffered for write-back"""
+        self.counters["quotes"] += 1
+        ticker = quote["ticker"]
+        triggered = self.index.evaluate(ticker, quote["price"], quote.get("changePercent", 0.0))
+        if triggered:
+            self.counters["triggered"] += len(triggered)
+            now = datetime.now(timezone.utc).isoformat()
+            self._buffer.extend(
+                {
+                    "id": alert_id,
+                    "ticker": ticker,
+                    "price": quote["price"],
+                    "changePercent": quote.get("changePercent"),
+                    "triggeredAt": now,
+                }
+                for alert_id in triggered
+            )
+            if len(self._buffer) >= self.flush_size:
+                self._flushed.set()
+        return triggered
+
+    async def flush(self) -> int:
+        """
+        Write buffered triggers back in one pipeline
+
+        Returns:
+            Number of triggers recorded for the first time
+        """
+        if not self._buffer:
+            return 0
+        batch, self._buffer = self._buffer, []
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for record in batch:
+                    pipe.hsetnx(self.TRIGGERED, record["id"], json.dumps(record))
+                pipe.hdel(self.ACTIVE, *(record["id"] for record in batch))
+                results = await pipe.execute()
+
+            recorded = [record for record, new in zip(batch, results) if new]
+            if recorded:
+                await self.redis.publish(self.TRIGGERED_CHANNEL, json.dumps({"alerts": recorded}))
+        except Exception as e:
+            # Keep the triggers for the next flush
+            logger.warning(f"Alert write-back failed for {len(batch)} alerts: {e}")
+            self._buffer = batch + self._buffer
+            return 0
+
+        self.counters["recorded"] += len(recorded)
+        return len(recorded)
+
+    def stats(self) -> Dict:
+        return {
+            "active": len(self.index),
+            "tickers": len(self.index.tickers()),
+            "pendingWriteBack": len(self._buffer),
+            **self.counters,
+        }
+
+    def _publish_changes(self, pipe, upsert: Optional[List[Dict]] = None, remove: Optional[List[str]] = None) -> None:
+        pipe.publish(self.CHANGES_CHANNEL, json.dumps({
+            "origin": self.instance_id,
+            "upsert": upsert or [],
+            "remove": remove or [],
+        }))
+
+    async def _apply(self, upsert: Optional[List[Dict]] = None, remove: Optional[List[str]] = None) -> None:
+        """Apply alert changes to the index and the watched tickers"""
+        before = set(self.index.tickers())
+        for alert_id in remove or []:
+            self.index.remove(alert_id)
+        for alert in upsert or []:
+            self.index.add(alert)
+        if self._subscription is None:
+            return
+
+        after = set(self.index.tickers())
+        if before - after:
+            self._subscription.remove(before - after)
+        if after - before:
+            await self._subscription.add(after - before)
+
+    async def _read_active(self) -> List[Dict]:
+        """All active alerts stored in Redis"""
+        alerts = []
+        async for _, raw in self.redis.hscan_iter(self.ACTIVE, count=10000):
+            try:
+                alerts.append(json.loads(raw))
+            except ValueError:
+                continue
+        return alerts
+
+    async def _resync(self) -> None:
+        """
+        Rebuild the index from Redis
+
+        Changes published while the listener was disconnected are lost, so
+        after a reconnect the whole active hash is reloaded. Triggers still
+        waiting for write-back are left out, as they are still in the hash.
+        """
+        pending = {record["id"] for record in self._buffer}
+        alerts = [alert for alert in await self._read_active() if alert.get("id") not in pending]
+        index = AlertIndex()
+        loaded = index.load(alerts)
+
+        before = set(self.index.tickers())
+        self.index = index
+        after = set(index.tickers())
+        if self._subscription is not None:
+            if before - after:
+                self._subscription.remove(before - after)
+            if after - before:
+                await self._subscription.add(after - before)
+        logger.info(f"Alert engine resynced: {loaded} active alerts on {len(after)} tickers")
+
+    async def _evaluate_loop(self) -> None:
+        async for quote in self._subscription:
+            try:
+                self.evaluate(quote)
+            except (KeyError, TypeError) as e:
+                logger.warning(f"Malformed quote update for alerts: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flushed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flushed.clear()
+            await self.flush()
+
+    async def _listen(self, pubsub) -> None:
+        """
+        Apply alert changes made through other workers
+
+        Reconnects with exponential backoff after a Redis or pub/sub error
+        and resyncs the index, since changes published meanwhile are lost.
+
+        Args:
+            pubsub: Already subscribed to the changes channel by start()
+        """
+        delay = _RECONNECT_DELAY
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self.redis.pubsub()
+                    await pubsub.subscribe(self.CHANGES_CHANNEL)
+                    # Subscribed first, so no change falls between the two
+                    await self._resync()
+                    delay = _RECONNECT_DELAY
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        payload = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    if payload.get("origin") == self.instance_id:
+                        continue
+                    await self._apply(upsert=payload.get("upsert"), remove=payload.get("remove"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Alert change listener error, reconnecting in {delay:.0f}s: {e}")
+            finally:
+                if pubsub is not None:
+                    await pubsub.aclose()
+                    pubsub = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RECONNECT_MAX_DELAY)
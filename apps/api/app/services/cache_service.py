@@ -2,80 +2,525 @@
 Cache service using Redis
 """
 
-import redis
+import redis.asyncio as redis
+import asyncio
 import json
 import logging
-from typing import Optional, Any
+import time
+import uuid
+from typing import Optional, Any, Dict, List, Tuple
 from datetime import datetime, timedelta
 
+from . import covariance, history_frame
+from .covariance import CovarianceEstimate
+from .history_frame import HistoryFrame
+from .local_cache import LocalCache
+from .market_hours import TtlPolicy
+from .metrics import REDIS_LATENCY, count_lookups, stage
+
 logger = logging.getLogger(__name__)
 
+# Soft TTL = how long an entry counts as fresh. Hard TTL = Redis expiry.
+# Between the two the entry is served stale while it is refreshed.
+QUOTE_TTL = (30, 900)           # 30s fresh, served stale up to 15 min
+
+# Canonical bar store per (ticker, interval). Soft TTL = how often new bars
+# are appended; hard TTL = how long the accumulated series is kept.
+BARS_TTL = {
+    "1m": (60, 86400),           # 1 min / 1 day
+    "5m": (300, 86400),          # 5 min / 1 day
+    "1h": (1800, 3 * 86400),     # 30 min / 3 days
+    "1d": (1800, 7 * 86400),     # 30 min / 7 days
+}
+
+FX_TTL = 3600                   # 1 hour
+
+# Ticker fundamentals, one key per field group; price-dependent fields
+# (market cap, P/E) are derived from the cached quote instead
+INFO_TTL = {
+    "profile": (7 * 86400, 30 * 86400),       # Name, sector, industry: 1 week / 30 days
+    "fundamentals": (86400, 7 * 86400),       # EPS, shares, beta, dividend: 1 day / 7 days
+}
+
+# Portfolio value series per composition; rebuilt once per new daily bar
+PORTFOLIO_TTL = (1800, 86400)   # 30 min fresh, served stale up to 1 day
+
+REPLAY_TTL = 30 * 86400         # Transaction replay checkpoints: 30 days
+
+# Covariance per ticker universe and day; re-estimated as daily bars arrive
+COVARIANCE_TTL = (1800, 86400)  # 30 min fresh, served stale up to 1 day
+
+
+class CacheEntry:
+    """Cached value with its freshness deadline (epoch seconds)"""
+
+    __slots__ = ("value", "fresh_until")
+
+    def __init__(self, value: Any, fresh_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+
+    @property
+    def stale(self) -> bool:
+        return time.time() >= self.fresh_until
+
 
 class CacheService:
-    """Redis cache service with TTL management"""
+    """
+    Async Redis cache service with TTL management
+
+    Values are stored in a small envelope ({"v": value, "f": fresh_until})
+    so an entry can outlive its soft TTL and be served stale until the
+    hard TTL (the Redis expiry) while a refresh runs in the background.
+    HistoryFrame and CovarianceEstimate values use binary formats instead
+    of JSON.
+
+    An optional in-process L1 (LocalCache) sits in front of Redis. Writes
+    and deletes are broadcast on a pub/sub channel so other workers drop
+    their L1 copy of the key.
 
-    def __init__(self, redis_client: redis.Redis):
+    Lookups are counted per namespace (hit, stale, miss) and Redis round
+    trips timed in the process metrics; time spent here is the "cache"
+    stage of the request being handled.
+    """
+
+    INVALIDATION_CHANNEL = "cache:invalidate"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        local: Optional[LocalCache] = None,
+        ttl_policy: Optional[TtlPolicy] = None
+    ):
         self.redis = redis_client
+        self.local = local
+        self.ttl_policy = ttl_policy or TtlPolicy()
+        self.instance_id = uuid.uuid4().hex
+        self.counters = {
+            "l1": {"hits": 0, "misses": 0},
+            "redis": {"hits": 0, "misses": 0},
+        }
+        self._listener: Optional[asyncio.Task] = None
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get value from cache (fresh or stale)"""
+        entry = await self.get_entry(key)
+        return entry.value if entry else None
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Get value from cache together with its freshness"""
+        with stage("cache", "get"):
+            entry = await self._get_entry(key)
+        count_lookups([key], [entry])
+        return entry
+
+    async def _get_entry(self, key: str) -> Optional[CacheEntry]:
+        if self.local is not None:
+            hit, entry = self.local.get(key)
+            if hit:
+                self.counters["l1"]["hits"] += 1
+                return entry
+            self.counters["l1"]["misses"] += 1
 
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
         try:
-            value = self.redis.get(key)
-            if value:
-                return json.loads(value)
+            with REDIS_LATENCY.labels("get").time():
+                if self.local is not None:
+                    pipe = self.redis.pipeline(transaction=False)
+                    pipe.get(key)
+                    pipe.pttl(key)
+                    value, pttl = await pipe.execute()
+                else:
+                    value, pttl = await self.redis.get(key), None
+
+            entry = self._decode(value) if value else None
+            if entry:
+                self.counters["redis"]["hits"] += 1
+                self._fill_local(key, entry, pttl)
+                return entry
+            self.counters["redis"]["misses"] += 1
         except Exception as e:
             logger.warning(f"Cache get error: {e}")
         return None
 
-    def set(self, key: str, value: Any, ttl_seconds: int = 30) -> bool:
-        """Set value in cache with TTL"""
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 30,
+        soft_ttl_seconds: Optional[int] = None
+    ) -> bool:
+        """
+        Set value in cache with TTL
+
+        Args:
+            ttl_seconds: Hard TTL (Redis expiry)
+            soft_ttl_seconds: Freshness window; defaults to the hard TTL
+        """
         try:
-            serialized = json.dumps(value, default=str)
-            self.redis.setex(key, ttl_seconds, serialized)
+            with stage("cache", "set"):
+                entry = self._entry(value, ttl_seconds, soft_ttl_seconds)
+                serialized = self._encode(entry)
+                with REDIS_LATENCY.labels("set").time():
+                    if self.local is not None:
+                        pipe = self.redis.pipeline(transaction=False)
+                        pipe.setex(key, ttl_seconds, serialized)
+                        self._publish_invalidation(pipe, [key])
+                        await pipe.execute()
+                    else:
+                        await self.redis.setex(key, ttl_seconds, serialized)
+                if self.local is not None:
+                    self.local.set(key, entry, ttl_seconds)
             return True
         except Exception as e:
             logger.warning(f"Cache set error: {e}")
             return False
 
-    def delete(self, key: str) -> bool:
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get several values in a single MGET round trip
+
+        Returns:
+            Dict mapping each key to its value (None on miss)
+        """
+        entries = await self.get_many_entries(keys)
+        return {key: entry.value if entry else None for key, entry in entries.items()}
+
+    async def get_many_entries(self, keys: List[str]) -> Dict[str, Optional[CacheEntry]]:
+        """Get several entries (value + freshness) in a single MGET round trip"""
+        if not keys:
+            return {}
+
+        with stage("cache", "mget"):
+            results = await self._get_many_entries(keys)
+        count_lookups(keys, [results.get(key) for key in keys])
+        return results
+
+    async def _get_many_entries(self, keys: List[str]) -> Dict[str, Optional[CacheEntry]]:
+        results = {}
+        remote_keys = keys
+        if self.local is not None:
+            remote_keys = []
+            for key in keys:
+                hit, entry = self.local.get(key)
+                if hit:
+                    self.counters["l1"]["hits"] += 1
+                    results[key] = entry
+                else:
+                    self.counters["l1"]["misses"] += 1
+                    remote_keys.append(key)
+            if not remote_keys:
+                return results
+
+        try:
+            with REDIS_LATENCY.labels("mget").time():
+                if self.local is not None:
+                    pipe = self.redis.pipeline(transaction=False)
+                    pipe.mget(remote_keys)
+                    for key in remote_keys:
+                        pipe.pttl(key)
+                    values, *pttls = await pipe.execute()
+                else:
+                    values, pttls = await self.redis.mget(remote_keys), [None] * len(remote_keys)
+        except Exception as e:
+            logger.warning(f"Cache mget error: {e}")
+            results.update({key: None for key in remote_keys})
+            return results
+
+        for key, value, pttl in zip(remote_keys, values, pttls):
+            try:
+                entry = self._decode(value) if value else None
+            except Exception as e:
+                logger.warning(f"Cache decode error for {key}: {e}")
+                entry = None
+
+            results[key] = entry
+            if entry:
+                self.counters["redis"]["hits"] += 1
+                self._fill_local(key, entry, pttl)
+            else:
+                self.counters["redis"]["misses"] += 1
+        return results
+
+    async def set_many(
+        self,
+        items: Dict[str, Any],
+        ttl_seconds: int = 30,
+        soft_ttl_seconds: Optional[int] = None,
+        ttls: Optional[Dict[str, Tuple[int, int]]] = None
+    ) -> bool:
+        """
+        Set several values in one pipelined round trip
+
+        Args:
+            ttl_seconds, soft_ttl_seconds: TTLs of every key...
+            ttls: ...except keys listed here as key -> (soft, hard)
+        """
+        if not items:
+            return True
+
+        try:
+            with stage("cache", "set_many"):
+                ttls = ttls or {}
+                expiry = {key: ttls.get(key, (soft_ttl_seconds, ttl_seconds)) for key in items}
+                entries = {
+                    key: self._entry(value, expiry[key][1], expiry[key][0])
+                    for key, value in items.items()
+                }
+                pipe = self.redis.pipeline(transaction=False)
+                for key, entry in entries.items():
+                    pipe.setex(key, expiry[key][1], self._encode(entry))
+                if self.local is not None:
+                    self._publish_invalidation(pipe, list(items))
+                with REDIS_LATENCY.labels("set_many").time():
+                    await pipe.execute()
+                if self.local is not None:
+                    for key, entry in entries.items():
+                        self.local.set(key, entry, expiry[key][1])
+            return True
+        except Exception as e:
+            logger.warning(f"Cache set_many error: {e}")
+            return False
+
+    async def delete(self, key: str) -> bool:
         """Delete key from cache"""
         try:
-            self.redis.delete(key)
+            if self.local is not None:
+                self.local.delete(key)
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.delete(key)
+                self._publish_invalidation(pipe, [key])
+                await pipe.execute()
+            else:
+                await self.redis.delete(key)
             return True
         except Exception as e:
             logger.warning(f"Cache delete error: {e}")
             return False
 
-    def get_quote(self, ticker: str) -> Optional[dict]:
-        """Get cached quote (30s TTL)"""
-        return self.get(f"quote:{ticker}")
-
-    def set_quote(self, ticker: str, data: dict) -> bool:
-        """Cache quote (30s TTL)"""
-        return self.set(f"quote:{ticker}", data, ttl_seconds=30)
-
-    def get_history(self, ticker: str, range: str, interval: str) -> Optional[dict]:
-        """Get cached history (5-30min TTL based on range)"""
-        return self.get(f"history:{ticker}:{range}:{interval}")
-
-    def set_history(self, ticker: str, range: str, interval: str, data: dict) -> bool:
-        """Cache history with dynamic TTL"""
-        # Longer TTL for longer ranges
-        ttl_map = {
-            "1d": 300,      # 5 min
-            "5d": 900,      # 15 min
-            "1mo": 1800,    # 30 min
-            "6mo": 3600,    # 1 hour
-            "1y": 7200,     # 2 hours
-            "5y": 14400,    # 4 hours
+    def stats(self) -> Dict:
+        """Hit/miss counters per cache tier"""
+        stats = {tier: dict(counts) for tier, counts in self.counters.items()}
+        if self.local is not None:
+            stats["l1"]["size"] = len(self.local)
+            stats["l1"]["evictions"] = self.local.evictions
+        return stats
+
+    @staticmethod
+    def _entry(value: Any, ttl_seconds: int, soft_ttl_seconds: Optional[int]) -> CacheEntry:
+        soft = ttl_seconds if soft_ttl_seconds is None else min(soft_ttl_seconds, ttl_seconds)
+        return CacheEntry(value, time.time() + soft)
+
+    @staticmethod
+    def _encode(entry: CacheEntry):
+        if isinstance(entry.value, HistoryFrame):
+            return history_frame.encode(entry.value, entry.fresh_until)
+        if isinstance(entry.value, CovarianceEstimate):
+            return covariance.encode(entry.value, entry.fresh_until)
+        return json.dumps({"v": entry.value, "f": entry.fresh_until}, default=str)
+
+    @staticmethod
+    def _decode(raw) -> Optional[CacheEntry]:
+        if history_frame.is_encoded(raw):
+            decoded = history_frame.decode(raw)
+            # Unknown format version: treat as a miss
+            return CacheEntry(*decoded) if decoded else None
+        if covariance.is_encoded(raw):
+            decoded = covariance.decode(raw)
+            return CacheEntry(*decoded) if decoded else None
+
+        payload = json.loads(raw)
+        if isinstance(payload, dict) and payload.keys() == {"v", "f"}:
+            return CacheEntry(payload["v"], payload["f"])
+        # Written before envelopes existed: treat as stale so it gets refreshed
+        return CacheEntry(payload, 0)
+
+    def _fill_local(self, key: str, entry: CacheEntry, pttl: Optional[int]) -> None:
+        """Copy an entry read from Redis into L1, capped by its remaining TTL"""
+        if self.local is None:
+            return
+        # PTTL is -1 for keys without expiry and -2 for missing keys
+        if pttl is not None and pttl >= 0:
+            self.local.set(key, entry, pttl / 1000)
+        elif pttl == -1:
+            self.local.set(key, entry)
+
+    def _publish_invalidation(self, pipe, keys: List[str]) -> None:
+        pipe.publish(self.INVALIDATION_CHANNEL, json.dumps({
+            "origin": self.instance_id,
+            "keys": keys,
+        }))
+
+    async def start_invalidation_listener(self) -> None:
+        """Subscribe to invalidations from other workers (no-op without L1)"""
+        if self.local is None or self._listener is not None:
+            return
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.INVALIDATION_CHANNEL)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def stop_invalidation_listener(self) -> None:
+        if self._listener is None:
+            return
+        self._listener.cancel()
+        try:
+            await self._listener
+        except asyncio.CancelledError:
+            pass
+        self._listener = None
+
+    async def _listen(self, pubsub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if payload.get("origin") == self.instance_id:
+                    continue
+                for key in payload.get("keys", []):
+                    self.local.delete(key)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Without invalidations L1 could serve stale data: drop it
+            logger.warning(f"Cache invalidation listener stopped: {e}")
+            self.local.clear()
+            self.local = None
+        finally:
+            await pubsub.aclose()
+
+    async def get_quote(self, ticker: str) -> Optional[dict]:
+        """Get cached quote (fresh or stale)"""
+        return await self.get(f"quote:{ticker}")
+
+    async def get_quote_entry(self, ticker: str) -> Optional[CacheEntry]:
+        """Get cached quote with freshness"""
+        return await self.get_entry(f"quote:{ticker}")
+
+    async def set_quote(self, ticker: str, data: dict) -> bool:
+        """Cache quote (30s soft / 15min hard TTL in market hours, until the next open otherwise)"""
+        soft, hard = self.ttl_policy.ttl(ticker, *QUOTE_TTL)
+        return await self.set(f"quote:{ticker}", data, ttl_seconds=hard, soft_ttl_seconds=soft)
+
+    async def get_quotes(self, tickers: List[str]) -> Dict[str, Optional[CacheEntry]]:
+        """Get cached quote entries for several tickers (single MGET)"""
+        cached = await self.get_many_entries([f"quote:{ticker}" for ticker in tickers])
+        return {ticker: cached.get(f"quote:{ticker}") for ticker in tickers}
+
+    async def set_quotes(self, quotes: Dict[str, dict]) -> bool:
+        """Cache several quotes (TTLs as in set_quote, single pipeline)"""
+        return await self.set_many(
+            {f"quote:{ticker}": data for ticker, data in quotes.items()},
+            ttls={f"quote:{ticker}": self.ttl_policy.ttl(ticker, *QUOTE_TTL) for ticker in quotes}
+        )
+
+    async def get_bars(self, ticker: str, interval: str) -> Tuple[Optional[CacheEntry], int]:
+        """
+        Get the canonical bar store of a ticker/interval
+
+        Returns:
+            (entry holding a HistoryFrame or None, covered span in seconds)
+        """
+        return (await self.get_bars_many([ticker], interval))[ticker]
+
+    async def get_bars_many(
+        self,
+        tickers: List[str],
+        interval: str
+    ) -> Dict[str, Tuple[Optional[CacheEntry], int]]:
+        """Bar stores of several tickers (single MGET), see get_bars"""
+        keys = [f"bars:{ticker}:{interval}" for ticker in tickers]
+        entries = await self.get_many_entries(keys + [f"{key}:span" for key in keys])
+
+        result = {}
+        for ticker, key in zip(tickers, keys):
+            entry, span = entries.get(key), entries.get(f"{key}:span")
+            if not entry or not isinstance(entry.value, HistoryFrame):
+                result[ticker] = (None, 0)
+            else:
+                result[ticker] = (entry, int(span.value) if span else 0)
+        return result
+
+    async def set_bars(self, ticker: str, interval: str, frame: HistoryFrame, span: int) -> bool:
+        """
+        Store the canonical bar series and the span it covers (one pipeline)
+
+        No new bars can appear while the market is closed, so the series
+        stays fresh until the next open.
+        """
+        key = f"bars:{ticker}:{interval}"
+        soft, hard = self.ttl_policy.ttl(ticker, *BARS_TTL.get(interval, BARS_TTL["1d"]))
+        return await self.set_many(
+            {key: frame, f"{key}:span": span},
+            ttl_seconds=hard,
+            soft_ttl_seconds=soft
+        )
+
+    async def get_portfolio_series(self, composition: str) -> Optional[CacheEntry]:
+        """Get a cached portfolio value series by composition hash"""
+        return await self.get_entry(f"portfolio:{composition}")
+
+    async def set_portfolio_series(self, composition: str, data: dict) -> bool:
+        """Cache a portfolio value series (30min soft / 1 day hard TTL)"""
+        soft, hard = PORTFOLIO_TTL
+        return await self.set(
+            f"portfolio:{composition}",
+            data,
+            ttl_seconds=hard,
+            soft_ttl_seconds=soft
+        )
+
+    async def get_replay_checkpoint(self, portfolio_id: str) -> Optional[dict]:
+        """Get the transaction replay checkpoint of a portfolio"""
+        return await self.get(f"replay:{portfolio_id}")
+
+    async def set_replay_checkpoint(self, portfolio_id: str, checkpoint: dict) -> bool:
+        """Cache a transaction replay checkpoint (30 days)"""
+        return await self.set(f"replay:{portfolio_id}", checkpoint, ttl_seconds=REPLAY_TTL)
+
+    async def get_covariance(self, universe: str) -> Optional[CacheEntry]:
+        """Get a cached covariance estimate by universe key"""
+        return await self.get_entry(f"cov:{universe}")
+
+    async def set_covariance(self, universe: str, estimate: CovarianceEstimate) -> bool:
+        """Cache a covariance estimate (binary, 30min soft / 1 day hard TTL)"""
+        soft, hard = COVARIANCE_TTL
+        return await self.set(f"cov:{universe}", estimate, ttl_seconds=hard, soft_ttl_seconds=soft)
+
+    async def get_infos(self, tickers: List[str]) -> Dict[str, Dict[str, Optional[CacheEntry]]]:
+        """
+        Get cached fundamentals of several tickers (single MGET)
+
+        Returns:
+            {ticker: {group: entry or None}} for every group of INFO_TTL
+        """
+        keys = [f"info:{ticker}:{group}" for ticker in tickers for group in INFO_TTL]
+        cached = await self.get_many_entries(keys)
+        return {
+            ticker: {group: cached.get(f"info:{ticker}:{group}") for group in INFO_TTL}
+            for ticker in tickers
         }
-        ttl = ttl_map.get(range, 1800)
-        return self.set(f"history:{ticker}:{range}:{interval}", data, ttl_seconds=ttl)
 
-    def get_fx_rate(self, base: str, quote: str) -> Optional[float]:
-        """Get cached FX rate (1h TTL)"""
-        return self.get(f"fx:{base}:{quote}")
+    async def set_info(self, ticker: str, groups: Dict[str, dict]) -> bool:
+        """Cache a ticker's fundamentals, each group with its INFO_TTL (one pipeline)"""
+        return await self.set_many(
+            {f"info:{ticker}:{group}": data for group, data in groups.items()},
+            ttls={f"info:{ticker}:{group}": INFO_TTL[group] for group in groups}
+        )
+
+    async def get_fx_rates(self, base: str, quotes: List[str]) -> Dict[str, Optional[float]]:
+        """Get cached FX rates of base against several currencies (single MGET)"""
+        cached = await self.get_many([f"fx:{base}:{quote}" for quote in quotes])
+        return {quote: cached.get(f"fx:{base}:{quote}") for quote in quotes}
 
-    def set_fx_rate(self, base: str, quote: str, rate: float) -> bool:
-        """Cache FX rate (1h TTL)"""
-        return self.set(f"fx:{base}:{quote}", rate, ttl_seconds=3600)
+    async def set_fx_rates(self, base: str, rates: Dict[str, float]) -> bool:
+        """Cache several FX rates of base (1h TTL; over the FX weekend close, until the reopen)"""
+        return await self.set_many(
+            {f"fx:{base}:{quote}": rate for quote, rate in rates.items()},
+            ttls={
+                f"fx:{base}:{quote}": self.ttl_policy.ttl(f"{base}{quote}=X", FX_TTL, FX_TTL)
+                for quote in rates
+            }
+        )
@@ -0,0 +1,153 @@
+"""
+Process-wide service container
+
+Owns the shared Redis connection pool, the provider executor and the
+long-lived service instances. Created and closed by the FastAPI lifespan.
+"""
+
+import logging
+from typing import Dict, Optional
+
+import redis.asyncio as redis
+
+from app.config import CacheSettings, ProviderSettings, RedisSettings
+from . import metrics
+from .alert_engine import AlertEngine
+from .cache_service import CacheService
+from .executor import ProviderExecutor, provider_executor
+from .fundamentals_service import FundamentalsService
+from .fx_service import FxService
+from .local_cache import LocalCache
+from .portfolio_service import PortfolioService
+from .providers import MarketDataProvider, build_provider
+from .quant_service import QuantService
+from .quote_feed import QuoteFeed
+from .replay_service import ReplayService
+from .risk_service import RiskService
+from .single_flight import SingleFlight
+from .snapshot_store import SnapshotStore
+from .yfinance_service import YFinanceService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Shared connection pool and service instances for one worker process"""
+
+    def __init__(
+        self,
+        settings: Optional[RedisSettings] = None,
+        redis_client: Optional[redis.Redis] = None,
+        executor: Optional[ProviderExecutor] = None,
+        cache_settings: Optional[CacheSettings] = None,
+        provider: Optional[MarketDataProvider] = None
+    ):
+        self.settings = settings or RedisSettings.from_env()
+        self.cache_settings = cache_settings or CacheSettings.from_env()
+
+        if redis_client is None:
+            self.pool = redis.BlockingConnectionPool.from_url(
+                self.settings.url,
+                max_connections=self.settings.max_connections,
+                timeout=self.settings.pool_timeout,
+                socket_timeout=self.settings.socket_timeout,
+                socket_connect_timeout=self.settings.socket_connect_timeout,
+                health_check_interval=self.settings.health_check_interval,
+                # Raw bytes: history is cached in a binary format
+                decode_responses=False,
+            )
+            redis_client = redis.Redis(connection_pool=self.pool)
+        else:
+            self.pool = redis_client.connection_pool
+
+        self.redis = redis_client
+        self.executor = executor or provider_executor
+
+        local = None
+        if self.cache_settings.l1_enabled:
+            local = LocalCache(max_entries=self.cache_settings.l1_max_entries)
+
+        self.cache = CacheService(self.redis, local)
+        self.flight = SingleFlight(self.redis)
+        self.provider = provider or build_provider(ProviderSettings.from_env(), self.executor)
+        self.yfinance = YFinanceService(self.cache, self.executor, self.flight, self.provider)
+        self.quote_feed = QuoteFeed(self.redis, self.yfinance)
+        self.alerts = AlertEngine(self.redis, self.quote_feed)
+        self.fx = FxService(self.yfinance, self.cache)
+        self.portfolio = PortfolioService(self.yfinance, self.cache, self.flight, self.fx)
+        self.replay = ReplayService(self.yfinance, self.cache)
+        self.risk = RiskService(self.yfinance, self.cache, self.executor, self.flight)
+        self.snapshots = SnapshotStore(executor=self.executor)
+        self.fundamentals = FundamentalsService(self.redis, self.yfinance, self.snapshots)
+        self.quant = QuantService()
+        self._register_metrics()
+
+    async def start(self) -> None:
+        """Start background tasks (L1 invalidation listener, alert engine, prefetch)"""
+        try:
+            await self.cache.start_invalidation_listener()
+        except Exception as e:
+            logger.warning(f"L1 cache disabled, invalidation channel unavailable: {e}")
+            self.cache.local = None
+        try:
+            await self.alerts.start()
+        except Exception as e:
+            logger.warning(f"Alert engine not started: {e}")
+        self.fundamentals.start()
+
+    async def close(self) -> None:
+        """Release pooled connections and stop executor threads"""
+        await self.fundamentals.close()
+        await self.alerts.close()
+        await self.quote_feed.close()
+        await self.portfolio.aclose()
+        await self.yfinance.aclose()
+        await self.cache.stop_invalidation_listener()
+        self.executor.shutdown(wait=False)
+        self.snapshots.close()
+        await self.redis.aclose()
+        await self.pool.disconnect()
+
+    def _register_metrics(self) -> None:
+        """Expose counters the services already keep on /metrics"""
+        metrics.CallbackMetric(
+            "cache_tier_requests_total",
+            "Cache lookups per tier (l1, redis)",
+            "counter",
+            ("tier", "result"),
+            lambda: {
+                (tier, result): count
+                for tier, counts in self.cache.counters.items()
+                for result, count in counts.items()
+            },
+        )
+        metrics.CallbackMetric(
+            "market_data_provider_calls_total",
+            "Provider chain calls per provider (calls, errors, empty, hedged, wins)",
+            "counter",
+            ("provider", "result"),
+            lambda: {
+                (provider, result): count
+                for provider, counts in self.provider.stats().items()
+                for result, count in counts.items()
+            },
+        )
+        metrics.CallbackMetric(
+            "redis_pool_connections",
+            "Redis pool connections in use and idle",
+            "gauge",
+            ("state",),
+            lambda: {("in_use",): self.pool_stats()["inUse"], ("available",): self.pool_stats()["available"]},
+        )
+
+    def pool_stats(self) -> Dict:
+        """Snapshot of the Redis connection pool usage"""
+        available = len(getattr(self.pool, "_available_connections", []))
+        in_use = len(getattr(self.pool, "_in_use_connections", []))
+        return {
+            "maxConnections": self.pool.max_connections,
+            "inUse": in_use,
+            "available": available,
+            "created": in_use + available,
+            "executorWorkers": self.executor.max_workers,
+        }
@@ -0,0 +1,115 @@
+"""
+Shrinkage covariance estimate of a ticker universe and its binary cache
+format
+
+Layout (little-endian):
+    header   magic "COVM" | version u8 | tickers u32 | observations u32
+             | as_of i64 (epoch day) | shrinkage f64 | fresh_until f64
+             | names_len u32 | names utf-8 (NUL-separated)
+    columns  mean float64[n]
+             covariance float64[n * n] (row-major)
+"""
+
+import struct
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b"COVM"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sBIIqddI")
+
+
+class CovarianceEstimate:
+    """Mean and covariance of daily log returns for a set of tickers"""
+
+    __slots__ = ("tickers", "mean", "cov", "observations", "shrinkage", "as_of")
+
+    def __init__(
+        self,
+        tickers: List[str],
+        mean: np.ndarray,
+        cov: np.ndarray,
+        observations: int,
+        shrinkage: float,
+        as_of: int
+    ):
+        self.tickers = tickers
+        self.mean = mean
+        self.cov = cov
+        self.observations = observations
+        self.shrinkage = shrinkage
+        self.as_of = as_of
+
+    def subset(self, tickers: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(mean, covariance) restricted to tickers, in that order"""
+        index = [self.tickers.index(ticker) for ticker in tickers]
+        return self.mean[index], self.cov[np.ix_(index, index)]
+
+
+def ledoit_wolf(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf shrinkage of the sample covariance toward a scaled identity
+
+    Args:
+        returns: (observations x tickers) matrix without NaN
+
+    Returns:
+        (covariance, shrinkage intensity in [0, 1])
+    """
+    t, n = returns.shape
+    x = returns - returns.mean(axis=0)
+    sample = x.T @ x / t
+
+    mu = np.trace(sample) / n
+    target = mu * np.eye(n)
+    d2 = np.sum((sample - target) ** 2) / n
+    if d2 == 0:
+        return sample, 0.0
+
+    # Sum over t of ||x_t x_t' - S||^2 = sum ||x_t||^4 - T ||S||^2
+    b2_bar = (np.sum(np.sum(x * x, axis=1) ** 2) - t * np.sum(sample ** 2)) / (t * t * n)
+    shrinkage = float(min(max(b2_bar, 0.0), d2) / d2)
+    return shrinkage * target + (1 - shrinkage) * sample, shrinkage
+
+
+def encode(estimate: CovarianceEstimate, fresh_until: float = 0.0) -> bytes:
+    """Serialize an estimate (plus its cache freshness deadline) to bytes"""
+    names = "\x00".join(estimate.tickers).encode()
+    header = _HEADER.pack(
+        MAGIC, VERSION, len(estimate.tickers), estimate.observations,
+        estimate.as_of, estimate.shrinkage, fresh_until, len(names),
+    )
+    return b"".join([
+        header,
+        names,
+        np.ascontiguousarray(estimate.mean, dtype="<f8").tobytes(),
+        np.ascontiguousarray(estimate.cov, dtype="<f8").tobytes(),
+    ])
+
+
+def is_encoded(raw) -> bool:
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:4]) == MAGIC
+
+
+def decode(raw: bytes) -> Optional[Tuple[CovarianceEstimate, float]]:
+    """
+    Deserialize bytes written by encode()
+
+    Returns:
+        (estimate, fresh_until), or None if the blob has an unknown version
+    """
+    magic, version, n, observations, as_of, shrinkage, fresh_until, names_len = _HEADER.unpack_from(raw, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+
+    offset = _HEADER.size
+    names = bytes(raw[offset:offset + names_len]).decode()
+    offset += names_len
+    mean = np.frombuffer(raw, dtype="<f8", count=n, offset=offset)
+    offset += n * 8
+    cov = np.frombuffer(raw, dtype="<f8", count=n * n, offset=offset).reshape(n, n)
+
+    tickers = names.split("\x00") if n else []
+    return CovarianceEstimate(tickers, mean, cov, observations, shrinkage, as_of), fresh_until
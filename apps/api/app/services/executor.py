@@ -0,0 +1,78 @@
+"""
+Managed executor for blocking market-data provider calls
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of in-flight upstream calls per data source (per process)
+SOURCE_CONCURRENCY = {
+    "yfinance": int(os.getenv("YFINANCE_MAX_CONCURRENCY", "8")),
+    "snapshots": 1,  # SQLite snapshot store: one writer
+    "simulation": int(os.getenv("SIMULATION_MAX_CONCURRENCY", "2")),  # Monte Carlo risk
+}
+
+
+class ProviderExecutor:
+    """
+    Thread pool that runs blocking provider calls off the event loop
+
+    The pool is sized independently from the default asyncio executor,
+    and every call is also gated by a per-source semaphore so one busy
+    provider cannot occupy all worker threads.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv("PROVIDER_EXECUTOR_WORKERS", "16"))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="provider"
+            )
+        return self._pool
+
+    def _semaphore(self, source: str) -> asyncio.Semaphore:
+        if source not in self._semaphores:
+            limit = SOURCE_CONCURRENCY.get(source, self.max_workers)
+            self._semaphores[source] = asyncio.Semaphore(limit)
+        return self._semaphores[source]
+
+    async def run(self, source: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking call on the pool
+
+        Args:
+            source: Data source name used for the concurrency limit
+            func: Blocking callable
+            *args, **kwargs: Passed to func
+
+        Returns:
+            Whatever func returns
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(source):
+            return await loop.run_in_executor(
+                self.pool,
+                lambda: func(*args, **kwargs)
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker threads"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+        self._semaphores.clear()
+
+
+# Process-wide executor
+provider_executor = ProviderExecutor()
@@ -0,0 +1,172 @@
+"""
+Fundamentals: nightly prefetch for held tickers and an in-memory sector index
+"""
+
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from .snapshot_store import SnapshotStore
+from .yfinance_service import YFinanceService
+
+logger = logging.getLogger(__name__)
+
+UNCLASSIFIED = "Unclassified"
+
+
+class SectorIndex:
+    """Sector and industry of every ticker this worker has seen info for"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._entries
+
+    def update(self, infos: Dict[str, Optional[Dict]]) -> None:
+        """Record the classification of tickers from their info"""
+        for ticker, info in infos.items():
+            if info:
+                self._entries[ticker] = (
+                    info.get("sector") or UNCLASSIFIED,
+                    info.get("industry") or UNCLASSIFIED,
+                )
+
+    def classify(self, ticker: str) -> Tuple[str, str]:
+        return self._entries.get(ticker, (UNCLASSIFIED, UNCLASSIFIED))
+
+    def breakdown(self, values: Dict[str, float]) -> Dict:
+        """
+        Group position values by sector and by industry
+
+        Args:
+            values: Value per ticker (one currency)
+
+        Returns:
+            {"sectors": [...], "industries": [...]}, each a list of
+            {"name", "value", "weight", "tickers"} sorted by value
+        """
+        total = sum(values.values())
+        groups: Dict[str, Dict[str, Dict]] = {"sectors": {}, "industries": {}}
+        for ticker, value in values.items():
+            sector, industry = self.classify(ticker)
+            for kind, name in (("sectors", sector), ("industries", industry)):
+                group = groups[kind].setdefault(name, {"name": name, "value": 0.0, "tickers": []})
+                group["value"] += value
+                group["tickers"].append(ticker)
+
+        result = {}
+        for kind, by_name in groups.items():
+            for group in by_name.values():
+                group["weight"] = group["value"] / total if total else None
+            result[kind] = sorted(by_name.values(), key=lambda g: g["value"], reverse=True)
+        return result
+
+
+class FundamentalsService:
+    """
+    Keeps fundamentals of held tickers cached and serves sector views
+
+    Once a night (FUNDAMENTALS_PREFETCH_HOUR, UTC) one worker, chosen by
+    a per-day Redis lock, refetches info for every ticker in the latest
+    snapshot of any portfolio, so daytime info requests are cache hits.
+    Every worker keeps a SectorIndex filled from the info it serves;
+    breakdowns read the index and only look up tickers it has not seen.
+    """
+
+    LOCK = "fundamentals:prefetch"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        yfinance_service: YFinanceService,
+        snapshots: SnapshotStore,
+        prefetch_hour: Optional[int] = None
+    ):
+        self.redis = redis_client
+        self.yfinance = yfinance_service
+        self.snapshots = snapshots
+        self.prefetch_hour = prefetch_hour if prefetch_hour is not None else int(
+            os.getenv("FUNDAMENTALS_PREFETCH_HOUR", "6")
+        )
+        self.index = SectorIndex()
+        self._task: Optional[asyncio.Task] = None
+
+    async def get_infos(self, tickers: List[str]) -> Dict[str, Optional[Dict]]:
+        """Ticker info (cached, see YFinanceService.get_infos), indexed"""
+        infos = await self.yfinance.get_infos(tickers)
+        self.index.update(infos)
+        return infos
+
+    async def breakdown(self, values: Dict[str, float]) -> Dict:
+        """
+        Sector and industry breakdown of position values
+
+        Tickers already in the index cost nothing; others are looked up
+        once (normally from the fundamentals cache).
+        """
+        unseen = [ticker for ticker in values if ticker not in self.index]
+        if unseen:
+            await self.get_infos(unseen)
+        return self.index.breakdown(values)
+
+    async def prefetch(self) -> Dict:
+        """
+        Refetch info for every held ticker and index it
+
+        Returns:
+            {"tickers", "fetched", "failed"}
+        """
+        tickers = await self.snapshots.held_tickers()
+        if not tickers:
+            return {"tickers": 0, "fetched": 0, "failed": []}
+
+        fetched = await self.yfinance.refresh_infos(tickers)
+        self.index.update(await self.yfinance.get_infos(tickers))
+
+        failed = [ticker for ticker, ok in fetched.items() if not ok]
+        logger.info(f"Prefetched fundamentals of {len(tickers) - len(failed)}/{len(tickers)} held tickers")
+        return {"tickers": len(tickers), "fetched": len(tickers) - len(failed), "failed": failed}
+
+    def start(self) -> None:
+        """Start the nightly prefetch schedule"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._schedule_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _next_run(self, now: datetime) -> datetime:
+        run = now.replace(hour=self.prefetch_hour, minute=0, second=0, microsecond=0)
+        return run if run > now else run + timedelta(days=1)
+
+    async def _schedule_loop(self) -> None:
+        while True:
+            now = datetime.now(timezone.utc)
+            await asyncio.sleep((self._next_run(now) - now).total_seconds())
+            try:
+                await self._run_nightly(datetime.now(timezone.utc).date())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Fundamentals prefetch failed: {e}")
+
+    async def _run_nightly(self, day: date) -> None:
+        """Prefetch if this worker wins the day's lock, else just reindex from cache"""
+        if await self.redis.set(f"{self.LOCK}:{day.isoformat()}", "1", nx=True, ex=86400):
+            await self.prefetch()
+            return
+
+        tickers = await self.snapshots.held_tickers()
+        if tickers:
+            self.index.update(await self.yfinance.get_infos(tickers))
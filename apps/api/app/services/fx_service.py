@@ -0,0 +1,265 @@
+"""
+FX rate matrix: USD-anchored rates, triangulated cross rates and bulk conversion
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .cache_service import CacheService
+from .history_frame import HistoryFrame
+from .yfinance_service import YFinanceService
+
+logger = logging.getLogger(__name__)
+
+# Every currency is fetched against the anchor only; crosses are derived
+ANCHOR = "USD"
+
+
+def anchor_pair(currency: str) -> str:
+    """yfinance ticker of the anchor rate of a currency (USDEUR=X)"""
+    return f"{ANCHOR}{currency}=X"
+
+
+class FxMatrix:
+    """
+    Cross rates of a set of currencies
+
+    per_anchor[i] is the number of units of currencies[i] per one USD
+    (NaN when unknown); every cross rate is per_anchor[quote] /
+    per_anchor[base], so n currencies need n - 1 upstream rates instead
+    of n * (n - 1) pairs.
+    """
+
+    __slots__ = ("currencies", "per_anchor", "_index")
+
+    def __init__(self, currencies: List[str], per_anchor: np.ndarray):
+        self.currencies = currencies
+        self.per_anchor = per_anchor
+        self._index = {currency: i for i, currency in enumerate(currencies)}
+
+    @property
+    def missing(self) -> List[str]:
+        """Currencies without a rate"""
+        return [c for c, rate in zip(self.currencies, self.per_anchor) if np.isnan(rate)]
+
+    def rate(self, base: str, quote: str) -> Optional[float]:
+        """Amount of quote per 1 base, or None if either is unknown"""
+        rate = self._per_anchor(quote) / self._per_anchor(base)
+        return float(rate) if np.isfinite(rate) else None
+
+    def rates(self) -> np.ndarray:
+        """Full cross matrix: [i, j] = units of currencies[j] per 1 currencies[i]"""
+        return self.per_anchor[None, :] / self.per_anchor[:, None]
+
+    def factors(self, currencies: Sequence[str], to: str) -> np.ndarray:
+        """
+        Multiplier converting an amount in each of currencies into to
+
+        Rates are looked up once per distinct currency and gathered onto
+        the input, so the cost is O(n) array work plus one lookup per
+        currency. Unknown currencies give NaN.
+        """
+        codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        per_anchor = np.array([self._per_anchor(code) for code in codes], dtype=np.float64)
+        return (self._per_anchor(to) / per_anchor)[inverse.reshape(-1)]
+
+    def convert(self, amounts: np.ndarray, currencies: Sequence[str], to: str) -> np.ndarray:
+        """Convert amounts (one currency per amount) into to"""
+        return np.asarray(amounts, dtype=np.float64) * self.factors(currencies, to)
+
+    def to_dict(self) -> Dict:
+        return {
+            "anchor": ANCHOR,
+            "currencies": self.currencies,
+            "rates": [
+                [float(rate) if np.isfinite(rate) else None for rate in row]
+                for row in self.rates()
+            ],
+            "missing": self.missing,
+        }
+
+    def _per_anchor(self, currency: str) -> float:
+        if currency == ANCHOR:
+            return 1.0
+        i = self._index.get(currency)
+        return float(self.per_anchor[i]) if i is not None else np.nan
+
+
+class FxHistory:
+    """
+    Daily USD-anchored rates of several currencies
+
+    days are calendar days (days since the epoch, as in
+    HistoryFrame.session_days) and per_anchor has one row per day and one
+    column per currency. Use at() to line the rates up with the days of
+    a price history.
+    """
+
+    __slots__ = ("days", "currencies", "per_anchor", "_index")
+
+    def __init__(self, days: np.ndarray, currencies: List[str], per_anchor: np.ndarray):
+        self.days = days
+        self.currencies = currencies
+        self.per_anchor = per_anchor
+        self._index = {currency: i for i, currency in enumerate(currencies)}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, Optional[HistoryFrame]], currencies: List[str]) -> "FxHistory":
+        """
+        Build from anchor-rate frames keyed by currency (None = unknown)
+
+        The day grid is the union of the frames' days; each currency
+        carries its last rate forward over days it has no bar for.
+        """
+        available = [c for c in currencies if frames.get(c) is not None and len(frames[c])]
+        if not available:
+            return cls(np.empty(0, dtype=np.int64), currencies, np.empty((0, len(currencies))))
+
+        days = np.unique(np.concatenate([frames[c].session_days() for c in available]))
+        per_anchor = np.full((len(days), len(currencies)), np.nan)
+        for column, currency in enumerate(currencies):
+            frame = frames.get(currency)
+            if frame is not None and len(frame):
+                per_anchor[:, column] = _as_of(frame.session_days(), frame.close, days)
+        return cls(days, currencies, per_anchor)
+
+    def at(self, days: np.ndarray) -> "FxHistory":
+        """
+        Rates on other days (e.g. a stock's sessions)
+
+        Each day takes the last rate on or before it; days before the
+        first rate take the first rate.
+        """
+        if not len(self.days):
+            return FxHistory(days, self.currencies, np.full((len(days), len(self.currencies)), np.nan))
+        return FxHistory(days, self.currencies, _as_of(self.days, self.per_anchor, days))
+
+    def factors(self, currencies: Sequence[str], to: str) -> np.ndarray:
+        """
+        Daily multipliers converting each of currencies into to
+
+        Returns:
+            Matrix of shape (days x len(currencies)); NaN where unknown
+        """
+        codes, inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        columns = np.column_stack([self._column(code) for code in codes] or [np.empty((len(self.days), 0))])
+        return (self._column(to)[:, None] / columns)[:, inverse.reshape(-1)]
+
+    def to_dict(self, base: str) -> Dict:
+        """Rates as units of each currency per 1 base, by ISO date"""
+        factors = self.factors(self.currencies, base)
+        return {
+            "base": base,
+            "dates": [str(day) for day in self.days.astype("datetime64[D]")],
+            "rates": {
+                currency: [float(1 / f) if np.isfinite(f) and f else None for f in factors[:, i]]
+                for i, currency in enumerate(self.currencies)
+            },
+        }
+
+    def _column(self, currency: str) -> np.ndarray:
+        if currency == ANCHOR:
+            return np.ones(len(self.days))
+        i = self._index.get(currency)
+        return self.per_anchor[:, i] if i is not None else np.full(len(self.days), np.nan)
+
+
+def _as_of(source_days: np.ndarray, values: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Last value on or before each of days (first value before the start)"""
+    rows = np.clip(np.searchsorted(source_days, days, side="right") - 1, 0, None)
+    return values[rows]
+
+
+class FxService:
+    """
+    FX rates for any set of currencies from one batch of anchor rates
+
+    Only USD/<currency> rates are fetched and cached (fx:USD:<currency>);
+    cross rates are triangulated through USD. A matrix over 30
+    currencies is one MGET plus, for the misses, one bulk download.
+    Daily history uses the shared bar stores of the USD<currency>=X
+    pairs, so it lines up with price history and is cached the same way.
+    """
+
+    def __init__(self, yfinance_service: YFinanceService, cache_service: CacheService):
+        self.yfinance = yfinance_service
+        self.cache = cache_service
+
+    async def get_matrix(self, currencies: Iterable[str]) -> FxMatrix:
+        """
+        Get current rates of currencies against each other
+
+        Args:
+            currencies: ISO codes (any order, duplicates ignored)
+
+        Returns:
+            FxMatrix over the distinct currencies (unknown ones are NaN)
+        """
+        codes = list(dict.fromkeys(c.upper() for c in currencies))
+        others = [c for c in codes if c != ANCHOR]
+
+        rates = await self.cache.get_fx_rates(ANCHOR, others)
+        misses = [c for c in others if not rates.get(c)]
+        if misses:
+            logger.debug(f"Cache miss: {len(misses)} of {len(others)} FX anchor rates")
+            rates.update(await self._fetch_rates(misses))
+
+        per_anchor = np.array(
+            [1.0 if c == ANCHOR else (rates.get(c) or np.nan) for c in codes],
+            dtype=np.float64
+        )
+        return FxMatrix(codes, per_anchor)
+
+    async def get_rate(self, base: str, quote: str) -> Optional[float]:
+        """Amount of quote per 1 base (triangulated through USD)"""
+        base, quote = base.upper(), quote.upper()
+        if base == quote:
+            return 1.0
+        return (await self.get_matrix([base, quote])).rate(base, quote)
+
+    async def convert(self, amounts: Sequence[float], currencies: Sequence[str], to: str) -> np.ndarray:
+        """
+        Convert amounts, each in its own currency, into to
+
+        Returns:
+            Converted amounts (NaN where a rate is unknown)
+        """
+        to = to.upper()
+        currencies = [c.upper() for c in currencies]
+        matrix = await self.get_matrix(currencies + [to])
+        return matrix.convert(np.asarray(amounts, dtype=np.float64), currencies, to)
+
+    async def get_history(self, currencies: Iterable[str], range: str = "1y") -> FxHistory:
+        """
+        Get daily anchor rates of currencies over a range
+
+        Returns:
+            FxHistory over the distinct currencies (unknown ones are NaN)
+        """
+        codes = list(dict.fromkeys(c.upper() for c in currencies))
+        others = [c for c in codes if c != ANCHOR]
+        frames = await self.yfinance.get_history_frames(
+            [anchor_pair(c) for c in others], range=range, interval="1d"
+        )
+        return FxHistory.from_frames({c: frames.get(anchor_pair(c)) for c in others}, codes)
+
+    async def _fetch_rates(self, currencies: List[str]) -> Dict[str, float]:
+        """Fetch anchor rates in one batch and cache them"""
+        quotes = await self.yfinance.refresh_quotes([anchor_pair(c) for c in currencies])
+
+        rates = {}
+        for currency in currencies:
+            quote = quotes.get(anchor_pair(currency))
+            price = quote.get("price") if quote else None
+            if price and np.isfinite(price) and price > 0:
+                rates[currency] = float(price)
+            else:
+                logger.error(f"No FX data for {anchor_pair(currency)}")
+
+        await self.cache.set_fx_rates(ANCHOR, rates)
+        return rates
@@ -0,0 +1,245 @@
+"""
+Columnar OHLCV history and its compact binary cache format
+
+Layout (little-endian):
+    header   magic "OHLC" | version u8 | rows u32 | fresh_until f64
+             | ticker_len u16 | tz_len u16 | ticker utf-8 | tz utf-8
+    columns  timestamp int64[rows] (epoch seconds)
+             open, high, low, close float64[rows]
+             volume int64[rows]
+
+Columns are decoded with np.frombuffer, so reading closes from a cached
+blob does not copy or build per-row objects.
+"""
+
+import struct
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+MAGIC = b"OHLC"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sBIdHH")
+_PRICE_COLUMNS = ("open", "high", "low", "close")
+_COLUMNS = ("timestamps",) + _PRICE_COLUMNS + ("volume",)
+
+# Ranges measured in trading sessions vs calendar spans (seconds)
+RANGE_SESSIONS = {"1d": 1, "5d": 5}
+RANGE_SPANS = {
+    "1d": 86400,
+    "5d": 5 * 86400,
+    "1mo": 31 * 86400,
+    "3mo": 92 * 86400,
+    "6mo": 183 * 86400,
+    "1y": 366 * 86400,
+    "2y": 731 * 86400,
+    "5y": 1827 * 86400,
+    "10y": 3653 * 86400,
+    "max": 100 * 366 * 86400,
+}
+
+
+class HistoryFrame:
+    """OHLCV series for one ticker stored as NumPy columns"""
+
+    __slots__ = ("ticker", "timestamps", "open", "high", "low", "close", "volume", "tz")
+
+    def __init__(
+        self,
+        ticker: str,
+        timestamps: np.ndarray,
+        open: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray,
+        tz: str = ""
+    ):
+        self.ticker = ticker
+        self.timestamps = timestamps
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.tz = tz
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @classmethod
+    def empty(cls, ticker: str, tz: str = "") -> "HistoryFrame":
+        ints, floats = np.empty(0, np.int64), np.empty(0, np.float64)
+        return cls(ticker, ints, floats, floats, floats, floats, ints, tz=tz)
+
+    @classmethod
+    def from_dataframe(cls, ticker: str, hist) -> "HistoryFrame":
+        """Build from a yfinance history DataFrame (DatetimeIndex + OHLCV columns)"""
+        index = hist.index
+        tz = str(index.tz) if index.tz is not None else ""
+        return cls(
+            ticker=ticker,
+            timestamps=index.values.astype("datetime64[s]").astype(np.int64),
+            open=hist["Open"].to_numpy(dtype=np.float64),
+            high=hist["High"].to_numpy(dtype=np.float64),
+            low=hist["Low"].to_numpy(dtype=np.float64),
+            close=hist["Close"].to_numpy(dtype=np.float64),
+            volume=hist["Volume"].fillna(0).to_numpy(dtype=np.int64),
+            tz=tz,
+        )
+
+    def take(self, index) -> "HistoryFrame":
+        """Rows selected by a slice or index array"""
+        return HistoryFrame(
+            self.ticker,
+            *(getattr(self, col)[index] for col in _COLUMNS),
+            tz=self.tz,
+        )
+
+    def since(self, timestamp: int) -> "HistoryFrame":
+        """Rows at or after an epoch timestamp"""
+        start = int(np.searchsorted(self.timestamps, timestamp, side="left"))
+        return self.take(slice(start, None))
+
+    def merge(self, newer: "HistoryFrame") -> "HistoryFrame":
+        """
+        Append newer bars, replacing any overlap
+
+        Bars of self at or after the first bar of newer are dropped, so a
+        partial last bar is replaced by its updated version.
+        """
+        if len(newer) == 0:
+            return self
+        if len(self) == 0:
+            return newer
+
+        keep = int(np.searchsorted(self.timestamps, newer.timestamps[0], side="left"))
+        return HistoryFrame(
+            self.ticker,
+            *(np.concatenate([getattr(self, col)[:keep], getattr(newer, col)]) for col in _COLUMNS),
+            tz=newer.tz or self.tz,
+        )
+
+    def slice_range(self, range: str) -> "HistoryFrame":
+        """
+        Rows covered by a yfinance-style period, anchored at the last bar
+
+        1d/5d select the last N sessions (local calendar days); longer
+        ranges select a calendar span.
+        """
+        if len(self) == 0:
+            return self
+
+        last = int(self.timestamps[-1])
+        sessions = RANGE_SESSIONS.get(range)
+        if sessions is None:
+            return self.since(last - RANGE_SPANS.get(range, RANGE_SPANS["1mo"]) + 1)
+
+        # Local day number of each bar, using the UTC offset of the last bar
+        offset = 0
+        if self.tz:
+            offset = int(datetime.fromtimestamp(last, ZoneInfo(self.tz)).utcoffset().total_seconds())
+        days = (self.timestamps + offset) // 86400
+        first_day = np.unique(days[-sessions * 2000:])[-sessions:][0]
+        return self.since(int(first_day * 86400 - offset))
+
+    def session_days(self) -> np.ndarray:
+        """
+        Local calendar day of each bar, as days since the epoch
+
+        Daily bars are stamped at local midnight, so half a day is added
+        before flooring: a DST change between the bar and the last bar
+        (whose offset is used) can then never move a bar to another day.
+        """
+        offset = 0
+        if self.tz and len(self):
+            last = int(self.timestamps[-1])
+            offset = int(datetime.fromtimestamp(last, ZoneInfo(self.tz)).utcoffset().total_seconds())
+        return (self.timestamps + offset + 43200) // 86400
+
+    def dates(self, start: int = 0, stop: Optional[int] = None) -> list:
+        """ISO-8601 dates in the exchange timezone (same strings yfinance gives)"""
+        timestamps = self.timestamps[start:stop].tolist()
+        if self.tz:
+            tzinfo = ZoneInfo(self.tz)
+            return [datetime.fromtimestamp(ts, tzinfo).isoformat() for ts in timestamps]
+        return [
+            datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+            for ts in timestamps
+        ]
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """API row dicts ({date, open, high, low, close, volume}) of a slice"""
+        rows = zip(
+            self.dates(start, stop),
+            self.open[start:stop].tolist(),
+            self.high[start:stop].tolist(),
+            self.low[start:stop].tolist(),
+            self.close[start:stop].tolist(),
+            self.volume[start:stop].tolist(),
+        )
+        return [
+            {"date": d, "open": o, "high": h, "low": l, "close": c, "volume": v}
+            for d, o, h, l, c, v in rows
+        ]
+
+    def iter_rows(self, chunk_size: int = 1000) -> Iterator[List[Dict]]:
+        """Row dicts in chunks, so only one chunk is materialized at a time"""
+        for start in range(0, len(self), chunk_size):
+            yield self.rows(start, start + chunk_size)
+
+    def to_dict(self) -> Dict:
+        """Render the API JSON shape: {"ticker", "data": [{date, open, ...}]}"""
+        return {"ticker": self.ticker, "data": self.rows()}
+
+
+def encode(frame: HistoryFrame, fresh_until: float = 0.0) -> bytes:
+    """Serialize a frame (plus its cache freshness deadline) to bytes"""
+    ticker = frame.ticker.encode()
+    tz = frame.tz.encode()
+    header = _HEADER.pack(MAGIC, VERSION, len(frame), fresh_until, len(ticker), len(tz))
+    return b"".join([
+        header,
+        ticker,
+        tz,
+        np.ascontiguousarray(frame.timestamps, dtype="<i8").tobytes(),
+        *(np.ascontiguousarray(getattr(frame, col), dtype="<f8").tobytes() for col in _PRICE_COLUMNS),
+        np.ascontiguousarray(frame.volume, dtype="<i8").tobytes(),
+    ])
+
+
+def is_encoded(raw) -> bool:
+    return isinstance(raw, (bytes, bytearray, memoryview)) and bytes(raw[:4]) == MAGIC
+
+
+def decode(raw: bytes) -> Optional[Tuple[HistoryFrame, float]]:
+    """
+    Deserialize bytes written by encode()
+
+    Returns:
+        (frame, fresh_until), or None if the blob has an unknown version
+    """
+    magic, version, rows, fresh_until, ticker_len, tz_len = _HEADER.unpack_from(raw, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+
+    offset = _HEADER.size
+    ticker = bytes(raw[offset:offset + ticker_len]).decode()
+    offset += ticker_len
+    tz = bytes(raw[offset:offset + tz_len]).decode()
+    offset += tz_len
+
+    def column(dtype: str) -> np.ndarray:
+        nonlocal offset
+        values = np.frombuffer(raw, dtype=dtype, count=rows, offset=offset)
+        offset += rows * 8
+        return values
+
+    timestamps = column("<i8")
+    prices = [column("<f8") for _ in _PRICE_COLUMNS]
+    volume = column("<i8")
+
+    return HistoryFrame(ticker, timestamps, *prices, volume, tz=tz), fresh_until
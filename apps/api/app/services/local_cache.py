@@ -0,0 +1,92 @@
+"""
+In-process LRU/TTL cache used as the L1 tier in front of Redis
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# L1 TTLs per key namespace (seconds). Never longer than the Redis TTL.
+DEFAULT_NAMESPACE_TTLS = {
+    "quote": 5,
+    "bars": 300,
+    "fx": 600,
+    "portfolio": 300,
+    "cov": 300,
+    "info": 300,
+}
+
+
+class LocalCache:
+    """
+    Size-bounded LRU cache with per-entry expiry
+
+    Values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        namespace_ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 30
+    ):
+        self.max_entries = max_entries
+        self.namespace_ttls = dict(DEFAULT_NAMESPACE_TTLS, **(namespace_ttls or {}))
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a key
+
+        Returns:
+            (hit, value)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, redis_ttl: Optional[float] = None) -> None:
+        """
+        Store a value
+
+        Args:
+            key: Cache key (namespace is the part before the first ':')
+            value: Decoded value
+            redis_ttl: Remaining TTL of the key in Redis; caps the L1 TTL
+        """
+        ttl = self.ttl_for(key)
+        if redis_ttl is not None:
+            ttl = min(ttl, redis_ttl)
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def ttl_for(self, key: str) -> float:
+        namespace = key.split(":", 1)[0]
+        return self.namespace_ttls.get(namespace, self.default_ttl)
@@ -0,0 +1,287 @@
+"""
+Exchange trading hours and the market-hours-aware cache TTL policy
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta, timezone
+from functools import lru_cache
+from typing import FrozenSet, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+
+@dataclass(frozen=True)
+class Exchange:
+    """Trading calendar of one venue (kind: equity, fx, crypto or unknown)"""
+
+    name: str
+    currency: str
+    tz: str
+    open: dtime = dtime(9, 30)
+    close: dtime = dtime(16, 0)
+    holidays: str = ""              # Holiday rule set, see _holidays()
+    kind: str = "equity"
+
+
+# Exchanges by ticker suffix ("" = US listings)
+EXCHANGES = {
+    "": Exchange("NYSE/Nasdaq", "USD", "America/New_York", holidays="us"),
+    ".TO": Exchange("Toronto", "CAD", "America/Toronto", holidays="ca"),
+    ".T": Exchange("Tokyo", "JPY", "Asia/Tokyo", dtime(9, 0), dtime(15, 30), holidays="jp"),
+    ".DE": Exchange("Xetra", "EUR", "Europe/Berlin", dtime(9, 0), dtime(17, 30), holidays="de"),
+    ".PA": Exchange("Paris", "EUR", "Europe/Paris", dtime(9, 0), dtime(17, 30), holidays="euronext"),
+    ".AS": Exchange("Amsterdam", "EUR", "Europe/Amsterdam", dtime(9, 0), dtime(17, 30), holidays="euronext"),
+    ".L": Exchange("London", "GBP", "Europe/London", dtime(8, 0), dtime(16, 30), holidays="uk"),
+    # Spot FX trades from Sunday 17:00 to Friday 17:00 New York time
+    "=X": Exchange("FX", "", "America/New_York", dtime(17, 0), dtime(17, 0), kind="fx"),
+    "-USD": Exchange("Crypto", "USD", "UTC", kind="crypto"),
+}
+FX = EXCHANGES["=X"]
+# Listings on a venue missing above: no calendar, so always active
+UNKNOWN = Exchange("Unknown", "", "UTC", kind="unknown")
+
+# Longest suffix first so ".TO" is not taken for ".T"
+_SUFFIXES = sorted((suffix for suffix in EXCHANGES if suffix), key=len, reverse=True)
+
+
+def exchange_for(ticker: str) -> Exchange:
+    """
+    Exchange of a ticker from its suffix
+
+    US when there is none; UNKNOWN for a ".XX" suffix not in EXCHANGES
+    (e.g. ".HK"), so its prices are never assumed to be frozen.
+    """
+    for suffix in _SUFFIXES:
+        if ticker.endswith(suffix):
+            return EXCHANGES[suffix]
+    if "." in ticker:
+        return UNKNOWN
+    return EXCHANGES[""]
+
+
+def is_active(exchange: Exchange, now: float, before: float = 0, after: float = 0) -> bool:
+    """
+    Whether prices can move at epoch time now
+
+    Args:
+        before: Seconds before the open already counted as active (warmup)
+        after: Seconds after the close still counted as active (settlement)
+    """
+    if exchange.kind in ("crypto", "unknown"):
+        return True
+    if exchange.kind == "fx":
+        return _fx_closed_until(now, before, after) is None
+
+    session = _session(exchange, _local_date(exchange, now))
+    return session is not None and session[0] - before <= now < session[1] + after
+
+
+def next_open(exchange: Exchange, now: float) -> float:
+    """Epoch time of the next session open after now"""
+    if exchange.kind in ("crypto", "unknown"):
+        return now
+    if exchange.kind == "fx":
+        return _fx_closed_until(now) or now
+
+    day = _local_date(exchange, now)
+    for offset in range(15):
+        session = _session(exchange, day + timedelta(days=offset))
+        if session is not None and session[0] > now:
+            return session[0]
+    return now
+
+
+def _local_date(exchange: Exchange, now: float) -> date:
+    return datetime.fromtimestamp(now, ZoneInfo(exchange.tz)).date()
+
+
+def _session(exchange: Exchange, day: date) -> Optional[Tuple[float, float]]:
+    """(open, close) epoch times of a trading day, None if the market is shut"""
+    if day.weekday() >= 5 or day in _holidays(exchange.holidays, day.year):
+        return None
+    tz = ZoneInfo(exchange.tz)
+    return (
+        datetime.combine(day, exchange.open, tz).timestamp(),
+        datetime.combine(day, exchange.close, tz).timestamp(),
+    )
+
+
+def _fx_closed_until(now: float, before: float = 0, after: float = 0) -> Optional[float]:
+    """Reopen time if FX is closed at now (Friday close to Sunday open), else None"""
+    tz = ZoneInfo(FX.tz)
+    local = datetime.fromtimestamp(now, tz)
+    friday = local.date() - timedelta(days=(local.weekday() - 4) % 7)
+    closes = datetime.combine(friday, FX.close, tz).timestamp()
+    opens = datetime.combine(friday + timedelta(days=2), FX.open, tz).timestamp()
+    if closes + after <= now < opens - before:
+        return opens
+    return None
+
+
+# Holiday rule sets. Dates follow each venue's published rules; Tokyo's
+# equinox days use the standard approximation.
+
+def _easter(year: int) -> date:
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """n-th (1-based; -1 = last) weekday (0 = Monday) of a month"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day: date, saturday_to_friday: bool = True) -> date:
+    """Weekend holiday moved to the nearest weekday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1) if saturday_to_friday else day + timedelta(days=2)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=128)
+def _holidays(rules: str, year: int) -> FrozenSet[date]:
+    if not rules:
+        return frozenset()
+
+    easter = _easter(year)
+    good_friday, easter_monday = easter - timedelta(days=2), easter + timedelta(days=1)
+    days = set()
+
+    if rules == "us":
+        new_year = date(year, 1, 1)
+        if new_year.weekday() != 5:  # No Friday close when it falls on Saturday
+            days.add(_observed(new_year))
+        days.update([
+            _nth_weekday(year, 1, 0, 3), _nth_weekday(year, 2, 0, 3), good_friday,
+            _nth_weekday(year, 5, 0, -1), _observed(date(year, 7, 4)),
+            _nth_weekday(year, 9, 0, 1), _nth_weekday(year, 11, 3, 4),
+            _observed(date(year, 12, 25)),
+        ])
+        if year >= 2022:
+            days.add(_observed(date(year, 6, 19)))
+    elif rules == "ca":
+        victoria = date(year, 5, 24) - timedelta(days=date(year, 5, 24).weekday())
+        days.update([
+            _observed(date(year, 1, 1), False), _nth_weekday(year, 2, 0, 3), good_friday, victoria,
+            _observed(date(year, 7, 1), False), _nth_weekday(year, 8, 0, 1),
+            _nth_weekday(year, 9, 0, 1), _nth_weekday(year, 10, 0, 2),
+        ])
+        christmas, boxing = date(year, 12, 25), date(year, 12, 26)
+        if christmas.weekday() >= 5:
+            christmas, boxing = christmas + timedelta(days=2), boxing + timedelta(days=2)
+        elif boxing.weekday() >= 5:
+            boxing += timedelta(days=2)
+        days.update([christmas, boxing])
+    elif rules == "uk":
+        christmas, boxing = date(year, 12, 25), date(year, 12, 26)
+        if christmas.weekday() >= 5:
+            christmas, boxing = christmas + timedelta(days=2), boxing + timedelta(days=2)
+        elif boxing.weekday() >= 5:
+            boxing += timedelta(days=2)
+        days.update([
+            _observed(date(year, 1, 1), False), good_friday, easter_monday,
+            _nth_weekday(year, 5, 0, 1), _nth_weekday(year, 5, 0, -1),
+            _nth_weekday(year, 8, 0, -1), christmas, boxing,
+        ])
+    elif rules in ("de", "euronext"):
+        days.update([
+            date(year, 1, 1), good_friday, easter_monday, date(year, 5, 1),
+            date(year, 12, 25), date(year, 12, 26),
+        ])
+        if rules == "de":
+            days.update([date(year, 12, 24), date(year, 12, 31)])
+    elif rules == "jp":
+        offset = year - 1980
+        spring = int(20.8431 + 0.242194 * offset - offset // 4)
+        autumn = int(23.2488 + 0.242194 * offset - offset // 4)
+        national = [
+            date(year, 1, 1), date(year, 2, 11), date(year, 2, 23), date(year, 3, spring),
+            date(year, 4, 29), date(year, 5, 3), date(year, 5, 4), date(year, 5, 5),
+            date(year, 8, 11), date(year, 9, autumn), date(year, 11, 3), date(year, 11, 23),
+            _nth_weekday(year, 1, 0, 2), _nth_weekday(year, 7, 0, 3),
+            _nth_weekday(year, 9, 0, 3), _nth_weekday(year, 10, 0, 2),
+        ]
+        days.update(national)
+        # Substitute holiday: a Sunday holiday moves to the next non-holiday
+        for day in national:
+            if day.weekday() == 6:
+                substitute = day + timedelta(days=1)
+                while substitute in days:
+                    substitute += timedelta(days=1)
+                days.add(substitute)
+        # Citizens' holiday: a weekday between two holidays
+        for day in list(days):
+            between = day + timedelta(days=1)
+            if day + timedelta(days=2) in days and between not in days and between.weekday() < 5:
+                days.add(between)
+        # Exchange year-end closure
+        days.update([date(year, 1, 2), date(year, 1, 3), date(year, 12, 31)])
+
+    return frozenset(days)
+
+
+class TtlPolicy:
+    """
+    Cache TTLs that follow the trading hours of a ticker's exchange
+
+    During a session (plus a settlement window after the close, so the
+    final close is picked up, and a warmup window before the open, so the
+    cache is refreshed as trading starts) the base TTLs apply. Outside it
+    prices cannot move, so entries stay fresh until the warmup before the
+    next open and the Redis expiry is pushed out by the same amount.
+    Tickers of an exchange without a calendar always get the base TTLs.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        warmup_seconds: Optional[float] = None,
+        settle_seconds: Optional[float] = None
+    ):
+        if enabled is None:
+            enabled = os.getenv("MARKET_HOURS_TTL", "true").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self.warmup = warmup_seconds if warmup_seconds is not None else float(os.getenv("MARKET_WARMUP_SECONDS", "300"))
+        self.settle = settle_seconds if settle_seconds is not None else float(os.getenv("MARKET_SETTLE_SECONDS", "900"))
+
+    def is_active(self, ticker: str, now: Optional[float] = None) -> bool:
+        """Whether a ticker's price can change now (including warmup/settle)"""
+        if not self.enabled:
+            return True
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        return is_active(exchange_for(ticker), now, self.warmup, self.settle)
+
+    def ttl(self, ticker: str, soft: int, hard: int, now: Optional[float] = None) -> Tuple[int, int]:
+        """
+        (soft, hard) TTL for a ticker's market data written now
+
+        Args:
+            ticker: Ticker (or "EURUSD=X"-style FX pair)
+            soft, hard: Base TTLs that apply while the market is active
+        """
+        if not self.enabled:
+            return soft, hard
+        now = now if now is not None else datetime.now(timezone.utc).timestamp()
+        exchange = exchange_for(ticker)
+        if is_active(exchange, now, self.warmup, self.settle):
+            return soft, hard
+
+        quiet = int(next_open(exchange, now) - self.warmup - now)
+        if quiet <= soft:
+            return soft, hard
+        return quiet, quiet + hard
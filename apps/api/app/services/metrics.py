@@ -0,0 +1,276 @@
+"""
+Prometheus metrics and per-request stage timing
+
+Metrics are prometheus_client collectors in its default registry,
+rendered by GET /metrics (each worker process exposes its own). Stage
+timing attributes the wall time of a request to cache, fetch, wait,
+compute and serialize; with OTEL_SPANS_ENABLED and opentelemetry-api
+installed, every stage is also an OpenTelemetry span.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers L1 hits (sub-ms) up to slow upstream calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stages spent waiting on I/O; compute is request time outside all of them
+IO_STAGES = ("cache", "fetch", "wait")
+
+Labels = Tuple[str, ...]
+
+
+class CallbackMetric:
+    """
+    Values read from a callback at scrape time, for state other objects
+    already keep (pool usage, provider counters)
+
+    The callback returns {label values: value}. A later metric of the
+    same name replaces the earlier one (e.g. a rebuilt service container).
+    """
+
+    _FAMILIES = {"counter": CounterMetricFamily, "gauge": GaugeMetricFamily}
+    _registered: Dict[str, "CallbackMetric"] = {}
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        labelnames: Sequence[str],
+        callback: Callable[[], Dict[Labels, float]],
+        registry=REGISTRY
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.family = self._FAMILIES[type]
+        self.labelnames = list(labelnames)
+        self.callback = callback
+        self.registry = registry
+
+        previous = self._registered.pop(name, None)
+        if previous is not None:
+            previous.registry.unregister(previous)
+        registry.register(self)
+        self._registered[name] = self
+
+    def describe(self):
+        # Lets the registry check for name clashes without calling back
+        return [self.family(self.name, self.documentation, labels=self.labelnames)]
+
+    def collect(self):
+        family = self.family(self.name, self.documentation, labels=self.labelnames)
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} unavailable: {e}")
+            return
+        for labels, value in values.items():
+            family.add_metric(list(labels), value)
+        yield family
+
+
+# Hot-path metrics shared by the services
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the last body byte",
+    ("method", "route", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "http_request_stage_duration_seconds",
+    "Wall time of a request spent per stage (cache, fetch, wait, compute, serialize)",
+    ("route", "stage"),
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "market_data_request_duration_seconds",
+    "Latency of market data provider calls",
+    ("provider", "call", "outcome"),
+    buckets=LATENCY_BUCKETS,
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trips of the cache",
+    ("command",),
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Cache lookups by namespace and result (hit = fresh, stale = served while refreshed)",
+    ("namespace", "result"),
+)
+
+
+class RequestTimings:
+    """
+    Wall time per stage of one request
+
+    A stage entered several times concurrently (e.g. gathered cache
+    reads) counts the time any of them was running, once.
+    """
+
+    __slots__ = ("totals", "endpoint", "response_started", "_open", "_since")
+
+    def __init__(self):
+        self.totals: Dict[str, float] = {}
+        self.endpoint: Optional[Tuple[float, float]] = None
+        self.response_started: Optional[float] = None
+        self._open: Dict[str, int] = {}
+        self._since: Dict[str, float] = {}
+
+    def enter(self, stage: str, now: float) -> None:
+        depth = self._open.get(stage, 0)
+        if not depth:
+            self._since[stage] = now
+        self._open[stage] = depth + 1
+
+    def exit(self, stage: str, now: float) -> None:
+        depth = self._open.get(stage, 0) - 1
+        self._open[stage] = depth
+        if depth == 0:
+            self.totals[stage] = self.totals.get(stage, 0.0) + now - self._since[stage]
+
+    def stages(self) -> Dict[str, float]:
+        """
+        Seconds per stage, with compute = endpoint time outside I/O stages
+        and serialize = endpoint return to response start
+        """
+        stages = {stage: seconds for stage, seconds in self.totals.items() if stage != "io"}
+        if self.endpoint is not None:
+            started, finished = self.endpoint
+            stages["compute"] = max(finished - started - self.totals.get("io", 0.0), 0.0)
+            if self.response_started is not None:
+                stages["serialize"] = max(self.response_started - finished, 0.0)
+        return stages
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """Timings of the request being handled, if any"""
+    return _timings.get()
+
+
+def begin_request() -> Tuple[RequestTimings, object]:
+    """Start timing a request in this context; pass the token to end_request"""
+    timings = RequestTimings()
+    return timings, _timings.set(timings)
+
+
+def end_request(token) -> None:
+    _timings.reset(token)
+
+
+def detached_task(coro) -> asyncio.Task:
+    """
+    Start a task outside the current request
+
+    Tasks copy the context they are created in, so a background refresh
+    spawned by a request would otherwise add its stages to that request's
+    timings, even after the request has finished.
+    """
+    return asyncio.create_task(coro, context=Context())
+
+
+def _make_tracer():
+    if os.getenv("OTEL_SPANS_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("OTEL_SPANS_ENABLED is set but opentelemetry-api is not installed")
+        return None
+    return trace.get_tracer("investment-dashboard")
+
+
+tracer = _make_tracer()
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, str]] = None) -> Iterator[None]:
+    """OpenTelemetry span around the block (no-op unless enabled)"""
+    if tracer is None:
+        yield
+        return
+    with tracer.start_as_current_span(name, attributes=attributes):
+        yield
+
+
+@contextmanager
+def stage(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    """
+    Attribute the block to a stage of the current request
+
+    Outside a request only the span (if enabled) is recorded.
+
+    Args:
+        name: cache, fetch or wait (compute and serialize are derived)
+        detail: Operation within the stage, used as the span name suffix
+    """
+    timings = _timings.get()
+    io = name in IO_STAGES
+    if timings is not None:
+        now = time.perf_counter()
+        timings.enter(name, now)
+        if io:
+            timings.enter("io", now)
+    try:
+        if tracer is None:
+            yield
+        else:
+            with tracer.start_as_current_span(f"{name} {detail}" if detail else name):
+                yield
+    finally:
+        if timings is not None:
+            now = time.perf_counter()
+            timings.exit(name, now)
+            if io:
+                timings.exit("io", now)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, timings: RequestTimings) -> None:
+    """Record the latency and stage breakdown of a finished request"""
+    REQUEST_LATENCY.labels(method, route, str(status)).observe(seconds)
+    for name, stage_seconds in timings.stages().items():
+        STAGE_LATENCY.labels(route, name).observe(stage_seconds)
+
+
+def cache_namespace(key: str) -> Optional[str]:
+    """Metrics namespace of a cache key (None for bookkeeping keys)"""
+    prefix, _, rest = key.partition(":")
+    if prefix == "bars":
+        # bars:<ticker>:<interval>:span is metadata of the bar store
+        return None if rest.endswith(":span") else "history"
+    return _NAMESPACES.get(prefix, "other")
+
+
+_NAMESPACES = {
+    "quote": "quote",
+    "fx": "fx",
+    "info": "info",
+    "portfolio": "portfolio",
+    "cov": "covariance",
+    "replay": "replay",
+}
+
+
+def count_lookups(keys: List[str], entries: Sequence[Optional[object]]) -> None:
+    """Count hit/stale/miss per namespace for cache entries read for keys"""
+    for key, entry in zip(keys, entries):
+        namespace = cache_namespace(key)
+        if namespace is None:
+            continue
+        result = "miss" if entry is None else ("stale" if entry.stale else "hit")
+        CACHE_REQUESTS.labels(namespace, result).inc()
@@ -0,0 +1,237 @@
+"""
+Portfolio value series built from constituent price histories
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .cache_service import CacheService
+from .fx_service import FxService
+from .history_frame import HistoryFrame
+from .market_hours import exchange_for
+from .metrics import detached_task
+from .single_flight import SingleFlight
+from .yfinance_service import YFinanceService
+
+logger = logging.getLogger(__name__)
+
+
+class PortfolioSeries:
+    """
+    Daily market value of a fixed set of holdings
+
+    days are local calendar days (days since the epoch, see
+    HistoryFrame.session_days) shared by all constituents.
+    """
+
+    __slots__ = ("days", "values", "tickers", "missing")
+
+    def __init__(
+        self,
+        days: np.ndarray,
+        values: np.ndarray,
+        tickers: List[str],
+        missing: Optional[List[str]] = None
+    ):
+        self.days = days
+        self.values = values
+        self.tickers = tickers
+        self.missing = missing or []
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def to_dict(self) -> Dict:
+        return {
+            "days": self.days.tolist(),
+            "values": self.values.tolist(),
+            "tickers": self.tickers,
+            "missing": self.missing,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "PortfolioSeries":
+        return cls(
+            days=np.asarray(data["days"], dtype=np.int64),
+            values=np.asarray(data["values"], dtype=np.float64),
+            tickers=data["tickers"],
+            missing=data.get("missing"),
+        )
+
+
+def composition_hash(
+    holdings: Dict[str, float],
+    range: str,
+    interval: str = "1d",
+    currency: Optional[str] = None
+) -> str:
+    """Stable key for a set of holdings (order-independent)"""
+    key = [sorted((ticker, round(quantity, 8)) for ticker, quantity in holdings.items()), range, interval]
+    if currency:
+        key.append(currency)
+    payload = json.dumps(key, separators=(",", ":"))
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaN down the rows of a 2-D array (leading NaN stay)"""
+    # Index of the last valid row at or above each row
+    rows = np.where(~np.isnan(values), np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+def align_closes(
+    frames: Dict[str, HistoryFrame],
+    tickers: List[str],
+    trim: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Align closes of several frames on the union of their session days
+
+    Gaps (holidays on one exchange, missing bars) are forward-filled.
+    With trim, rows before every ticker has a first price are dropped;
+    otherwise they are kept with NaN for the tickers not yet priced.
+
+    Returns:
+        (days, closes matrix of shape (days x tickers))
+    """
+    session_days = [frames[ticker].session_days() for ticker in tickers]
+    days = np.unique(np.concatenate(session_days))
+
+    closes = np.full((len(days), len(tickers)), np.nan)
+    for column, (ticker, frame_days) in enumerate(zip(tickers, session_days)):
+        closes[np.searchsorted(days, frame_days), column] = frames[ticker].close
+
+    closes = forward_fill(closes)
+    if not trim:
+        return days, closes
+
+    complete = ~np.isnan(closes).any(axis=1)
+    start = int(np.argmax(complete)) if complete.any() else len(days)
+    return days[start:], closes[start:]
+
+
+class PortfolioService:
+    """
+    Builds the weighted portfolio value series for a set of holdings
+
+    Constituent histories come from the bar stores in one batched read;
+    the resulting series is cached per composition hash so repeat
+    dashboard loads skip the rebuild; a stale series is served while it
+    is rebuilt in the background. With a currency, each constituent
+    is converted at the daily FX rate of its own day.
+    """
+
+    def __init__(
+        self,
+        yfinance_service: YFinanceService,
+        cache_service: CacheService,
+        flight: Optional[SingleFlight] = None,
+        fx_service: Optional[FxService] = None
+    ):
+        self.yfinance = yfinance_service
+        self.cache = cache_service
+        self.flight = flight or SingleFlight()
+        self.fx = fx_service or FxService(yfinance_service, cache_service)
+        self._background: Set[asyncio.Task] = set()
+
+    async def get_value_series(
+        self,
+        holdings: Dict[str, float],
+        range: str = "1y",
+        currency: Optional[str] = None
+    ) -> Optional[PortfolioSeries]:
+        """
+        Get the daily value series of fixed holdings over a range
+
+        A stale cached series is returned immediately and rebuilt in the
+        background; callers only wait for a rebuild when nothing is cached.
+
+        Args:
+            holdings: Quantity per ticker
+            range: History range (1mo, 3mo, 1y, ...)
+            currency: Value the series in this currency (default: each
+                ticker's own currency, summed as is)
+
+        Returns:
+            PortfolioSeries, or None if no constituent has history
+        """
+        holdings = {ticker: quantity for ticker, quantity in holdings.items() if quantity}
+        if not holdings:
+            return None
+
+        currency = currency.upper() if currency else None
+        composition = composition_hash(holdings, range, currency=currency)
+        cached = await self.cache.get_portfolio_series(composition)
+
+        def build():
+            return self._build_series(composition, holdings, range, currency)
+
+        if cached:
+            if cached.stale:
+                self._revalidate(f"portfolio:{composition}", build)
+            else:
+                logger.debug(f"Cache hit: portfolio {composition}")
+            return PortfolioSeries.from_dict(cached.value)
+
+        return await self.flight.do(f"portfolio:{composition}", build)
+
+    def _revalidate(self, key: str, build) -> None:
+        """Schedule a background rebuild of a stale series (deduplicated)"""
+        task = detached_task(self.flight.refresh(key, build))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Background portfolio rebuild failed: {task.exception()}")
+
+    async def aclose(self) -> None:
+        """Cancel pending background rebuilds"""
+        tasks = list(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _build_series(
+        self,
+        composition: str,
+        holdings: Dict[str, float],
+        range: str,
+        currency: Optional[str] = None
+    ) -> Optional[PortfolioSeries]:
+        """Fetch constituent histories, align them and cache the weighted sum"""
+        tickers = sorted(holdings)
+        currencies = {ticker: exchange_for(ticker).currency or "USD" for ticker in tickers}
+
+        histories = self.yfinance.get_history_frames(tickers, range=range, interval="1d")
+        if currency and set(currencies.values()) != {currency}:
+            frames, fx = await asyncio.gather(
+                histories,
+                self.fx.get_history(list(currencies.values()) + [currency], range=range)
+            )
+        else:
+            frames, fx = await histories, None
+
+        available = [ticker for ticker in tickers if frames.get(ticker) is not None and len(frames[ticker])]
+        missing = [ticker for ticker in tickers if ticker not in available]
+        if missing:
+            logger.warning(f"No history for {missing}, excluded from portfolio {composition}")
+        if not available:
+            return None
+
+        days, closes = align_closes(frames, available)
+        if fx is not None:
+            closes = closes * fx.at(days).factors([currencies[t] for t in available], currency)
+        quantities = np.array([holdings[ticker] for ticker in available], dtype=np.float64)
+        series = PortfolioSeries(days, closes @ quantities, available, missing)
+
+        await self.cache.set_portfolio_series(composition, series.to_dict())
+        return series
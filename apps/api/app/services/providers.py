@@ -0,0 +1,527 @@
+"""
+Market-data providers: yfinance, a file-backed replay source, and a chain
+with priority fallback and hedged requests
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from app.config import ProviderSettings
+from .executor import ProviderExecutor, provider_executor
+from .history_frame import HistoryFrame, RANGE_SPANS
+from .market_hours import exchange_for
+from .metrics import UPSTREAM_LATENCY
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """A provider call failed (as opposed to finding no data)"""
+
+
+def build_quote(ticker: str, closes: Sequence[float]) -> Dict:
+    """Build a quote dict from the last two closes of a price series"""
+    price = closes[-1]
+    prev_close = closes[-2] if len(closes) > 1 else closes[-1]
+
+    change = price - prev_close
+    change_percent = (change / prev_close) * 100 if prev_close != 0 else 0
+
+    return {
+        "ticker": ticker,
+        "price": float(price),
+        "change": float(change),
+        "changePercent": float(change_percent),
+        "currency": exchange_for(ticker).currency or "USD",
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+class MarketDataProvider(ABC):
+    """
+    Source of quotes, bars and ticker info (FX pairs are tickers too)
+
+    Methods return None (or leave a ticker out) when the source has no
+    data, and raise when the call itself fails, so a chain can tell a
+    miss from an outage.
+    """
+
+    name = "provider"
+
+    @abstractmethod
+    async def quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Quotes of the tickers the source knows (see build_quote)"""
+
+    @abstractmethod
+    async def history(
+        self,
+        ticker: str,
+        interval: str,
+        period: Optional[str] = None,
+        start: Optional[str] = None
+    ) -> Optional[HistoryFrame]:
+        """
+        Bars over a period, or since a start date
+
+        Returns:
+            HistoryFrame (empty if there are no bars after start), or None
+            for an unknown ticker
+        """
+
+    @abstractmethod
+    async def info(self, ticker: str) -> Optional[Dict]:
+        """Raw ticker info, with yfinance field names"""
+
+    def stats(self) -> Dict:
+        """Call counters, if the provider keeps any"""
+        return {}
+
+
+class YFinanceProvider(MarketDataProvider):
+    """
+    yfinance (Yahoo Finance)
+
+    yfinance is blocking, so every call runs on the provider executor
+    under the "yfinance" source.
+    """
+
+    name = "yfinance"
+
+    def __init__(self, executor: Optional[ProviderExecutor] = None):
+        self.executor = executor or provider_executor
+
+    async def quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        """One bulk download, then per-ticker fetches for anything it missed"""
+        results = await self._download_quotes(tickers)
+
+        remaining = [ticker for ticker in tickers if ticker not in results]
+        if remaining:
+            quotes = await asyncio.gather(
+                *(self._fetch_quote(ticker) for ticker in remaining),
+                return_exceptions=True
+            )
+            errors = []
+            for ticker, quote in zip(remaining, quotes):
+                if isinstance(quote, Exception):
+                    logger.error(f"Error fetching quote for {ticker}: {quote}")
+                    errors.append(quote)
+                elif quote:
+                    results[ticker] = quote
+            # Every call failed: report an outage rather than "no data"
+            if errors and not results:
+                raise ProviderError(f"yfinance quotes failed: {errors[0]}")
+        return results
+
+    async def _fetch_quote(self, ticker: str) -> Optional[Dict]:
+        hist = await self.executor.run(
+            "yfinance",
+            lambda: yf.Ticker(ticker).history(period="2d")  # 2 days to calculate change
+        )
+
+        if hist.empty:
+            logger.error(f"No data for {ticker}")
+            return None
+
+        return build_quote(ticker, hist["Close"].to_numpy())
+
+    async def _download_quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch quotes for several tickers with a single yf.download call
+
+        Returns:
+            Dict with a quote for every ticker the bulk call resolved;
+            tickers missing from the result are left out
+        """
+        if len(tickers) < 2:
+            return {}
+
+        try:
+            frame = await self.executor.run(
+                "yfinance",
+                yf.download,
+                tickers,
+                period="2d",
+                group_by="ticker",
+                threads=True,
+                progress=False,
+            )
+        except Exception as e:
+            logger.warning(f"Bulk download failed for {len(tickers)} tickers: {e}")
+            return {}
+
+        if frame is None or frame.empty:
+            return {}
+
+        results = {}
+        for ticker in tickers:
+            try:
+                closes = frame[ticker]["Close"].dropna()
+            except KeyError:
+                continue
+            if closes.empty:
+                continue
+            results[ticker] = build_quote(ticker, closes.to_numpy())
+
+        return results
+
+    async def history(
+        self,
+        ticker: str,
+        interval: str,
+        period: Optional[str] = None,
+        start: Optional[str] = None
+    ) -> Optional[HistoryFrame]:
+        hist = await self.executor.run(
+            "yfinance",
+            lambda: yf.Ticker(ticker).history(period=period, start=start, interval=interval)
+        )
+
+        if hist.empty:
+            if start is not None:
+                return HistoryFrame.empty(ticker)
+            logger.error(f"No history for {ticker} {period} {interval}")
+            return None
+
+        return HistoryFrame.from_dataframe(ticker, hist)
+
+    async def info(self, ticker: str) -> Optional[Dict]:
+        return await self.executor.run(
+            "yfinance",
+            lambda: yf.Ticker(ticker).info
+        ) or None
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Recorded market data served from local files, for offline runs
+
+    Layout of the data directory:
+        <TICKER>.csv | .parquet              daily bars
+        <TICKER>_<interval>.csv | .parquet   other intervals (5m, 1h, ...)
+        info/<TICKER>.json                   ticker info (yfinance fields)
+
+    Bar files use yfinance's DataFrame.to_csv() layout: a Date/Datetime
+    column plus Open, High, Low, Close and Volume. Naive timestamps are
+    taken in the exchange's time zone. FX pairs are plain tickers
+    (USDEUR=X.csv).
+
+    "Now" is the last recorded bar, or as_of when set, so quotes and
+    periods do not move with the wall clock. Each call can be delayed
+    (latency +- jitter) and failed (failure_rate) to emulate a remote
+    source; the draws are seeded per call key and call number, so a run
+    is reproducible whatever the interleaving of concurrent requests.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        directory: str,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        as_of: Optional[str] = None,
+        executor: Optional[ProviderExecutor] = None
+    ):
+        self.directory = directory
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.as_of = int(pd.Timestamp(as_of, tz="UTC").timestamp()) + 86399 if as_of else None
+        self.executor = executor or provider_executor
+
+        self._frames: Dict[Tuple[str, str], Optional[HistoryFrame]] = {}
+        self._calls: Dict[str, int] = {}
+
+    async def quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        await self._inject("quotes", ",".join(tickers))
+        results = {}
+        for ticker in tickers:
+            frame = await self._frame(ticker, "1d")
+            if frame is not None and len(frame):
+                results[ticker] = build_quote(ticker, frame.close[-2:])
+        return results
+
+    async def history(
+        self,
+        ticker: str,
+        interval: str,
+        period: Optional[str] = None,
+        start: Optional[str] = None
+    ) -> Optional[HistoryFrame]:
+        await self._inject("history", f"{ticker}:{interval}")
+        frame = await self._frame(ticker, interval)
+        if frame is None or not len(frame):
+            return None
+
+        if start is not None:
+            tz = frame.tz or "UTC"
+            return frame.since(int(pd.Timestamp(start).tz_localize(tz).timestamp()))
+        span = RANGE_SPANS.get(period or "1mo", RANGE_SPANS["1mo"])
+        return frame.since(int(frame.timestamps[-1]) - span + 1)
+
+    async def info(self, ticker: str) -> Optional[Dict]:
+        await self._inject("info", ticker)
+        path = os.path.join(self.directory, "info", f"{ticker}.json")
+        if not os.path.exists(path):
+            return None
+        return await self.executor.run("replay", _read_json, path)
+
+    async def _inject(self, method: str, key: str) -> None:
+        """Apply the configured latency and failure rate to one call"""
+        if not (self.latency_ms or self.jitter_ms or self.failure_rate):
+            return
+        call = f"{method}:{key}"
+        n = self._calls.get(call, 0)
+        self._calls[call] = n + 1
+        rng = random.Random(f"{self.seed}:{call}:{n}")
+
+        delay = self.latency_ms + self.jitter_ms * (2 * rng.random() - 1)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if rng.random() < self.failure_rate:
+            raise ProviderError(f"Injected replay failure: {call}")
+
+    async def _frame(self, ticker: str, interval: str) -> Optional[HistoryFrame]:
+        """Recorded bars of a ticker/interval (read once, then kept in memory)"""
+        key = (ticker, interval)
+        if key not in self._frames:
+            self._frames[key] = await self.executor.run("replay", self._load, ticker, interval)
+        return self._frames[key]
+
+    def _load(self, ticker: str, interval: str) -> Optional[HistoryFrame]:
+        names = [f"{ticker}_{interval}"] + ([ticker] if interval == "1d" else [])
+        for name in names:
+            for ext, read in ((".parquet", pd.read_parquet), (".csv", pd.read_csv)):
+                path = os.path.join(self.directory, name + ext)
+                if os.path.exists(path):
+                    frame = HistoryFrame.from_dataframe(ticker, _bars_frame(read(path), exchange_for(ticker).tz))
+                    if self.as_of is not None:
+                        frame = frame.take(slice(0, int(np.searchsorted(frame.timestamps, self.as_of, side="right"))))
+                    return frame
+        return None
+
+
+def _read_json(path: str) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _bars_frame(frame: pd.DataFrame, tz: str) -> pd.DataFrame:
+    """Recorded bars with a sorted, time-zone-aware DatetimeIndex"""
+    if not isinstance(frame.index, pd.DatetimeIndex):
+        column = next((c for c in ("Datetime", "Date", "date", "timestamp") if c in frame.columns), frame.columns[0])
+        stamps = frame.pop(column).astype(str)
+        # Offsets differ across DST changes, so parse those through UTC
+        if stamps.str.contains(r"(?:[+-]\d\d:\d\d|Z)$").any():
+            frame.index = pd.DatetimeIndex(pd.to_datetime(stamps, utc=True)).tz_convert(tz)
+        else:
+            frame.index = pd.DatetimeIndex(pd.to_datetime(stamps))
+    if frame.index.tz is None:
+        frame.index = frame.index.tz_localize(tz)
+    if "Volume" not in frame.columns:
+        frame["Volume"] = 0
+    return frame.sort_index()
+
+
+def write_bars(directory: str, frame: HistoryFrame, interval: str = "1d") -> str:
+    """
+    Record bars in the replay layout (CSV)
+
+    Returns:
+        Path of the written file
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = frame.ticker if interval == "1d" else f"{frame.ticker}_{interval}"
+    path = os.path.join(directory, f"{name}.csv")
+
+    index = pd.to_datetime(frame.timestamps, unit="s", utc=True)
+    if frame.tz:
+        index = index.tz_convert(frame.tz)
+    pd.DataFrame(
+        {
+            "Open": frame.open,
+            "High": frame.high,
+            "Low": frame.low,
+            "Close": frame.close,
+            "Volume": frame.volume,
+        },
+        index=index.rename("Date"),
+    ).to_csv(path)
+    return path
+
+
+class ProviderChain(MarketDataProvider):
+    """
+    Providers in priority order, with fallback and optional hedging
+
+    Each call goes to the first provider. If it fails or has no data the
+    next one is tried. With hedge_after (seconds), the next provider is
+    also started when the current one has not answered by then, and the
+    first useful answer wins; the slower calls are cancelled. Batch
+    quote calls pass only the tickers still missing down the chain.
+    """
+
+    name = "chain"
+
+    def __init__(self, providers: List[MarketDataProvider], hedge_after: Optional[float] = None):
+        if not providers:
+            raise ValueError("At least one provider is required")
+        self.providers = providers
+        self.hedge_after = hedge_after
+        self.counters = {
+            provider.name: {"calls": 0, "errors": 0, "empty": 0, "hedged": 0, "wins": 0}
+            for provider in providers
+        }
+
+    async def quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        results: Dict[str, Dict] = {}
+        remaining, providers = list(tickers), self.providers
+        while remaining and providers:
+            index, fetched = await self._first("quotes", providers, lambda p: p.quotes(remaining), bool)
+            if index is None:
+                break
+            results.update(fetched)
+            remaining = [ticker for ticker in remaining if ticker not in fetched]
+            providers = providers[index + 1:]
+        return results
+
+    async def history(
+        self,
+        ticker: str,
+        interval: str,
+        period: Optional[str] = None,
+        start: Optional[str] = None
+    ) -> Optional[HistoryFrame]:
+        # An empty frame after start is a valid answer (no new bars)
+        _, frame = await self._first(
+            "history",
+            self.providers,
+            lambda p: p.history(ticker, interval, period=period, start=start),
+            lambda frame: frame is not None
+        )
+        return frame
+
+    async def info(self, ticker: str) -> Optional[Dict]:
+        return (await self._first("info", self.providers, lambda p: p.info(ticker), bool))[1]
+
+    def stats(self) -> Dict:
+        return {name: dict(counters) for name, counters in self.counters.items()}
+
+    async def _first(
+        self,
+        method: str,
+        providers: List[MarketDataProvider],
+        call: Callable[[MarketDataProvider], Awaitable[Any]],
+        accept: Callable[[Any], bool]
+    ) -> Tuple[Optional[int], Any]:
+        """
+        First accepted result across providers
+
+        The latency of every provider call is recorded by method and
+        outcome (ok, empty, error, or cancelled for hedge losers).
+
+        Returns:
+            (index into providers of the answering one, result), or
+            (None, None) if none of them had an answer
+        """
+        pending: Dict[asyncio.Task, int] = {}
+        started: Dict[asyncio.Task, float] = {}
+        launched = 0
+
+        def observe(task: asyncio.Task, index: int, outcome: str) -> None:
+            UPSTREAM_LATENCY.labels(providers[index].name, method, outcome).observe(
+                time.perf_counter() - started[task]
+            )
+
+        def launch(hedge: bool = False) -> None:
+            nonlocal launched
+            provider = providers[launched]
+            counters = self.counters[provider.name]
+            counters["calls"] += 1
+            if hedge:
+                counters["hedged"] += 1
+            task = asyncio.ensure_future(call(provider))
+            pending[task], started[task] = launched, time.perf_counter()
+            launched += 1
+
+        launch()
+        try:
+            while pending:
+                can_hedge = self.hedge_after is not None and launched < len(providers)
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    launch(hedge=True)
+                    continue
+
+                for task in done:
+                    index = pending.pop(task)
+                    counters = self.counters[providers[index].name]
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        counters["errors"] += 1
+                        observe(task, index, "error")
+                        logger.warning(f"Provider {providers[index].name} failed: {e}")
+                        continue
+                    if accept(result):
+                        counters["wins"] += 1
+                        observe(task, index, "ok")
+                        return index, result
+                    counters["empty"] += 1
+                    observe(task, index, "empty")
+
+                # Nothing useful and nothing left running: fall back
+                if not pending and launched < len(providers):
+                    launch()
+            return None, None
+        finally:
+            for task, index in pending.items():
+                task.cancel()
+                observe(task, index, "cancelled")
+
+
+def build_provider(
+    settings: Optional[ProviderSettings] = None,
+    executor: Optional[ProviderExecutor] = None
+) -> ProviderChain:
+    """Provider chain described by the settings (MARKET_DATA_PROVIDERS etc.)"""
+    settings = settings or ProviderSettings.from_env()
+    executor = executor or provider_executor
+
+    providers: List[MarketDataProvider] = []
+    for name in settings.providers:
+        if name == "yfinance":
+            providers.append(YFinanceProvider(executor))
+        elif name == "replay":
+            providers.append(ReplayProvider(
+                settings.replay_dir,
+                latency_ms=settings.replay_latency_ms,
+                jitter_ms=settings.replay_jitter_ms,
+                failure_rate=settings.replay_failure_rate,
+                seed=settings.replay_seed,
+                as_of=settings.replay_as_of,
+                executor=executor,
+            ))
+        else:
+            raise ValueError(f"Unknown market data provider: {name}")
+
+    hedge_after = settings.hedge_after_ms / 1000 if settings.hedge_after_ms else None
+    return ProviderChain(providers, hedge_after)
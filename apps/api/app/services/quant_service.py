@@ -1,231 +1,271 @@
 """
 Quantitative calculations service
+
+All calculations accept array-likes. A 1-D input is one series and gives
+a float; a 2-D input is a (time x tickers) matrix and gives one value per
+column. Missing points are NaN and are masked, never dropped, so series
+stay aligned with their dates.
 """
 
 import numpy as np
-from typing import List, Dict, Tuple
-from datetime import datetime
+from typing import Callable, List, Dict, Optional, Sequence, Tuple, Union
+from datetime import date, datetime
 import logging
+import warnings
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
 
+ArrayLike = Union[List[float], np.ndarray]
+Result = Union[float, np.ndarray]
+Windows = Union[int, Sequence[int]]
+RollingResult = Union[np.ndarray, Dict[int, np.ndarray]]
+
+
+def _as_array(values: ArrayLike) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def _result(values) -> Result:
+    """Plain float for scalar results, ndarray for per-column results"""
+    values = np.asarray(values, dtype=np.float64)
+    return float(values) if values.ndim == 0 else values
+
 
 class QuantService:
     """Service for quantitative portfolio calculations"""
 
     @staticmethod
-    def calculate_returns(prices: List[float]) -> List[float]:
+    def calculate_returns(prices: ArrayLike) -> np.ndarray:
         """
         Calculate daily returns from price series
 
         Args:
-            prices: List of prices (chronological order)
+            prices: Prices in chronological order (1-D, or 2-D time x tickers)
 
         Returns:
-            List of daily returns (length = len(prices) - 1)
+            Daily returns (length = len(prices) - 1); NaN where either
+            price is missing or the previous price is zero
         """
-        returns = []
-        for i in range(1, len(prices)):
-            if prices[i-1] != 0:
-                ret = (prices[i] - prices[i-1]) / prices[i-1]
-                returns.append(ret)
+        prices = _as_array(prices)
+        if len(prices) < 2:
+            return np.empty((0,) + prices.shape[1:])
+
+        previous = prices[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = prices[1:] / previous - 1.0
+        returns[previous == 0] = np.nan
         return returns
 
     @staticmethod
-    def calculate_volatility(returns: List[float], annualize: bool = True) -> float:
+    def calculate_volatility(returns: ArrayLike, annualize: bool = True) -> Result:
         """
         Calculate volatility (standard deviation of returns)
 
         Args:
-            returns: List of daily returns
+            returns: Daily returns (1-D, or 2-D time x tickers)
             annualize: If True, multiply by sqrt(252)
 
         Returns:
             Volatility as decimal (0.20 = 20%)
         """
-        if not returns:
-            return 0.0
+        returns = _as_array(returns)
+        if len(returns) == 0:
+            return _result(np.zeros(returns.shape[1:]))
 
-        std = np.std(returns)
+        with np.errstate(invalid="ignore"), _quiet_nan_warnings():
+            std = np.nanstd(returns, axis=0)
 
         if annualize:
-            std *= np.sqrt(252)  # 252 trading days per year
+            std = std * np.sqrt(252)  # 252 trading days per year
 
-        return float(std)
+        return _result(np.nan_to_num(std))
 
     @staticmethod
     def calculate_sharpe_ratio(
-        returns: List[float],
+        returns: ArrayLike,
         risk_free_rate: float = 0.03,
         periods_per_year: int = 252
-    ) -> float:
+    ) -> Result:
         """
         Calculate Sharpe Ratio
 
         Formula: (Rp - Rf) / σp
 
         Args:
-            returns: List of daily returns
+            returns: Daily returns (1-D, or 2-D time x tickers)
             risk_free_rate: Annual risk-free rate (default 3%)
             periods_per_year: 252 for daily
 
         Returns:
             Sharpe ratio
         """
-        if not returns:
-            return 0.0
+        returns = _as_array(returns)
+        if len(returns) == 0:
+            return _result(np.zeros(returns.shape[1:]))
 
         # Convert annual RF to daily
         daily_rf = risk_free_rate / periods_per_year
 
-        # Excess returns
-        excess_returns = np.array(returns) - daily_rf
+        with _quiet_nan_warnings():
+            # Annualized values
+            avg_excess_return = (np.nanmean(returns, axis=0) - daily_rf) * periods_per_year
+            std_dev = np.nanstd(returns, axis=0) * np.sqrt(periods_per_year)
 
-        # Annualized values
-        avg_excess_return = excess_returns.mean() * periods_per_year
-        std_dev = np.std(returns) * np.sqrt(periods_per_year)
-
-        if std_dev == 0:
-            return 0.0
-
-        return float(avg_excess_return / std_dev)
+        return _result(_safe_divide(avg_excess_return, std_dev))
 
     @staticmethod
     def calculate_sortino_ratio(
-        returns: List[float],
+        returns: ArrayLike,
         risk_free_rate: float = 0.03,
         periods_per_year: int = 252
-    ) -> float:
+    ) -> Result:
         """
         Calculate Sortino Ratio (downside deviation only)
 
         Formula: (Rp - Rf) / σ_down
 
         Args:
-            returns: List of daily returns
+            returns: Daily returns (1-D, or 2-D time x tickers)
             risk_free_rate: Annual risk-free rate
             periods_per_year: Trading days per year
 
         Returns:
             Sortino ratio
         """
-        if not returns:
-            return 0.0
+        returns = _as_array(returns)
+        if len(returns) == 0:
+            return _result(np.zeros(returns.shape[1:]))
 
         daily_rf = risk_free_rate / periods_per_year
-        excess_returns = np.array(returns) - daily_rf
+        excess_returns = returns - daily_rf
 
         # Downside deviation (only negative returns)
-        downside_returns = excess_returns[excess_returns < 0]
-
-        if len(downside_returns) == 0:
-            return 0.0
+        with np.errstate(invalid="ignore"):
+            downside_returns = np.where(excess_returns < 0, excess_returns, np.nan)
 
-        downside_dev = downside_returns.std() * np.sqrt(periods_per_year)
-        avg_excess_return = excess_returns.mean() * periods_per_year
+        with _quiet_nan_warnings():
+            downside_dev = np.nanstd(downside_returns, axis=0) * np.sqrt(periods_per_year)
+            avg_excess_return = np.nanmean(excess_returns, axis=0) * periods_per_year
 
-        if downside_dev == 0:
-            return 0.0
-
-        return float(avg_excess_return / downside_dev)
+        return _result(_safe_divide(avg_excess_return, downside_dev))
 
     @staticmethod
-    def calculate_max_drawdown(values: List[float]) -> float:
+    def calculate_max_drawdown(values: ArrayLike) -> Result:
         """
         Calculate Maximum Drawdown
 
         Formula: max((Peak - Trough) / Peak)
 
         Args:
-            values: List of portfolio values over time
+            values: Portfolio values or prices over time (1-D, or 2-D time x tickers)
 
         Returns:
             Maximum drawdown as decimal (0.20 = 20%)
         """
-        if not values:
-            return 0.0
-
-        values_array = np.array(values)
+        values = _as_array(values)
+        if len(values) == 0:
+            return _result(np.zeros(values.shape[1:]))
 
-        # Running maximum (peak)
-        running_max = np.maximum.accumulate(values_array)
+        # Running maximum (peak); fmax skips NaN
+        running_max = np.fmax.accumulate(values, axis=0)
 
         # Drawdown at each point
-        drawdown = (values_array - running_max) / running_max
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdown = (values - running_max) / running_max
 
         # Maximum drawdown
-        mdd = drawdown.min()
+        with _quiet_nan_warnings():
+            mdd = np.nanmin(np.where(np.isfinite(drawdown), drawdown, np.nan), axis=0)
 
-        return abs(float(mdd))
+        return _result(np.abs(np.nan_to_num(mdd)))
 
     @staticmethod
     def calculate_beta(
-        portfolio_returns: List[float],
-        benchmark_returns: List[float]
-    ) -> float:
+        portfolio_returns: ArrayLike,
+        benchmark_returns: ArrayLike
+    ) -> Result:
         """
         Calculate beta vs benchmark using linear regression
 
         Formula: Cov(Rp, Rm) / Var(Rm)
 
         Args:
-            portfolio_returns: Daily returns of portfolio
-            benchmark_returns: Daily returns of benchmark
+            portfolio_returns: Daily returns (1-D, or 2-D time x tickers)
+            benchmark_returns: Daily returns of benchmark (1-D)
 
         Returns:
-            Beta (slope of regression line)
+            Beta (slope of regression line); only dates where both
+            series have a return are used
+
+        Covariance and variance use the same ddof, so this is the
+        least-squares slope. The original np.cov / np.var formula mixed
+        ddof=1 and ddof=0 and reported betas n / (n - 1) too high.
         """
+        portfolio_returns = _as_array(portfolio_returns)
+        benchmark_returns = _as_array(benchmark_returns)
+
         if len(portfolio_returns) != len(benchmark_returns):
             raise ValueError("Portfolio and benchmark returns must have same length")
 
-        if len(portfolio_returns) < 2:
-            return 1.0  # Default beta
+        if portfolio_returns.ndim == 2 and benchmark_returns.ndim == 1:
+            benchmark_returns = benchmark_returns[:, None]
 
-        # Linear regression: portfolio = alpha + beta * benchmark
-        covariance = np.cov(portfolio_returns, benchmark_returns)[0][1]
-        variance = np.var(benchmark_returns)
+        # Pairwise mask: both series observed
+        mask = np.isfinite(portfolio_returns) & np.isfinite(benchmark_returns)
+        count = mask.sum(axis=0)
 
-        if variance == 0:
-            return 1.0
+        p = np.where(mask, portfolio_returns, 0.0)
+        b = np.where(mask, benchmark_returns, 0.0)
+        safe_count = np.maximum(count, 1)
+        p_mean = p.sum(axis=0) / safe_count
+        b_mean = b.sum(axis=0) / safe_count
 
-        beta = covariance / variance
+        # Linear regression: portfolio = alpha + beta * benchmark
+        b_dev = np.where(mask, b - b_mean, 0.0)
+        covariance = (np.where(mask, p - p_mean, 0.0) * b_dev).sum(axis=0)
+        variance = (b_dev ** 2).sum(axis=0)
+        # Same ddof on both sides: the normalization cancels
 
-        return float(beta)
+        beta = np.where((count < 2) | (variance == 0), 1.0, _safe_divide(covariance, variance))
+        return _result(beta)
 
     @staticmethod
     def calculate_var(
-        returns: List[float],
+        returns: ArrayLike,
         portfolio_value: float,
         confidence_level: float = 0.95
-    ) -> float:
+    ) -> Result:
         """
         Calculate Historical Value at Risk
 
         Args:
-            returns: Array of historical returns
-            portfolio_value: Current portfolio value
+            returns: Historical returns (1-D, or 2-D time x tickers)
+            portfolio_value: Current value (scalar, or one per column)
             confidence_level: 0.95 for 95% VaR
 
         Returns:
             VaR amount (positive = potential loss)
         """
-        if not returns:
-            return 0.0
+        returns = _as_array(returns)
+        if len(returns) == 0:
+            return _result(np.zeros(returns.shape[1:]))
 
         # Percentile (5th percentile for 95% VaR)
         alpha = 1 - confidence_level
-        var_percentile = np.percentile(returns, alpha * 100)
+        with _quiet_nan_warnings():
+            var_percentile = np.nanpercentile(returns, alpha * 100, axis=0)
 
         # VaR in currency units
-        var_amount = abs(var_percentile * portfolio_value)
+        var_amount = np.abs(np.nan_to_num(var_percentile) * np.asarray(portfolio_value))
 
-        return float(var_amount)
+        return _result(var_amount)
 
     @staticmethod
     def calculate_twr(
-        portfolio_values: List[float],
-        cash_flows: Dict[int, float]
-    ) -> float:
+        portfolio_values: ArrayLike,
+        cash_flows: Union[Dict[int, float], ArrayLike]
+    ) -> Result:
         """
         Calculate Time-Weighted Return
 
@@ -234,81 +274,484 @@ class QuantService:
         Where Ri = (EMVi - BMVi - CFi) / (BMVi + CFi/2)
 
         Args:
-            portfolio_values: List of portfolio values over time
-            cash_flows: Dict mapping index to cash flow amount
+            portfolio_values: Portfolio values over time (1-D, or 2-D time x portfolios)
+            cash_flows: Dict mapping index to cash flow amount, or an array
+                aligned with portfolio_values
 
         Returns:
             TWR as decimal
         """
-        if not portfolio_values:
-            return 0.0
+        values = _as_array(portfolio_values)
+        if len(values) < 2:
+            return _result(np.zeros(values.shape[1:]))
+
+        if isinstance(cash_flows, dict):
+            flows = np.zeros(len(values))
+            for i, cf in cash_flows.items():
+                if 0 < i < len(values):
+                    flows[i] = cf
+        else:
+            flows = cash_flows
+
+        # Chain-link
+        r = QuantService.calculate_period_returns(values, flows)
+        return _result(np.prod(1 + r, axis=0) - 1)
+
+    @staticmethod
+    def calculate_period_returns(portfolio_values: ArrayLike, cash_flows: ArrayLike) -> np.ndarray:
+        """
+        Cash-flow adjusted sub-period returns (the factors TWR chains)
 
-        twr = 1.0
-        bm = portfolio_values[0]
+        Ri = (EMVi - BMVi - CFi) / (BMVi + CFi/2), 0 where undefined
 
-        for i in range(1, len(portfolio_values)):
-            em = portfolio_values[i]
-            cf = cash_flows.get(i, 0)
+        Args:
+            portfolio_values: Portfolio values over time (1-D or 2-D)
+            cash_flows: Cash flow at each point, aligned with portfolio_values
 
-            # Sub-period return
-            denominator = bm + cf/2
-            if denominator != 0:
-                r = (em - bm - cf) / denominator
-            else:
-                r = 0
+        Returns:
+            Array of returns (length = len(portfolio_values) - 1)
+        """
+        values = _as_array(portfolio_values)
+        flows = _as_array(cash_flows)
+        if values.ndim == 2 and flows.ndim == 1:
+            flows = flows[:, None]
+
+        bm = values[:-1]
+        em = values[1:]
+        cf = flows[1:]
+
+        denominator = bm + cf / 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = np.where(denominator != 0, (em - bm - cf) / denominator, 0.0)
+        return np.nan_to_num(r, nan=0.0, posinf=0.0, neginf=0.0)
+
+    @staticmethod
+    def calculate_rolling_volatility(
+        returns: ArrayLike,
+        window: Windows,
+        annualize: bool = True,
+        min_periods: Optional[int] = None
+    ) -> RollingResult:
+        """
+        Volatility over a trailing window at every point
+
+        O(n) per column: window sums are differences of cumulative sums,
+        which are computed once and shared by every window.
+
+        Args:
+            returns: Daily returns (1-D, or 2-D time x tickers)
+            window: Window length in observations, or several lengths
+            annualize: If True, multiply by sqrt(252)
+            min_periods: Valid observations needed for a value (default: window)
+
+        Returns:
+            Array shaped like returns, NaN where the window is incomplete
+            (dict of window -> array when several windows are given)
+        """
+        moments = _RollingMoments(_as_array(returns))
+        scale = np.sqrt(252) if annualize else 1.0
+
+        def compute(w: int) -> np.ndarray:
+            count, mean, var = moments.at(w)
+            return _rolling_result(np.sqrt(var) * scale, count, w, min_periods)
+
+        return _per_window(window, compute)
+
+    @staticmethod
+    def calculate_rolling_sharpe(
+        returns: ArrayLike,
+        window: Windows,
+        risk_free_rate: float = 0.03,
+        periods_per_year: int = 252,
+        min_periods: Optional[int] = None
+    ) -> RollingResult:
+        """
+        Sharpe ratio over a trailing window at every point (see
+        calculate_sharpe_ratio and calculate_rolling_volatility)
+        """
+        moments = _RollingMoments(_as_array(returns))
 
-            # Chain-link
-            twr *= (1 + r)
-            bm = em
+        def compute(w: int) -> np.ndarray:
+            count, mean, var = moments.at(w)
+            excess = (mean - risk_free_rate / periods_per_year) * periods_per_year
+            sharpe = _safe_divide(excess, np.sqrt(var) * np.sqrt(periods_per_year))
+            return _rolling_result(sharpe, count, w, min_periods)
 
-        return float(twr - 1)
+        return _per_window(window, compute)
+
+    @staticmethod
+    def calculate_rolling_beta(
+        returns: ArrayLike,
+        benchmark_returns: ArrayLike,
+        window: Windows,
+        min_periods: Optional[int] = None
+    ) -> RollingResult:
+        """
+        Beta vs a benchmark over a trailing window at every point
+
+        Args:
+            returns: Daily returns (1-D, or 2-D time x tickers)
+            benchmark_returns: Benchmark daily returns (1-D, aligned)
+            window: Window length in observations, or several lengths
+
+        Returns:
+            Array shaped like returns, NaN where the window is incomplete
+            (dict of window -> array when several windows are given)
+        """
+        covariance = _RollingCovariance(returns, benchmark_returns)
+
+        def compute(w: int) -> np.ndarray:
+            count, cov, var_x, var_b = covariance.at(w)
+            return _rolling_result(_safe_divide(cov, var_b), count, w, min_periods)
+
+        return _per_window(window, compute)
+
+    @staticmethod
+    def calculate_rolling_correlation(
+        returns: ArrayLike,
+        benchmark_returns: ArrayLike,
+        window: Windows,
+        min_periods: Optional[int] = None
+    ) -> RollingResult:
+        """
+        Correlation with a benchmark over a trailing window at every point
+        (see calculate_rolling_beta)
+        """
+        covariance = _RollingCovariance(returns, benchmark_returns)
+
+        def compute(w: int) -> np.ndarray:
+            count, cov, var_x, var_b = covariance.at(w)
+            correlation = np.clip(_safe_divide(cov, np.sqrt(var_x * var_b)), -1.0, 1.0)
+            return _rolling_result(correlation, count, w, min_periods)
+
+        return _per_window(window, compute)
+
+    @staticmethod
+    def calculate_rolling_drawdown(values: ArrayLike, window: Windows) -> RollingResult:
+        """
+        Drawdown from the highest value of a trailing window at every point
+
+        The rolling maximum uses the van Herk/Gil-Werman block scheme
+        (prefix and suffix maxima per block), so it is O(n) whatever the
+        window length.
+
+        Args:
+            values: Prices or portfolio values (1-D, or 2-D time x tickers)
+            window: Window length in observations, or several lengths
+
+        Returns:
+            Drawdown as positive decimal, shaped like values (dict of
+            window -> array when several windows are given)
+        """
+        values = _as_array(values)
+
+        def compute(w: int) -> np.ndarray:
+            peak = _rolling_max(values, w)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                drawdown = np.where(peak > 0, 1 - values / peak, np.nan)
+            return np.clip(drawdown, 0.0, None)
+
+        return _per_window(window, compute)
 
     @staticmethod
     def calculate_xirr(
         cash_flows: List[Tuple[datetime, float]],
         guess: float = 0.1
-    ) -> float:
+    ) -> Optional[float]:
         """
-        Calculate Money-Weighted Return (XIRR) using Newton-Raphson
+        Calculate Money-Weighted Return (XIRR)
+
+        Newton-Raphson with NPV and its derivative evaluated as array
+        operations; falls back to bisection on a bracketing interval when
+        Newton diverges or stalls.
 
         Args:
-            cash_flows: List of (date, amount) tuples
+            cash_flows: List of (date, amount) tuples (negative = money in)
             guess: Initial guess for IRR
 
         Returns:
-            Annualized IRR as decimal
+            Annualized IRR as decimal, 0.0 for fewer than two flows, None
+            if the flows have no IRR (no sign change)
         """
-        if len(cash_flows) < 2:
-            return 0.0
-
-        # Sort by date
-        cash_flows = sorted(cash_flows, key=lambda x: x[0])
+        return QuantService.calculate_xirr_batch([cash_flows], guess)[0]
 
-        # Convert dates to days from first date
-        start_date = cash_flows[0][0]
-        days = [(cf[0] - start_date).days for cf in cash_flows]
-        amounts = [cf[1] for cf in cash_flows]
-
-        # Newton-Raphson iteration
-        rate = guess
-        max_iterations = 100
-        tolerance = 1e-6
+    @staticmethod
+    def calculate_xirr_batch(
+        cash_flow_sets: List[List[Tuple[datetime, float]]],
+        guess: float = 0.1
+    ) -> List[Optional[float]]:
+        """
+        Solve XIRR for many cash-flow sets at once (e.g. every position
+        plus the whole portfolio)
 
-        for _ in range(max_iterations):
-            npv = 0.0
-            d_npv = 0.0
+        All sets are padded into one (sets x flows) matrix and iterated with
+        Newton-Raphson in lockstep; sets that do not converge are solved
+        individually by bisection.
 
-            for i, (day, amount) in enumerate(zip(days, amounts)):
-                factor = (1 + rate) ** (day / 365.0)
-                npv += amount / factor
-                d_npv -= (day / 365.0) * amount / (factor * (1 + rate))
+        Args:
+            cash_flow_sets: One list of (date, amount) tuples per set
+            guess: Initial guess for IRR
 
-            if abs(npv) < tolerance:
+        Returns:
+            IRR per set, in input order (see calculate_xirr)
+        """
+        results: List[Optional[float]] = [0.0] * len(cash_flow_sets)
+        rows = [i for i, flows in enumerate(cash_flow_sets) if len(flows) >= 2]
+        if not rows:
+            return results
+
+        width = max(len(cash_flow_sets[i]) for i in rows)
+        years = np.zeros((len(rows), width))
+        amounts = np.zeros((len(rows), width))
+        for row, i in enumerate(rows):
+            flows = cash_flow_sets[i]
+            n = len(flows)
+            days = np.fromiter((_to_day(d) for d, _ in flows), dtype=np.float64, count=n)
+            # Years from the first flow (padding flows are zero and never count)
+            years[row, :n] = (days - days.min()) / 365.0
+            amounts[row, :n] = np.fromiter((amount for _, amount in flows), dtype=np.float64, count=n)
+
+        has_root = (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)
+        scale = np.maximum(np.abs(amounts).sum(axis=1), 1e-12)
+
+        rates, converged = _xirr_newton(years, amounts, scale, guess)
+
+        for row, i in enumerate(rows):
+            if not has_root[row]:
+                results[i] = None
+            elif converged[row]:
+                results[i] = float(rates[row])
+            else:
+                results[i] = _xirr_bisect(years[row], amounts[row], scale[row])
+        return results
+
+
+def _safe_divide(numerator, denominator):
+    """Elementwise division that yields 0 where the denominator is 0 or NaN"""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    valid = np.isfinite(denominator) & (denominator != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.where(valid, numerator / np.where(valid, denominator, 1.0), 0.0)
+    return np.nan_to_num(result)
+
+
+@contextmanager
+def _quiet_nan_warnings():
+    """Suppress 'mean of empty slice' warnings from all-NaN columns"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        yield
+
+
+class _PrefixSums:
+    """
+    Cumulative sums of a column set with a leading zero row, so the sum
+    over any trailing window is one subtraction
+    """
+
+    def __init__(self, values: np.ndarray):
+        self.totals = np.empty((len(values) + 1,) + values.shape[1:])
+        self.totals[0] = 0.0
+        np.cumsum(values, axis=0, out=self.totals[1:])
+
+    def window(self, window: int) -> np.ndarray:
+        """Sum over the trailing window at every row (shorter at the start)"""
+        totals = self.totals
+        result = totals[1:].copy()
+        result[window:] -= totals[1:-window]
+        return result
+
+
+class _RollingCount:
+    """Valid observations per trailing window"""
+
+    def __init__(self, valid: np.ndarray):
+        self.shape = valid.shape
+        self.prefix = None if valid.all() else _PrefixSums(valid.astype(np.float64))
+
+    def window(self, window: int) -> np.ndarray:
+        if self.prefix is not None:
+            return self.prefix.window(window)
+        # No gaps: min(i + 1, window)
+        count = np.minimum(np.arange(1, self.shape[0] + 1, dtype=np.float64), window)
+        return np.broadcast_to(count.reshape((-1,) + (1,) * (len(self.shape) - 1)), self.shape)
+
+
+class _RollingMoments:
+    """
+    Rolling count, mean and population variance ignoring NaN
+
+    Values are centered on their column mean first so the sum of squares
+    does not lose precision to cancellation.
+    """
+
+    def __init__(self, values: np.ndarray):
+        valid = ~np.isnan(values)
+        with _quiet_nan_warnings():
+            self.center = np.nan_to_num(np.nanmean(values, axis=0))
+        x = np.where(valid, values - self.center, 0.0)
+        self.count = _RollingCount(valid)
+        self.s1 = _PrefixSums(x)
+        self.s2 = _PrefixSums(x * x)
+
+    def at(self, window: int):
+        count = self.count.window(window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = self.s1.window(window) / count
+            var = np.maximum(self.s2.window(window) / count - mean * mean, 0.0)
+        return count, mean + self.center, var
+
+
+class _RollingCovariance:
+    """Rolling count, covariance and both variances over pairwise-valid points"""
+
+    def __init__(self, returns: ArrayLike, benchmark_returns: ArrayLike):
+        x = _as_array(returns)
+        b = _as_array(benchmark_returns)
+        if x.ndim == 2 and b.ndim == 1:
+            b = b[:, None]
+        b = np.broadcast_to(b, x.shape)
+
+        valid = ~np.isnan(x) & ~np.isnan(b)
+        with _quiet_nan_warnings():
+            x = np.where(valid, x - np.nan_to_num(np.nanmean(np.where(valid, x, np.nan), axis=0)), 0.0)
+            b = np.where(valid, b - np.nan_to_num(np.nanmean(np.where(valid, b, np.nan), axis=0)), 0.0)
+
+        self.count = _RollingCount(valid)
+        self.sx, self.sb = _PrefixSums(x), _PrefixSums(b)
+        self.sxb, self.sxx, self.sbb = _PrefixSums(x * b), _PrefixSums(x * x), _PrefixSums(b * b)
+
+    def at(self, window: int):
+        count = self.count.window(window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mx, mb = self.sx.window(window) / count, self.sb.window(window) / count
+            cov = self.sxb.window(window) / count - mx * mb
+            var_x = np.maximum(self.sxx.window(window) / count - mx * mx, 0.0)
+            var_b = np.maximum(self.sbb.window(window) / count - mb * mb, 0.0)
+        return count, cov, var_x, var_b
+
+
+def _per_window(window: Windows, compute: Callable[[int], np.ndarray]) -> RollingResult:
+    """Apply a per-window kernel to one window or to each of several"""
+    single = np.ndim(window) == 0
+    windows = [window] if single else list(window)
+    for w in windows:
+        if not isinstance(w, (int, np.integer)) or isinstance(w, bool) or w < 1:
+            raise ValueError(f"Rolling window must be a positive integer, got {w!r}")
+    if single:
+        return compute(int(window))
+    return {int(w): compute(int(w)) for w in windows}
+
+
+def _rolling_result(values: np.ndarray, count: np.ndarray, window: int, min_periods: Optional[int]) -> np.ndarray:
+    """Blank out points whose window has too few observations"""
+    return np.where(count >= (min_periods or window), values, np.nan)
+
+
+def _rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing-window maximum ignoring NaN, O(n) (van Herk/Gil-Werman)"""
+    n = len(values)
+    if n == 0 or window <= 1:
+        return values.copy()
+
+    shape = values.shape[1:]
+    blocks = -(-n // window)
+    padded = np.full((blocks * window,) + shape, -np.inf)
+    padded[:n] = np.where(np.isnan(values), -np.inf, values)
+    padded = padded.reshape((blocks, window) + shape)
+
+    # Max from each block start up to i, and from i to the block end
+    prefix = np.maximum.accumulate(padded, axis=1).reshape((-1,) + shape)[:n]
+    suffix = np.maximum.accumulate(padded[:, ::-1], axis=1)[:, ::-1].reshape((-1,) + shape)[:n]
+
+    # Window ending at i spans [i - window + 1, i]: suffix of the start, prefix of the end
+    result = prefix.copy()
+    result[window - 1:] = np.maximum(suffix[:n - window + 1], prefix[window - 1:])
+    result[result == -np.inf] = np.nan
+    return result
+
+
+_XIRR_TOLERANCE = 1e-10
+_XIRR_MAX_ITERATIONS = 50
+_XIRR_BISECT_ITERATIONS = 100
+# Rates scanned for a bracket when Newton fails: -99.9999% to +99900%
+_XIRR_GRID = np.geomspace(1e-6, 1e3, 200) - 1.0
+
+
+def _to_day(value) -> int:
+    """Day ordinal of a date, datetime or ISO string"""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10]).toordinal()
+    return value.toordinal()
+
+
+def _xnpv(rate, years: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+    """NPV of each row of flows at its rate"""
+    rate = np.asarray(rate, dtype=np.float64)[..., None]
+    return (amounts * (1.0 + rate) ** -years).sum(axis=-1)
+
+
+def _xirr_newton(years: np.ndarray, amounts: np.ndarray, scale: np.ndarray, guess: float):
+    """
+    Newton-Raphson on every row at once
+
+    Returns:
+        (rates, converged mask)
+    """
+    rates = np.full(len(years), guess, dtype=np.float64)
+    converged = np.zeros(len(years), dtype=bool)
+    active = np.ones(len(years), dtype=bool)
+
+    with np.errstate(all="ignore"):
+        for _ in range(_XIRR_MAX_ITERATIONS):
+            r = rates[active][:, None]
+            t, a = years[active], amounts[active]
+            discount = (1.0 + r) ** -t
+            npv = (a * discount).sum(axis=1)
+            d_npv = (-t * a * discount / (1.0 + r)).sum(axis=1)
+
+            step = npv / d_npv
+            new_rates = rates[active] - step
+
+            idx = np.flatnonzero(active)
+            done = (np.abs(npv) <= _XIRR_TOLERANCE * scale[active]) | (np.abs(step) < _XIRR_TOLERANCE)
+            failed = ~np.isfinite(new_rates) | (new_rates <= -1.0) | (d_npv == 0)
+
+            converged[idx[done]] = True
+            rates[idx[~done & ~failed]] = new_rates[~done & ~failed]
+            active[idx[done | failed]] = False
+            if not active.any():
                 break
 
-            if d_npv == 0:
+    # A converged rate must really be a root
+    ok = converged & np.isfinite(rates) & (rates > -1.0)
+    residual = np.abs(_xnpv(np.where(ok, rates, 0.0), years, amounts))
+    converged = ok & (residual <= 1e-6 * scale)
+    return rates, converged
+
+
+def _xirr_bisect(years: np.ndarray, amounts: np.ndarray, scale: float) -> Optional[float]:
+    """Bracket the first sign change of NPV on a rate grid and bisect it"""
+    with np.errstate(all="ignore"):
+        values = _xnpv(_XIRR_GRID, years, amounts)
+    finite = np.isfinite(values[:-1]) & np.isfinite(values[1:])
+    changes = np.flatnonzero(finite & (np.sign(values[:-1]) * np.sign(values[1:]) <= 0))
+    if len(changes) == 0:
+        return None
+
+    i = changes[0]
+    lo, hi, f_lo = _XIRR_GRID[i], _XIRR_GRID[i + 1], values[i]
+    if f_lo == 0:
+        return float(lo)
+    with np.errstate(all="ignore"):
+        for _ in range(_XIRR_BISECT_ITERATIONS):
+            mid = (lo + hi) / 2
+            f_mid = float(_xnpv(mid, years, amounts))
+            if abs(f_mid) <= _XIRR_TOLERANCE * scale or hi - lo < _XIRR_TOLERANCE:
                 break
-
-            rate = rate - npv / d_npv
-
-        return float(rate)
+            if (f_mid < 0) == (f_lo < 0):
+                lo, f_lo = mid, f_mid
+            else:
+                hi = mid
+    return float((lo + hi) / 2)
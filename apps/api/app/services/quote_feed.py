@@ -0,0 +1,257 @@
+"""
+Live quote feed: one upstream poller, pub/sub fan-out to every client
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+import redis.asyncio as redis
+
+from .market_hours import TtlPolicy
+from .yfinance_service import YFinanceService
+
+logger = logging.getLogger(__name__)
+
+# Extend / drop the leader lease only if we still hold it
+_RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class QuoteSubscription:
+    """
+    One client's ticker set and its pending quote updates
+
+    Updates are buffered in a bounded queue; a client that falls behind
+    loses its oldest updates rather than growing the queue.
+    """
+
+    def __init__(self, feed: "QuoteFeed", max_pending: int = 256):
+        self.feed = feed
+        self.tickers: Set[str] = set()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    def push(self, quote: Dict) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(quote)
+
+    async def get(self) -> Dict:
+        """Wait for the next quote update"""
+        return await self._queue.get()
+
+    async def __aiter__(self) -> AsyncIterator[Dict]:
+        while True:
+            yield await self._queue.get()
+
+    async def add(self, tickers: Iterable[str]) -> None:
+        await self.feed.add(self, tickers)
+
+    def remove(self, tickers: Iterable[str]) -> None:
+        self.feed.remove(self, tickers)
+
+    def close(self) -> None:
+        self.feed.unsubscribe(self)
+
+
+class QuoteFeed:
+    """
+    Pushes quote changes for subscribed tickers to connected clients
+
+    Every worker registers the tickers its clients watch in a Redis sorted
+    set (score = registration expiry). Workers compete for a short leader
+    lease; only the leader polls upstream, once per interval, for the
+    union of registered tickers whose market is open, and publishes the
+    quotes that changed on a pub/sub channel. Every worker listens on the
+    channel and forwards each quote to its local subscribers, so upstream
+    load depends on the number of distinct tickers, not on clients or
+    workers.
+    """
+
+    CHANNEL = "feed:quotes"
+    REGISTRY = "feed:tickers"
+    LEADER = "feed:leader"
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        yfinance_service: YFinanceService,
+        interval: Optional[float] = None,
+        max_tickers: Optional[int] = None,
+        ttl_policy: Optional[TtlPolicy] = None
+    ):
+        self.redis = redis_client
+        self.yfinance = yfinance_service
+        self.ttl_policy = ttl_policy or yfinance_service.cache.ttl_policy
+        self.interval = interval or float(os.getenv("QUOTE_FEED_INTERVAL", "5"))
+        self.max_tickers = max_tickers or int(os.getenv("QUOTE_FEED_MAX_TICKERS", "100"))
+        self.instance_id = uuid.uuid4().hex
+
+        self._subscribers: Dict[str, Set[QuoteSubscription]] = {}
+        self._published: Dict[str, tuple] = {}  # Leader only: last (price, change) sent
+        self._is_leader = False
+        self._tasks: List[asyncio.Task] = []
+
+    def subscribe(self, max_pending: int = 256) -> QuoteSubscription:
+        """New subscription with no tickers (starts the feed on first use)"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._poll_loop()),
+                asyncio.create_task(self._listen()),
+            ]
+        return QuoteSubscription(self, max_pending)
+
+    async def add(self, subscription: QuoteSubscription, tickers: Iterable[str]) -> None:
+        """
+        Watch more tickers; their current quotes are pushed right away
+        (from cache when possible) instead of waiting for the next poll
+        """
+        new = [t for t in dict.fromkeys(tickers) if t not in subscription.tickers]
+        if not new:
+            return
+        for ticker in new:
+            subscription.tickers.add(ticker)
+            self._subscribers.setdefault(ticker, set()).add(subscription)
+
+        await self._register(new)
+        quotes = await self.yfinance.get_quotes_batch(new)
+        for ticker in new:
+            if quotes.get(ticker) and ticker in subscription.tickers:
+                subscription.push(quotes[ticker])
+
+    def remove(self, subscription: QuoteSubscription, tickers: Iterable[str]) -> None:
+        """Stop watching tickers"""
+        for ticker in tickers:
+            subscription.tickers.discard(ticker)
+            watchers = self._subscribers.get(ticker)
+            if watchers is not None:
+                watchers.discard(subscription)
+                if not watchers:
+                    del self._subscribers[ticker]
+
+    def unsubscribe(self, subscription: QuoteSubscription) -> None:
+        self.remove(subscription, list(subscription.tickers))
+
+    def stats(self) -> Dict:
+        return {
+            "tickers": len(self._subscribers),
+            "subscriptions": len({s for subs in self._subscribers.values() for s in subs}),
+            "leader": self._is_leader,
+        }
+
+    async def close(self) -> None:
+        """Stop the poller and listener, releasing the lease if held"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._is_leader:
+            try:
+                await self.redis.eval(_RELEASE_SCRIPT, 1, self.LEADER, self.instance_id)
+            except Exception:
+                pass
+            self._is_leader = False
+
+    async def _register(self, tickers: List[str]) -> None:
+        """Mark tickers as watched for the next few intervals"""
+        if not tickers:
+            return
+        expires = time.time() + self.interval * 3
+        await self.redis.zadd(self.REGISTRY, {ticker: expires for ticker in tickers})
+
+    async def _poll_loop(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await self._tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Quote feed poll failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def _tick(self) -> None:
+        """Refresh this worker's registrations, then poll if leader"""
+        await self._register(list(self._subscribers))
+
+        if not await self._lead():
+            return
+
+        await self.redis.zremrangebyscore(self.REGISTRY, "-inf", time.time())
+        tickers = [t.decode() if isinstance(t, bytes) else t for t in await self.redis.zrange(self.REGISTRY, 0, -1)]
+
+        # Closed markets cannot move: skip them until the pre-open warmup
+        tickers = [t for t in tickers if self.ttl_policy.is_active(t)]
+        if not tickers:
+            return
+
+        quotes = await self.yfinance.refresh_quotes(tickers)
+        self._published = {t: state for t, state in self._published.items() if t in quotes}
+
+        changed = []
+        for ticker, quote in quotes.items():
+            if not quote:
+                continue
+            state = (quote["price"], quote["change"])
+            if self._published.get(ticker) != state:
+                self._published[ticker] = state
+                changed.append(quote)
+
+        if changed:
+            await self.redis.publish(self.CHANNEL, json.dumps({"quotes": changed}))
+            logger.debug(f"Quote feed published {len(changed)}/{len(tickers)} changed quotes")
+
+    async def _lead(self) -> bool:
+        """Take or renew the leader lease"""
+        lease_ms = int(self.interval * 3000)
+        if self._is_leader:
+            self._is_leader = bool(
+                await self.redis.eval(_RENEW_SCRIPT, 1, self.LEADER, self.instance_id, lease_ms)
+            )
+        if not self._is_leader:
+            self._is_leader = bool(
+                await self.redis.set(self.LEADER, self.instance_id, nx=True, px=lease_ms)
+            )
+            if self._is_leader:
+                # A new leader republishes everything once
+                self._published.clear()
+                logger.info("Quote feed: this worker is now the poller")
+        return self._is_leader
+
+    async def _listen(self) -> None:
+        """Forward published quotes to local subscribers (reconnects on error)"""
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        quotes = json.loads(message["data"])["quotes"]
+                    except (TypeError, ValueError, KeyError):
+                        continue
+                    for quote in quotes:
+                        for subscription in list(self._subscribers.get(quote.get("ticker"), ())):
+                            subscription.push(quote)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Quote feed listener error, reconnecting: {e}")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,398 @@
+"""
+Transaction replay: daily holdings, cost basis, cash flows and value
+
+The portfolio is valued as its securities only: BUY and FEE are money
+put in, SELL and DIVIDEND are money taken out. DEPOSIT and WITHDRAWAL
+only move cash and do not change the replayed series.
+
+Cash flow sign convention follows QuantService.calculate_twr: positive =
+money added to the portfolio.
+"""
+
+import hashlib
+import logging
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .cache_service import CacheService
+from .history_frame import RANGE_SPANS
+from .portfolio_service import align_closes, forward_fill
+from .yfinance_service import YFinanceService
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_TYPES = ("BUY", "SELL", "DIVIDEND", "FEE", "DEPOSIT", "WITHDRAWAL")
+BUY, SELL, DIVIDEND, FEE, DEPOSIT, WITHDRAWAL = range(len(TRANSACTION_TYPES))
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _epoch_days(values: List) -> np.ndarray:
+    """Days since the epoch of dates, datetimes or ISO strings (date as written)"""
+    dates = [v[:10] if isinstance(v, str) else v.isoformat()[:10] for v in values]
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+class TransactionLog:
+    """
+    Transactions as sorted columns
+
+    Rows are ordered by (day, type, ticker, quantity, price) regardless of
+    input order, and tickers are numbered by first appearance, so adding
+    newer transactions leaves the existing rows (and their fingerprint)
+    unchanged.
+    """
+
+    def __init__(self, transactions: List[Dict]):
+        n = len(transactions)
+        days = _epoch_days([t["date"] for t in transactions])
+        kinds = np.fromiter((TRANSACTION_TYPES.index(t["type"]) for t in transactions), dtype=np.int8, count=n)
+        quantity = np.fromiter((t.get("quantity") or 0 for t in transactions), dtype=np.float64, count=n)
+        price = np.fromiter((t.get("price") or 0 for t in transactions), dtype=np.float64, count=n)
+        fees = np.fromiter((t.get("fees") or 0 for t in transactions), dtype=np.float64, count=n)
+        names = np.array([t.get("ticker") or "" for t in transactions], dtype=object)
+
+        order = np.lexsort((price, quantity, names.astype(str), kinds, days)) if n else np.arange(0)
+        self.days = days[order]
+        self.kinds = kinds[order]
+        self.quantity = quantity[order]
+        self.price = price[order]
+        self.fees = fees[order]
+
+        names = names[order]
+        self.tickers: List[str] = []
+        index: Dict[str, int] = {}
+        ticker_idx = np.empty(n, dtype=np.int64)
+        for row, name in enumerate(names.tolist()):
+            if name not in index:
+                index[name] = len(self.tickers)
+                self.tickers.append(name)
+            ticker_idx[row] = index[name]
+        self.ticker_idx = ticker_idx
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def fingerprint(self, count: int) -> str:
+        """Hash of the first count rows"""
+        digest = hashlib.sha1()
+        for column in (self.days, self.kinds, self.ticker_idx, self.quantity, self.price, self.fees):
+            digest.update(np.ascontiguousarray(column[:count]).tobytes())
+        used = int(self.ticker_idx[:count].max()) + 1 if count else 0
+        digest.update("\x00".join(self.tickers[:used]).encode())
+        return digest.hexdigest()
+
+    def cash_flows(self) -> np.ndarray:
+        """External cash flow of each transaction (positive = money in)"""
+        gross = self.quantity * self.price
+        flows = np.zeros(len(self))
+        flows = np.where(self.kinds == BUY, gross + self.fees, flows)
+        flows = np.where(self.kinds == SELL, -(gross - self.fees), flows)
+        flows = np.where(self.kinds == DIVIDEND, -(gross - self.fees), flows)
+        flows = np.where(self.kinds == FEE, np.where(self.fees != 0, self.fees, gross), flows)
+        return flows
+
+    def quantity_deltas(self) -> np.ndarray:
+        """Change in shares held of each transaction"""
+        return np.where(self.kinds == BUY, self.quantity, np.where(self.kinds == SELL, -self.quantity, 0.0))
+
+
+class ReplayCheckpoint:
+    """
+    State after replaying a prefix of a transaction log
+
+    Holds the per-ticker position (shares, average-cost basis), realized
+    P&L, and the running totals after every replayed transaction, so later
+    transactions continue from here instead of from the first trade.
+    """
+
+    def __init__(
+        self,
+        count: int = 0,
+        fingerprint: str = "",
+        shares: Optional[Dict[str, float]] = None,
+        cost: Optional[Dict[str, float]] = None,
+        realized: float = 0.0,
+        basis_after: Optional[List[float]] = None,
+        realized_after: Optional[List[float]] = None
+    ):
+        self.count = count
+        self.fingerprint = fingerprint
+        self.shares = shares or {}
+        self.cost = cost or {}
+        self.realized = realized
+        self.basis_after = basis_after or []
+        self.realized_after = realized_after or []
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "fingerprint": self.fingerprint,
+            "shares": self.shares,
+            "cost": self.cost,
+            "realized": self.realized,
+            "basisAfter": self.basis_after,
+            "realizedAfter": self.realized_after,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ReplayCheckpoint":
+        return cls(
+            count=data["count"],
+            fingerprint=data["fingerprint"],
+            shares=data["shares"],
+            cost=data["cost"],
+            realized=data["realized"],
+            basis_after=data["basisAfter"],
+            realized_after=data["realizedAfter"],
+        )
+
+
+def replay_cost_basis(log: TransactionLog, checkpoint: ReplayCheckpoint) -> ReplayCheckpoint:
+    """
+    Replay transactions after the checkpoint with average-cost accounting
+
+    Only this part is sequential (a sale's cost depends on every earlier
+    trade of the ticker); everything else is derived with array operations.
+    """
+    shares = dict(checkpoint.shares)
+    cost = dict(checkpoint.cost)
+    realized = checkpoint.realized
+    basis = sum(cost.values())
+    basis_after = list(checkpoint.basis_after)
+    realized_after = list(checkpoint.realized_after)
+
+    start = checkpoint.count
+    rows = zip(
+        log.kinds[start:].tolist(),
+        log.ticker_idx[start:].tolist(),
+        log.quantity[start:].tolist(),
+        log.price[start:].tolist(),
+        log.fees[start:].tolist(),
+    )
+    tickers = log.tickers
+    for kind, idx, quantity, price, fees in rows:
+        ticker = tickers[idx]
+        if kind == BUY:
+            added = quantity * price + fees
+            shares[ticker] = shares.get(ticker, 0.0) + quantity
+            cost[ticker] = cost.get(ticker, 0.0) + added
+            basis += added
+        elif kind == SELL:
+            held = shares.get(ticker, 0.0)
+            sold = min(quantity, held) if held > 0 else 0.0
+            released = cost.get(ticker, 0.0) * sold / held if sold else 0.0
+            realized += quantity * price - fees - released
+            shares[ticker] = held - quantity
+            cost[ticker] = cost.get(ticker, 0.0) - released
+            basis -= released
+        elif kind == DIVIDEND:
+            realized += quantity * price - fees
+        elif kind == FEE:
+            realized -= fees or quantity * price
+
+        basis_after.append(basis)
+        realized_after.append(realized)
+
+    return ReplayCheckpoint(
+        count=len(log),
+        fingerprint=log.fingerprint(len(log)),
+        shares=shares,
+        cost=cost,
+        realized=realized,
+        basis_after=basis_after,
+        realized_after=realized_after,
+    )
+
+
+class HoldingsHistory:
+    """Daily replayed portfolio state as columns (one row per trading day)"""
+
+    __slots__ = (
+        "days", "tickers", "holdings", "positions", "cost_basis", "cash_flows", "realized_pnl", "value",
+        "changed_from",
+    )
+
+    def __init__(
+        self,
+        days: np.ndarray,
+        tickers: List[str],
+        holdings: np.ndarray,
+        positions: np.ndarray,
+        cost_basis: np.ndarray,
+        cash_flows: np.ndarray,
+        realized_pnl: np.ndarray,
+        changed_from: Optional[int] = None
+    ):
+        self.days = days
+        self.tickers = tickers
+        self.holdings = holdings
+        self.positions = positions  # Market value per ticker
+        self.cost_basis = cost_basis
+        self.cash_flows = cash_flows
+        self.realized_pnl = realized_pnl
+        self.value = positions.sum(axis=1)
+        # Day of the earliest transaction not covered by the checkpoint
+        self.changed_from = changed_from
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def dates(self) -> List[str]:
+        return np.datetime_as_string(self.days.astype("datetime64[D]")).tolist()
+
+    def xirr_flows(self) -> List[Tuple[date, float]]:
+        """Cash flows for XIRR (negative = money in), closed at the last value"""
+        if not len(self):
+            return []
+        dates = self.days.astype("datetime64[D]").astype(object)
+        flows = [(dates[i], -float(self.cash_flows[i])) for i in np.flatnonzero(self.cash_flows)]
+        flows.append((dates[-1], float(self.value[-1])))
+        return flows
+
+    def to_dict(self) -> Dict:
+        return {
+            "dates": self.dates(),
+            "holdings": {
+                ticker: self.holdings[:, i].tolist()
+                for i, ticker in enumerate(self.tickers) if ticker
+            },
+            "costBasis": self.cost_basis.tolist(),
+            "cashFlows": self.cash_flows.tolist(),
+            "realizedPnL": self.realized_pnl.tolist(),
+            "value": self.value.tolist(),
+        }
+
+
+class ReplayService:
+    """
+    Replays a portfolio's transactions against daily closes
+
+    The sequential cost-basis pass is checkpointed per portfolio in the
+    cache; when the new transaction log only adds rows after the
+    checkpointed prefix, replay continues from the checkpoint.
+    """
+
+    def __init__(self, yfinance_service: YFinanceService, cache_service: CacheService):
+        self.yfinance = yfinance_service
+        self.cache = cache_service
+
+    async def replay(
+        self,
+        transactions: List[Dict],
+        portfolio_id: Optional[str] = None
+    ) -> Optional[HoldingsHistory]:
+        """
+        Replay transactions into daily holdings and value
+
+        Args:
+            transactions: Dicts with ticker, type, date, quantity, price, fees
+            portfolio_id: Enables checkpointing when given
+
+        Returns:
+            HoldingsHistory from the first transaction day, or None if there
+            are no transactions
+        """
+        log = TransactionLog(transactions)
+        if not len(log):
+            return None
+
+        checkpoint = await self._load_checkpoint(log, portfolio_id)
+        changed_from = None
+        if checkpoint.count < len(log):
+            changed_from = int(log.days[checkpoint.count])
+            started = time.perf_counter()
+            replayed = len(log) - checkpoint.count
+            checkpoint = replay_cost_basis(log, checkpoint)
+            logger.debug(f"Replayed {replayed} transactions in {(time.perf_counter() - started) * 1000:.1f} ms")
+            if portfolio_id:
+                await self.cache.set_replay_checkpoint(portfolio_id, checkpoint.to_dict())
+
+        days, closes = await self._load_closes(log)
+        history = self._build_history(log, checkpoint, days, closes)
+        history.changed_from = changed_from
+        return history
+
+    async def _load_checkpoint(self, log: TransactionLog, portfolio_id: Optional[str]) -> ReplayCheckpoint:
+        """Cached checkpoint if it is a prefix of log, else an empty one"""
+        if not portfolio_id:
+            return ReplayCheckpoint()
+
+        cached = await self.cache.get_replay_checkpoint(portfolio_id)
+        if not cached:
+            return ReplayCheckpoint()
+
+        checkpoint = ReplayCheckpoint.from_dict(cached)
+        if checkpoint.count <= len(log) and log.fingerprint(checkpoint.count) == checkpoint.fingerprint:
+            return checkpoint
+
+        logger.info(f"Replay checkpoint for {portfolio_id} no longer matches, replaying in full")
+        return ReplayCheckpoint()
+
+    async def _load_closes(self, log: TransactionLog) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Daily closes of every traded ticker since the first transaction
+
+        Days without a market close (before a listing, unknown tickers)
+        fall back to the last traded price.
+        """
+        first_day = int(log.days[0])
+        age = (date.today() - date.fromordinal(first_day + _EPOCH_ORDINAL)).days * 86400
+        range = next((name for name, span in RANGE_SPANS.items() if span > age + 7 * 86400), "max")
+
+        traded = [ticker for ticker in log.tickers if ticker]
+        frames = await self.yfinance.get_history_frames(traded, range=range, interval="1d")
+        available = [ticker for ticker in traded if frames.get(ticker) is not None and len(frames[ticker])]
+
+        if available:
+            market_days, market = align_closes(frames, available, trim=False)
+        else:
+            market_days = np.empty(0, np.int64)
+
+        # Transaction days count too (e.g. a trade in a ticker with no quotes)
+        days = np.union1d(market_days, log.days)
+        days = days[days >= first_day]
+
+        # Last market close on or before each day
+        closes = np.full((len(days), len(log.tickers)), np.nan)
+        if available:
+            columns = [log.tickers.index(ticker) for ticker in available]
+            market_row = np.searchsorted(market_days, days, side="right") - 1
+            closes[:, columns] = np.where((market_row >= 0)[:, None], market[market_row], np.nan)
+
+        # Fallback: last traded price
+        traded_rows = (log.kinds == BUY) | (log.kinds == SELL)
+        fallback = np.full_like(closes, np.nan)
+        fallback[np.searchsorted(days, log.days[traded_rows]), log.ticker_idx[traded_rows]] = log.price[traded_rows]
+        fallback = forward_fill(fallback)
+        closes = np.where(np.isnan(closes), fallback, closes)
+        return days, closes
+
+    def _build_history(
+        self,
+        log: TransactionLog,
+        checkpoint: ReplayCheckpoint,
+        days: np.ndarray,
+        closes: np.ndarray
+    ) -> HoldingsHistory:
+        """Daily columns from per-transaction values"""
+        row = np.searchsorted(days, log.days)
+
+        holdings = np.zeros((len(days), len(log.tickers)))
+        np.add.at(holdings, (row, log.ticker_idx), log.quantity_deltas())
+        np.cumsum(holdings, axis=0, out=holdings)
+
+        cash_flows = np.zeros(len(days))
+        np.add.at(cash_flows, row, log.cash_flows())
+
+        # Running totals as of the last transaction on or before each day
+        last = np.searchsorted(log.days, days, side="right") - 1
+        cost_basis = np.asarray(checkpoint.basis_after, dtype=np.float64)[last]
+        realized_pnl = np.asarray(checkpoint.realized_after, dtype=np.float64)[last]
+
+        positions = np.where(holdings != 0, holdings * np.nan_to_num(closes), 0.0)
+        return HoldingsHistory(days, log.tickers, holdings, positions, cost_basis, cash_flows, realized_pnl)
+
@@ -0,0 +1,222 @@
+"""
+Portfolio risk engine: covariance-based parametric and Monte Carlo VaR
+"""
+
+import hashlib
+import logging
+import os
+from datetime import date
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .cache_service import CacheService
+from .covariance import CovarianceEstimate, ledoit_wolf
+from .executor import ProviderExecutor, provider_executor
+from .portfolio_service import align_closes
+from .single_flight import SingleFlight
+from .yfinance_service import YFinanceService
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on simulated values held at once (paths x tickers per chunk)
+MC_CHUNK_ELEMENTS = int(os.getenv("MC_CHUNK_ELEMENTS", "4000000"))
+MC_MAX_PATHS = 1_000_000
+
+
+def parametric_var(
+    values: np.ndarray,
+    mean: np.ndarray,
+    cov: np.ndarray,
+    confidence: float = 0.95,
+    horizon_days: int = 1
+) -> Dict:
+    """
+    Variance-covariance (normal) VaR and CVaR with per-position breakdown
+
+    Args:
+        values: Position values in currency (one per ticker)
+        mean: Mean daily return per ticker
+        cov: Daily return covariance matrix
+        confidence: 0.95 for 95% VaR
+        horizon_days: Holding period (mean and variance scale linearly)
+
+    Returns:
+        {"var", "cvar", "volatility", "marginal", "component"}: VaR/CVaR as
+        positive losses; marginal VaR per unit of currency added to each
+        position; component VaR per position (sums to "var")
+    """
+    z = NormalDist().inv_cdf(confidence)
+    expected = float(values @ mean) * horizon_days
+    cov_values = cov @ values
+    sigma = float(np.sqrt(max(values @ cov_values, 0.0) * horizon_days))
+
+    var = z * sigma - expected
+    cvar = sigma * NormalDist().pdf(z) / (1 - confidence) - expected
+
+    if sigma > 0:
+        marginal = z * cov_values * horizon_days / sigma - mean * horizon_days
+    else:
+        marginal = -mean * horizon_days
+    return {
+        "var": var,
+        "cvar": cvar,
+        "volatility": sigma,
+        "marginal": marginal,
+        "component": values * marginal,
+    }
+
+
+def monte_carlo_var(
+    values: np.ndarray,
+    mean: np.ndarray,
+    cov: np.ndarray,
+    confidence: float = 0.95,
+    horizon_days: int = 1,
+    paths: int = 100_000,
+    seed: int = 42,
+    dof: Optional[float] = None
+) -> Dict:
+    """
+    Monte Carlo VaR and CVaR of full revaluation over the horizon
+
+    Log returns are drawn from a multivariate normal (or Student-t with
+    dof degrees of freedom, scaled to the same covariance) in chunks of at
+    most MC_CHUNK_ELEMENTS values, so memory does not grow with tickers x
+    paths. Only the portfolio P&L of each path is kept. Results depend on
+    the seed only, not on the chunk size.
+
+    Returns:
+        {"var", "cvar", "paths"} with VaR/CVaR as positive losses
+    """
+    n = len(values)
+    chol = _cholesky(cov * horizon_days)
+    drift = mean * horizon_days
+
+    normals_seed, scale_seed = np.random.SeedSequence(seed).spawn(2)
+    normals = np.random.default_rng(normals_seed)
+    scales = np.random.default_rng(scale_seed)
+
+    chunk = max(1, MC_CHUNK_ELEMENTS // max(n, 1))
+    pnl = np.empty(paths)
+    for start in range(0, paths, chunk):
+        size = min(chunk, paths - start)
+        shocks = normals.standard_normal((size, n)) @ chol.T
+        if dof is not None:
+            # Multivariate t with unit covariance scaling
+            shocks *= np.sqrt((dof - 2) / scales.chisquare(dof, size))[:, None]
+        pnl[start:start + size] = np.expm1(drift + shocks) @ values
+
+    threshold = np.quantile(pnl, 1 - confidence)
+    tail = pnl[pnl <= threshold]
+    return {
+        "var": float(-threshold),
+        "cvar": float(-tail.mean()) if len(tail) else float(-threshold),
+        "paths": paths,
+    }
+
+
+def _cholesky(cov: np.ndarray) -> np.ndarray:
+    """Cholesky factor, adding diagonal jitter if cov is not positive definite"""
+    jitter = 0.0
+    scale = float(np.mean(np.diag(cov))) or 1.0
+    for _ in range(6):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0 else jitter * 100
+    raise ValueError("Covariance matrix is not positive semi-definite")
+
+
+class RiskService:
+    """
+    Builds covariance estimates for ticker universes and prices risk
+
+    Estimates are cached per (universe, range, day) in the binary
+    covariance format, so portfolios holding the same tickers share one
+    estimate per day. Simulations run on the executor under the
+    "simulation" source so they never block the event loop.
+    """
+
+    def __init__(
+        self,
+        yfinance_service: YFinanceService,
+        cache_service: CacheService,
+        executor: Optional[ProviderExecutor] = None,
+        flight: Optional[SingleFlight] = None
+    ):
+        self.yfinance = yfinance_service
+        self.cache = cache_service
+        self.executor = executor or provider_executor
+        self.flight = flight or SingleFlight()
+
+    async def get_covariance(self, tickers: List[str], range: str = "1y") -> Optional[CovarianceEstimate]:
+        """
+        Get the shrinkage covariance of daily log returns of tickers
+
+        Args:
+            tickers: Universe (order does not matter)
+            range: History range the estimate uses
+
+        Returns:
+            CovarianceEstimate over the tickers that have history, or None
+        """
+        universe = sorted(set(tickers))
+        if not universe:
+            return None
+
+        digest = hashlib.sha1("\x00".join(universe).encode()).hexdigest()[:16]
+        key = f"{digest}:{range}:{date.today().isoformat()}"
+
+        cached = await self.cache.get_covariance(key)
+        if cached and not cached.stale:
+            logger.debug(f"Cache hit: covariance {key}")
+            return cached.value
+
+        return await self.flight.do(f"cov:{key}", lambda: self._estimate(key, universe, range))
+
+    async def _estimate(self, key: str, universe: List[str], range: str) -> Optional[CovarianceEstimate]:
+        """Align histories, estimate and cache the covariance"""
+        frames = await self.yfinance.get_history_frames(universe, range=range, interval="1d")
+        available = [t for t in universe if frames.get(t) is not None and len(frames[t]) > 2]
+        if not available:
+            return None
+
+        days, closes = align_closes(frames, available)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(np.log(closes), axis=0)
+        returns = returns[np.isfinite(returns).all(axis=1)]
+        if len(returns) < 2:
+            return None
+
+        cov, shrinkage = ledoit_wolf(returns)
+        estimate = CovarianceEstimate(
+            tickers=available,
+            mean=returns.mean(axis=0),
+            cov=cov,
+            observations=len(returns),
+            shrinkage=shrinkage,
+            as_of=int(days[-1]),
+        )
+        logger.info(f"Estimated covariance of {len(available)} tickers ({len(returns)} days, shrinkage {shrinkage:.3f})")
+
+        await self.cache.set_covariance(key, estimate)
+        return estimate
+
+    async def simulate(
+        self,
+        values: np.ndarray,
+        mean: np.ndarray,
+        cov: np.ndarray,
+        confidence: float = 0.95,
+        horizon_days: int = 1,
+        paths: int = 100_000,
+        seed: int = 42,
+        dof: Optional[float] = None
+    ) -> Dict:
+        """Run monte_carlo_var() off the event loop"""
+        return await self.executor.run(
+            "simulation", monte_carlo_var, values, mean, cov,
+            confidence, horizon_days, min(paths, MC_MAX_PATHS), seed, dof
+        )
@@ -0,0 +1,202 @@
+"""
+Single-flight request coalescing for cache misses
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as redis
+
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Deletes the lock only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent upstream fetches for the same key
+
+    Within a process, callers for a key that is already being fetched
+    await the same future. Across workers, the first caller takes a short
+    Redis lock (SET NX PX) and the others poll the cache until the
+    result shows up, the lock is released or they time out.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        lock_ttl_ms: Optional[int] = None,
+        poll_interval: float = 0.05,
+        wait_timeout: Optional[float] = None
+    ):
+        self.redis = redis_client
+        self.lock_ttl_ms = lock_ttl_ms or int(os.getenv("SINGLE_FLIGHT_LOCK_MS", "10000"))
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout or self.lock_ttl_ms / 1000
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        read_cached: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Any:
+        """
+        Run fetch once for all concurrent callers of key
+
+        Args:
+            key: Cache key being filled
+            fetch: Coroutine factory that fetches upstream and caches the result
+            read_cached: Coroutine factory that reads the cached result; enables
+                cross-worker coalescing through a Redis lock when given
+
+        Returns:
+            Result of fetch (or of the cache read performed by a waiter)
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                with stage("wait"):
+                    return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leading caller went away: take over
+                return await self.do(key, fetch, read_cached)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if read_cached is not None and self.redis is not None:
+                result = await self._locked_fetch(key, fetch, read_cached)
+            else:
+                result = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so asyncio doesn't warn when nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Background refresh of key, skipped if anyone else is already on it
+
+        Unlike do(), callers never wait: if the key is in flight in this
+        process or locked by another worker, returns None immediately.
+        """
+        if key in self._inflight:
+            return None
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if self.redis is None:
+                result = await fetch()
+            else:
+                lock_key = f"lock:{key}"
+                token = uuid.uuid4().hex
+                if not await self.redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms):
+                    result = None
+                else:
+                    try:
+                        result = await fetch()
+                    finally:
+                        await self._release(lock_key, token)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def claim(self, keys: Iterable[str]) -> Tuple[List[str], Dict[str, asyncio.Future]]:
+        """
+        Claim several keys for a batch fetch (in-process only)
+
+        Returns:
+            (keys now owned by the caller, futures of keys already in flight).
+            Every owned key must be settled with resolve().
+        """
+        loop = asyncio.get_running_loop()
+        owned = []
+        pending = {}
+        for key in keys:
+            if key in self._inflight:
+                pending[key] = self._inflight[key]
+            else:
+                self._inflight[key] = loop.create_future()
+                owned.append(key)
+        return owned, pending
+
+    def resolve(self, key: str, result: Any) -> None:
+        """Publish the result of a claimed key to its waiters"""
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    async def _locked_fetch(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        read_cached: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Fetch under a cross-worker Redis lock, or wait for its holder"""
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            try:
+                acquired = await self.redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms)
+            except Exception as e:
+                logger.warning(f"Single-flight lock error for {key}: {e}")
+                return await fetch()
+
+            if acquired:
+                try:
+                    return await fetch()
+                finally:
+                    await self._release(lock_key, token)
+
+            # Another worker is fetching: wait for its result
+            with stage("wait"):
+                await asyncio.sleep(self.poll_interval)
+            cached = await read_cached()
+            if cached is not None:
+                return cached
+
+            if time.monotonic() >= deadline:
+                logger.warning(f"Single-flight wait timed out for {key}")
+                return await fetch()
+
+    async def _release(self, lock_key: str, token: str) -> None:
+        try:
+            await self.redis.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning(f"Single-flight unlock error for {lock_key}: {e}")
@@ -0,0 +1,330 @@
+"""
+Append-only store of end-of-day portfolio snapshots with weekly and
+monthly rollups
+
+Backed by SQLite (a file, or ":memory:" for tests). Both tables are keyed
+by (portfolio, day) so range queries are primary-key index scans; the
+schema is plain SQL and maps one-to-one onto a Postgres table.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .executor import ProviderExecutor, provider_executor
+from .quant_service import QuantService
+from .replay_service import HoldingsHistory
+
+logger = logging.getLogger(__name__)
+
+# Trading days in the trailing volatility window
+VOLATILITY_WINDOW = 63
+
+ROLLUP_PERIODS = ("week", "month")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    portfolio_id TEXT NOT NULL,
+    day INTEGER NOT NULL,               -- days since the epoch
+    value REAL NOT NULL,
+    cost_basis REAL NOT NULL,
+    pnl REAL NOT NULL,                  -- unrealized + realized
+    daily_pnl REAL NOT NULL,            -- value change net of cash flows
+    cash_flow REAL NOT NULL,
+    twr_index REAL NOT NULL,            -- growth of 1 since the first day
+    volatility REAL,                    -- trailing annualized
+    drawdown REAL NOT NULL,
+    weights TEXT NOT NULL,              -- JSON {ticker: weight}
+    PRIMARY KEY (portfolio_id, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS snapshot_rollups (
+    portfolio_id TEXT NOT NULL,
+    period TEXT NOT NULL,               -- week | month
+    start_day INTEGER NOT NULL,
+    end_day INTEGER NOT NULL,
+    open REAL NOT NULL,
+    high REAL NOT NULL,
+    low REAL NOT NULL,
+    close REAL NOT NULL,
+    cash_flow REAL NOT NULL,
+    pnl REAL NOT NULL,
+    period_return REAL NOT NULL,
+    PRIMARY KEY (portfolio_id, period, start_day)
+) WITHOUT ROWID;
+"""
+
+_DAY_COLUMNS = (
+    "day", "value", "cost_basis", "pnl", "daily_pnl", "cash_flow",
+    "twr_index", "volatility", "drawdown", "weights",
+)
+_ROLLUP_COLUMNS = (
+    "start_day", "end_day", "open", "high", "low", "close", "cash_flow", "pnl", "period_return",
+)
+
+
+def build_snapshots(history: HoldingsHistory) -> Dict[str, np.ndarray]:
+    """
+    Daily snapshot columns from a replayed history
+
+    Returns:
+        Dict of column name -> array (one row per day of history)
+    """
+    value = history.value
+    returns = QuantService.calculate_period_returns(value, history.cash_flows)
+    twr_index = np.concatenate([[1.0], np.cumprod(1 + returns)])
+
+    daily_pnl = np.concatenate([[value[0] - history.cash_flows[0]], np.diff(value) - history.cash_flows[1:]])
+
+    volatility = np.full(len(value), np.nan)
+    if len(returns) >= VOLATILITY_WINDOW:
+        windows = np.lib.stride_tricks.sliding_window_view(returns, VOLATILITY_WINDOW)
+        volatility[VOLATILITY_WINDOW:] = windows.std(axis=1, ddof=1) * np.sqrt(252)
+
+    peak = np.maximum.accumulate(twr_index)
+    drawdown = 1 - twr_index / peak
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(value[:, None] != 0, history.positions / value[:, None], 0.0)
+
+    return {
+        "day": history.days,
+        "value": value,
+        "cost_basis": history.cost_basis,
+        "pnl": value - history.cost_basis + history.realized_pnl,
+        "daily_pnl": daily_pnl,
+        "cash_flow": history.cash_flows,
+        "twr_index": twr_index,
+        "volatility": volatility,
+        "drawdown": drawdown,
+        "weights": weights,
+        "tickers": history.tickers,
+    }
+
+
+def period_start(days: np.ndarray, period: str) -> np.ndarray:
+    """First day (days since the epoch) of the week (Monday) or month of each day"""
+    if period == "week":
+        # 1970-01-01 was a Thursday
+        return days - (days + 3) % 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]")
+    return months.astype("datetime64[D]").astype(np.int64)
+
+
+class SnapshotStore:
+    """
+    Daily snapshots and rollups per portfolio
+
+    sqlite3 is blocking, so every call runs on the provider executor under
+    the "snapshots" source, which allows one call at a time.
+    """
+
+    def __init__(self, path: Optional[str] = None, executor: Optional[ProviderExecutor] = None):
+        self.path = path or os.getenv("SNAPSHOT_DB_PATH", "snapshots.db")
+        self.executor = executor or provider_executor
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def last_day(self, portfolio_id: str) -> Optional[int]:
+        """Most recent stored day of a portfolio"""
+        return await self.executor.run("snapshots", self._last_day, portfolio_id)
+
+    async def append(
+        self,
+        portfolio_id: str,
+        snapshots: Dict[str, np.ndarray],
+        changed_from: Optional[int] = None,
+        rebuild: bool = False
+    ) -> int:
+        """
+        Store snapshot rows and refresh the rollups they touch
+
+        Rows before the last stored day are left alone (the store is
+        append-only); the last stored day itself is overwritten so an
+        intraday snapshot is replaced by the end-of-day one.
+
+        Args:
+            portfolio_id: Portfolio the rows belong to
+            snapshots: Columns from build_snapshots()
+            changed_from: Also rewrite stored rows from this day on (a
+                transaction on or before the last stored day)
+            rebuild: Replace every stored row
+
+        Returns:
+            Number of rows written
+        """
+        return await self.executor.run(
+            "snapshots", self._append, portfolio_id, snapshots, changed_from, rebuild
+        )
+
+    async def query(
+        self,
+        portfolio_id: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        granularity: str = "day"
+    ) -> List[Dict]:
+        """
+        Snapshots of a portfolio between two days (inclusive)
+
+        Args:
+            granularity: day (daily rows) or week / month (rollups)
+
+        Returns:
+            Rows as dicts, oldest first
+        """
+        return await self.executor.run("snapshots", self._query, portfolio_id, start, end, granularity)
+
+    async def held_tickers(self) -> List[str]:
+        """Tickers with a weight in the latest snapshot of any portfolio"""
+        return await self.executor.run("snapshots", self._held_tickers)
+
+    def _held_tickers(self) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT s.weights FROM snapshots s JOIN ("
+            "SELECT portfolio_id, MAX(day) AS day FROM snapshots GROUP BY portfolio_id"
+            ") latest ON s.portfolio_id = latest.portfolio_id AND s.day = latest.day"
+        ).fetchall()
+        return sorted({ticker for (weights,) in rows for ticker in json.loads(weights)})
+
+    def _last_day(self, portfolio_id: str) -> Optional[int]:
+        row = self.conn.execute(
+            "SELECT MAX(day) FROM snapshots WHERE portfolio_id = ?", (portfolio_id,)
+        ).fetchone()
+        return row[0]
+
+    def _append(
+        self,
+        portfolio_id: str,
+        snapshots: Dict[str, np.ndarray],
+        changed_from: Optional[int],
+        rebuild: bool
+    ) -> int:
+        days = snapshots["day"]
+        start = 0
+        if not rebuild:
+            last = self._last_day(portfolio_id)
+            if last is not None:
+                if changed_from is not None:
+                    last = min(last, changed_from)
+                start = int(np.searchsorted(days, last, side="left"))
+        if start >= len(days):
+            return 0
+
+        tickers = snapshots["tickers"]
+        weights = snapshots["weights"][start:]
+        rows = zip(
+            days[start:].tolist(),
+            *(snapshots[column][start:].tolist() for column in _DAY_COLUMNS[1:-1]),
+            (json.dumps({t: round(w, 6) for t, w in zip(tickers, row) if t and w}) for row in weights.tolist()),
+        )
+        placeholders = ", ".join("?" * (len(_DAY_COLUMNS) + 1))
+
+        with self.conn:
+            if rebuild:
+                self.conn.execute("DELETE FROM snapshots WHERE portfolio_id = ?", (portfolio_id,))
+                self.conn.execute("DELETE FROM snapshot_rollups WHERE portfolio_id = ?", (portfolio_id,))
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO snapshots (portfolio_id, {', '.join(_DAY_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                ((portfolio_id, *row) for row in rows),
+            )
+            for period in ROLLUP_PERIODS:
+                self._refresh_rollups(portfolio_id, period, int(days[start]))
+
+        written = len(days) - start
+        logger.info(f"Stored {written} snapshots for {portfolio_id}")
+        return written
+
+    def _refresh_rollups(self, portfolio_id: str, period: str, from_day: int) -> None:
+        """Recompute the rollups of every period at or after the one containing from_day"""
+        first = int(period_start(np.array([from_day]), period)[0])
+
+        # Close of the previous period anchors the first period's return
+        previous = self.conn.execute(
+            "SELECT twr_index, value FROM snapshots WHERE portfolio_id = ? AND day < ? "
+            "ORDER BY day DESC LIMIT 1",
+            (portfolio_id, first),
+        ).fetchone()
+        rows = self.conn.execute(
+            "SELECT day, value, cash_flow, daily_pnl, twr_index FROM snapshots "
+            "WHERE portfolio_id = ? AND day >= ? ORDER BY day",
+            (portfolio_id, first),
+        ).fetchall()
+        if not rows:
+            return
+
+        day, value, cash_flow, daily_pnl, twr_index = (np.array(column) for column in zip(*rows))
+        starts = period_start(day, period)
+        bounds = np.flatnonzero(np.diff(starts)) + 1
+        first_rows = np.concatenate([[0], bounds])
+        last_rows = np.concatenate([bounds - 1, [len(day) - 1]])
+
+        # Index and value at the close of the period before each one
+        prior_index = np.concatenate([[previous[0] if previous else 1.0], twr_index[last_rows[:-1]]])
+        prior_value = np.concatenate([[previous[1] if previous else value[0]], value[last_rows[:-1]]])
+
+        rollups = zip(
+            starts[first_rows].tolist(),
+            day[last_rows].tolist(),
+            prior_value.tolist(),
+            np.maximum.reduceat(value, first_rows).tolist(),
+            np.minimum.reduceat(value, first_rows).tolist(),
+            value[last_rows].tolist(),
+            np.add.reduceat(cash_flow, first_rows).tolist(),
+            np.add.reduceat(daily_pnl, first_rows).tolist(),
+            (twr_index[last_rows] / prior_index - 1).tolist(),
+        )
+        placeholders = ", ".join("?" * (len(_ROLLUP_COLUMNS) + 2))
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO snapshot_rollups (portfolio_id, period, {', '.join(_ROLLUP_COLUMNS)}) "
+            f"VALUES ({placeholders})",
+            ((portfolio_id, period, *row) for row in rollups),
+        )
+
+    def _query(
+        self,
+        portfolio_id: str,
+        start: Optional[int],
+        end: Optional[int],
+        granularity: str
+    ) -> List[Dict]:
+        lo = start if start is not None else -(2 ** 62)
+        hi = end if end is not None else 2 ** 62
+
+        if granularity == "day":
+            cursor = self.conn.execute(
+                f"SELECT {', '.join(_DAY_COLUMNS)} FROM snapshots "
+                "WHERE portfolio_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (portfolio_id, lo, hi),
+            )
+            columns = _DAY_COLUMNS
+        else:
+            cursor = self.conn.execute(
+                f"SELECT {', '.join(_ROLLUP_COLUMNS)} FROM snapshot_rollups "
+                "WHERE portfolio_id = ? AND period = ? AND end_day >= ? AND start_day <= ? "
+                "ORDER BY start_day",
+                (portfolio_id, granularity, lo, hi),
+            )
+            columns = _ROLLUP_COLUMNS
+
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        if granularity == "day":
+            for row in rows:
+                row["weights"] = json.loads(row["weights"])
+        return rows
@@ -1,90 +1,264 @@
 """
-yfinance service with caching and error handling
+Market data service with caching and error handling
 """
 
-import yfinance as yf
+import asyncio
 import logging
-from typing import Optional, Dict, List
-from datetime import datetime, timedelta
+import time
+from typing import AsyncIterator, Optional, Dict, List, Set, Tuple
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 from .cache_service import CacheService
+from .executor import ProviderExecutor, provider_executor
+from .history_frame import HistoryFrame, RANGE_SPANS
+from .metrics import detached_task, stage
+from .providers import MarketDataProvider, YFinanceProvider
+from .single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+# How far back yfinance serves intraday bars
+INTRADAY_RETENTION = {
+    "1m": 7 * 86400,
+    "5m": 60 * 86400,
+    "1h": 730 * 86400,
+}
+
+
+# Ticker info fields (response name -> yfinance name) by cache group
+INFO_FIELDS = {
+    "profile": {
+        "name": "longName",
+        "sector": "sector",
+        "industry": "industry",
+        "currency": "currency",
+    },
+    "fundamentals": {
+        "marketCap": "marketCap",
+        "sharesOutstanding": "sharesOutstanding",
+        "pe": "trailingPE",
+        "eps": "epsTrailingTwelveMonths",
+        "financialCurrency": "financialCurrency",
+        "dividendYield": "dividendYield",
+        "beta": "beta",
+        "fiftyTwoWeekHigh": "fiftyTwoWeekHigh",
+        "fiftyTwoWeekLow": "fiftyTwoWeekLow",
+    },
+}
+
+
+def _build_info(ticker: str, groups: Optional[Dict[str, Dict]], quote: Optional[Dict]) -> Optional[Dict]:
+    """
+    Response info from cached field groups and the latest quote
+
+    Price-dependent fields are recomputed when the quote is in the
+    currency the fundamentals are reported in (London listings quote in
+    pence, ADRs report in the home currency: those keep the cached values).
+    """
+    if not groups:
+        return None
+    profile, fundamentals = groups["profile"], groups["fundamentals"]
+
+    info = {
+        "ticker": ticker,
+        "name": profile.get("name"),
+        "marketCap": fundamentals.get("marketCap"),
+        "pe": fundamentals.get("pe"),
+        "eps": fundamentals.get("eps"),
+        "dividendYield": fundamentals.get("dividendYield"),
+        "beta": fundamentals.get("beta"),
+        "sector": profile.get("sector"),
+        "industry": profile.get("industry"),
+        "currency": profile.get("currency"),
+        "fiftyTwoWeekHigh": fundamentals.get("fiftyTwoWeekHigh"),
+        "fiftyTwoWeekLow": fundamentals.get("fiftyTwoWeekLow"),
+    }
+
+    price = quote.get("price") if quote else None
+    if not price or quote.get("currency") != info["currency"]:
+        return info
+
+    if fundamentals.get("sharesOutstanding"):
+        info["marketCap"] = fundamentals["sharesOutstanding"] * price
+    eps = info["eps"]
+    if eps and eps > 0 and fundamentals.get("financialCurrency") in (None, info["currency"]):
+        info["pe"] = price / eps
+    if info["fiftyTwoWeekHigh"] is not None:
+        info["fiftyTwoWeekHigh"] = max(info["fiftyTwoWeekHigh"], price)
+    if info["fiftyTwoWeekLow"] is not None:
+        info["fiftyTwoWeekLow"] = min(info["fiftyTwoWeekLow"], price)
+    return info
+
 
 class YFinanceService:
-    """Service for fetching market data from yfinance with caching"""
+    """
+    Service for fetching market data with caching
+
+    Upstream calls go through a MarketDataProvider (yfinance unless
+    another provider or provider chain is given). Concurrent cache misses
+    for the same key are coalesced into one upstream fetch.
+    """
 
-    def __init__(self, cache_service: CacheService):
+    def __init__(
+        self,
+        cache_service: CacheService,
+        executor: Optional[ProviderExecutor] = None,
+        flight: Optional[SingleFlight] = None,
+        provider: Optional[MarketDataProvider] = None
+    ):
         self.cache = cache_service
+        self.executor = executor or provider_executor
+        self.flight = flight or SingleFlight()
+        self.provider = provider or YFinanceProvider(self.executor)
+        self._background: Set[asyncio.Task] = set()
 
-    def get_quote(self, ticker: str) -> Optional[Dict]:
+    async def get_quote(self, ticker: str) -> Optional[Dict]:
         """
         Get current quote for a ticker
 
+        A stale cached quote is returned immediately and refreshed in the
+        background; callers only wait upstream when nothing is cached.
+
         Returns:
             Dict with: price, change, changePercent, currency, timestamp
         """
         # Check cache
-        cached = self.cache.get_quote(ticker)
+        cached = await self.cache.get_quote_entry(ticker)
         if cached:
             logger.debug(f"Cache hit: {ticker}")
-            return cached
+            if cached.stale:
+                self._revalidate(f"quote:{ticker}", lambda: self._refresh_quote(ticker))
+            return cached.value
 
-        # Fetch from yfinance
-        try:
-            ticker_obj = yf.Ticker(ticker)
-            hist = ticker_obj.history(period="2d")  # Get 2 days to calculate change
+        return await self.flight.do(
+            f"quote:{ticker}",
+            lambda: self._refresh_quote(ticker),
+            lambda: self.cache.get_quote(ticker)
+        )
 
-            if hist.empty:
-                logger.error(f"No data for {ticker}")
-                return None
+    async def _refresh_quote(self, ticker: str) -> Optional[Dict]:
+        """Fetch a quote and cache it"""
+        data = await self._fetch_quote(ticker)
 
-            # Latest data
-            latest = hist.iloc[-1]
-            previous = hist.iloc[-2] if len(hist) > 1 else hist.iloc[-1]
+        if data:
+            # Fresh for 30s
+            await self.cache.set_quote(ticker, data)
 
-            price = latest['Close']
-            prev_close = previous['Close']
+        return data
 
-            change = price - prev_close
-            change_percent = (change / prev_close) * 100 if prev_close != 0 else 0
+    async def get_quotes_batch(self, tickers: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Get quotes for multiple tickers
 
-            # Detect currency from ticker
-            currency = self._detect_currency(ticker)
+        Reads every cached quote with one MGET, fetches only the misses
+        (one bulk download, then concurrent per-ticker fetches for anything
+        the bulk call could not resolve) and writes the fresh quotes back
+        in one pipeline. Stale quotes are served and refreshed in the
+        background.
 
-            data = {
-                "ticker": ticker,
-                "price": float(price),
-                "change": float(change),
-                "changePercent": float(change_percent),
-                "currency": currency,
-                "timestamp": datetime.now().isoformat()
-            }
+        Returns:
+            Dict mapping ticker to quote data (None if error)
+        """
+        results: Dict[str, Optional[Dict]] = dict.fromkeys(tickers)
+        async for ticker, data in self.iter_quotes(tickers):
+            results[ticker] = data
+        return results
 
-            # Cache for 30s
-            self.cache.set_quote(ticker, data)
+    async def iter_quotes(self, tickers: List[str]) -> AsyncIterator[Tuple[str, Optional[Dict]]]:
+        """
+        Yield (ticker, quote) pairs as soon as each is available
 
-            return data
+        Cached quotes (one MGET) are yielded before any upstream fetch
+        starts; the misses follow once fetched. Same caching and
+        revalidation as get_quotes_batch().
+        """
+        tickers = list(dict.fromkeys(tickers))
+        entries = await self.cache.get_quotes(tickers)
 
-        except Exception as e:
-            logger.error(f"Error fetching quote for {ticker}: {e}")
-            return None
+        stale = [ticker for ticker, entry in entries.items() if entry and entry.stale]
+        if stale:
+            self._revalidate(f"quotes:{','.join(stale)}", lambda: self._fetch_quotes(stale))
+
+        misses = []
+        for ticker, entry in entries.items():
+            if entry and entry.value:
+                yield ticker, entry.value
+            else:
+                misses.append(ticker)
+
+        if misses:
+            for ticker, data in (await self._fetch_quotes(misses)).items():
+                yield ticker, data
 
-    def get_quotes_batch(self, tickers: List[str]) -> Dict[str, Optional[Dict]]:
+    async def refresh_quotes(self, tickers: List[str]) -> Dict[str, Optional[Dict]]:
         """
-        Get quotes for multiple tickers
+        Fetch quotes upstream regardless of the cache, and cache them
 
-        Returns:
-            Dict mapping ticker to quote data (None if error)
+        Used by the live quote feed, which needs the latest price every
+        poll; the refreshed quotes also serve regular quote requests.
         """
-        results = {}
+        return await self._fetch_quotes(list(dict.fromkeys(tickers)))
 
-        for ticker in tickers:
-            results[ticker] = self.get_quote(ticker)
+    async def _fetch_quotes(self, tickers: List[str]) -> Dict[str, Optional[Dict]]:
+        """Fetch quotes for several tickers and cache them"""
+        # Tickers another request is already fetching are awaited, not refetched
+        owned, pending = self.flight.claim(f"quote:{ticker}" for ticker in tickers)
+        owned_tickers = [key.split(":", 1)[1] for key in owned]
 
-        return results
+        fetched = {}
+        try:
+            if owned_tickers:
+                try:
+                    with stage("fetch", "quotes"):
+                        quotes = await self.provider.quotes(owned_tickers)
+                except Exception as e:
+                    logger.error(f"Error fetching quotes for {len(owned_tickers)} tickers: {e}")
+                    quotes = {}
+                fetched = {ticker: quotes.get(ticker) for ticker in owned_tickers}
+
+                fresh = {ticker: data for ticker, data in fetched.items() if data}
+                await self.cache.set_quotes(fresh)
+        finally:
+            for key in owned:
+                self.flight.resolve(key, fetched.get(key.split(":", 1)[1]))
+
+        for key, future in pending.items():
+            try:
+                with stage("wait", "quotes"):
+                    fetched[key.split(":", 1)[1]] = await asyncio.shield(future)
+            except Exception:
+                fetched[key.split(":", 1)[1]] = None
+
+        return fetched
+
+    def _revalidate(self, key: str, fetch) -> None:
+        """Schedule a background refresh of a stale key (deduplicated)"""
+        task = detached_task(self.flight.refresh(key, fetch))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Background refresh failed: {task.exception()}")
+
+    async def aclose(self) -> None:
+        """Cancel pending background refreshes"""
+        tasks = list(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_quote(self, ticker: str) -> Optional[Dict]:
+        """Fetch a single quote (no caching)"""
+        try:
+            with stage("fetch", "quotes"):
+                return (await self.provider.quotes([ticker])).get(ticker)
+        except Exception as e:
+            logger.error(f"Error fetching quote for {ticker}: {e}")
+            return None
 
-    def get_history(
+    async def get_history(
         self,
         ticker: str,
         range: str = "1mo",
@@ -101,139 +275,255 @@ class YFinanceService:
         Returns:
             Dict with ticker and array of OHLCV data
         """
+        frame = await self.get_history_frame(ticker, range, interval)
+        return frame.to_dict() if frame is not None else None
+
+    async def get_history_frame(
+        self,
+        ticker: str,
+        range: str = "1mo",
+        interval: str = "1d"
+    ) -> Optional[HistoryFrame]:
+        """
+        Get historical data for a ticker as NumPy columns
+
+        Every range is a slice of one canonical bar store per
+        (ticker, interval). The store is backfilled when a longer range
+        is requested than it covers, and otherwise only extended with bars
+        newer than its last one (in the background once it is stale).
+        Use this for calculations (e.g. frame.close).
+        """
+        span = self._required_span(range, interval)
+
         # Check cache
-        cached = self.cache.get_history(ticker, range, interval)
-        if cached:
+        cached, covered = await self.cache.get_bars(ticker, interval)
+        if cached and covered >= span:
             logger.debug(f"Cache hit: {ticker} {range} {interval}")
-            return cached
+            if cached.stale:
+                self._revalidate(
+                    f"bars:{ticker}:{interval}",
+                    lambda: self._extend_bars(ticker, interval)
+                )
+            return cached.value.slice_range(range)
+
+        frame = await self.flight.do(
+            f"bars:{ticker}:{interval}:{span}",
+            lambda: self._backfill_bars(ticker, range, interval),
+            lambda: self._read_bars(ticker, interval, span)
+        )
+        return frame.slice_range(range) if frame is not None else None
+
+    async def get_history_frames(
+        self,
+        tickers: List[str],
+        range: str = "1mo",
+        interval: str = "1d"
+    ) -> Dict[str, Optional[HistoryFrame]]:
+        """
+        Get historical data for several tickers
 
-        # Fetch from yfinance
-        try:
-            ticker_obj = yf.Ticker(ticker)
-            hist = ticker_obj.history(period=range, interval=interval)
+        All bar stores are read in one MGET; only tickers whose store is
+        missing or too short go upstream (concurrently, coalesced per key).
+        """
+        span = self._required_span(range, interval)
+        cached = await self.cache.get_bars_many(tickers, interval)
 
-            if hist.empty:
-                logger.error(f"No history for {ticker} {range} {interval}")
-                return None
+        results = {}
+        missing = []
+        for ticker in tickers:
+            entry, covered = cached[ticker]
+            if entry and covered >= span:
+                if entry.stale:
+                    self._revalidate(
+                        f"bars:{ticker}:{interval}",
+                        lambda t=ticker: self._extend_bars(t, interval)
+                    )
+                results[ticker] = entry.value.slice_range(range)
+            else:
+                missing.append(ticker)
+
+        if missing:
+            logger.debug(f"Cache miss: {len(missing)} of {len(tickers)} histories")
+            fetched = await asyncio.gather(
+                *(self.get_history_frame(ticker, range, interval) for ticker in missing),
+                return_exceptions=True
+            )
+            for ticker, frame in zip(missing, fetched):
+                if isinstance(frame, Exception):
+                    logger.error(f"Error fetching history for {ticker}: {frame}")
+                    frame = None
+                results[ticker] = frame
 
-            # Convert to list of dicts
-            data = []
-            for date, row in hist.iterrows():
-                data.append({
-                    "date": date.isoformat(),
-                    "open": float(row['Open']),
-                    "high": float(row['High']),
-                    "low": float(row['Low']),
-                    "close": float(row['Close']),
-                    "volume": int(row['Volume'])
-                })
-
-            result = {
-                "ticker": ticker,
-                "data": data
-            }
+        return results
 
-            # Cache with dynamic TTL
-            self.cache.set_history(ticker, range, interval, result)
+    def _required_span(self, range: str, interval: str) -> int:
+        """Seconds of bars a range needs, capped by what yfinance keeps intraday"""
+        span = RANGE_SPANS.get(range, RANGE_SPANS["1mo"])
+        return min(span, INTRADAY_RETENTION.get(interval, span))
 
-            return result
+    async def _read_bars(self, ticker: str, interval: str, span: int) -> Optional[HistoryFrame]:
+        """Cached bar store, if it covers span"""
+        cached, covered = await self.cache.get_bars(ticker, interval)
+        return cached.value if cached and covered >= span else None
 
-        except Exception as e:
-            logger.error(f"Error fetching history for {ticker}: {e}")
+    async def _backfill_bars(self, ticker: str, range: str, interval: str) -> Optional[HistoryFrame]:
+        """Fetch a full range from the provider and merge it into the bar store"""
+        fetched = await self._fetch_history(ticker, interval, period=range)
+        if fetched is None:
             return None
 
-    def get_info(self, ticker: str) -> Optional[Dict]:
-        """Get comprehensive ticker info"""
-        try:
-            ticker_obj = yf.Ticker(ticker)
-            info = ticker_obj.info
+        # Another request may have stored a longer range meanwhile: keep it
+        cached, covered = await self.cache.get_bars(ticker, interval)
+        frame = cached.value.merge(fetched) if cached else fetched
+        covered = max(covered, self._required_span(range, interval))
 
-            if not info:
-                return None
+        await self._store_bars(ticker, interval, frame, covered)
+        return frame
 
-            # Extract relevant fields
-            return {
-                "ticker": ticker,
-                "name": info.get("longName"),
-                "marketCap": info.get("marketCap"),
-                "pe": info.get("trailingPE"),
-                "eps": info.get("epsTrailingTwelveMonths"),
-                "dividendYield": info.get("dividendYield"),
-                "beta": info.get("beta"),
-                "sector": info.get("sector"),
-                "industry": info.get("industry"),
-                "currency": info.get("currency"),
-                "fiftyTwoWeekHigh": info.get("fiftyTwoWeekHigh"),
-                "fiftyTwoWeekLow": info.get("fiftyTwoWeekLow"),
-            }
+    async def _extend_bars(self, ticker: str, interval: str) -> Optional[HistoryFrame]:
+        """Fetch only bars since the last stored one and append them"""
+        cached, covered = await self.cache.get_bars(ticker, interval)
+        if not cached:
+            return None
 
-        except Exception as e:
-            logger.error(f"Error fetching info for {ticker}: {e}")
+        stored = cached.value
+        # Refetch the whole day of the last bar so a partial bar is replaced
+        last = datetime.fromtimestamp(
+            int(stored.timestamps[-1]),
+            ZoneInfo(stored.tz) if stored.tz else timezone.utc
+        )
+        fetched = await self._fetch_history(ticker, interval, start=last.date().isoformat())
+        if fetched is None:
             return None
 
-    def get_fx_rate(self, base: str, quote: str) -> Optional[float]:
-        """
-        Get FX rate between two currencies
+        frame = stored.merge(fetched)
+        await self._store_bars(ticker, interval, frame, covered)
+        return frame
 
-        Args:
-            base: Base currency (EUR, USD, etc.)
-            quote: Quote currency (EUR, USD, etc.)
+    async def _store_bars(self, ticker: str, interval: str, frame: HistoryFrame, covered: int) -> None:
+        retention = INTRADAY_RETENTION.get(interval)
+        if retention:
+            frame = frame.since(int(time.time()) - retention)
+            covered = min(covered, retention)
+        await self.cache.set_bars(ticker, interval, frame, covered)
 
-        Returns:
-            Exchange rate (amount of quote per 1 base)
+    async def _fetch_history(
+        self,
+        ticker: str,
+        interval: str,
+        period: Optional[str] = None,
+        start: Optional[str] = None
+    ) -> Optional[HistoryFrame]:
         """
-        if base == quote:
-            return 1.0
-
-        # Check cache
-        cached = self.cache.get_fx_rate(base, quote)
-        if cached:
-            logger.debug(f"Cache hit: FX {base}/{quote}")
-            return cached
+        Fetch bars from the provider (no caching)
 
-        # Fetch from yfinance
+        Returns:
+            HistoryFrame (empty if there are no bars after start), or None
+            on error / unknown ticker
+        """
         try:
-            pair = f"{base}{quote}=X"
-            ticker_obj = yf.Ticker(pair)
-            hist = ticker_obj.history(period="1d")
-
-            if hist.empty:
-                logger.error(f"No FX data for {pair}")
-                return None
+            with stage("fetch", "history"):
+                return await self.provider.history(ticker, interval, period=period, start=start)
+        except Exception as e:
+            logger.error(f"Error fetching history for {ticker}: {e}")
+            return None
 
-            rate = float(hist['Close'].iloc[-1])
+    async def get_info(self, ticker: str) -> Optional[Dict]:
+        """Get comprehensive ticker info (see get_infos)"""
+        return (await self.get_infos([ticker]))[ticker]
 
-            # Cache for 1 hour
-            self.cache.set_fx_rate(base, quote, rate)
+    async def get_infos(self, tickers: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Get ticker info (fundamentals) for several tickers
 
-            return rate
+        Field groups are cached with their own TTLs (INFO_TTL) and read
+        for every ticker in one MGET; stale groups are served and refreshed
+        in the background, and only tickers with nothing cached wait on
+        yfinance. Market cap, P/E and the 52-week range are brought up to
+        date from the cached quote, so they follow the price without an
+        upstream call.
 
-        except Exception as e:
-            logger.error(f"Error fetching FX rate {base}/{quote}: {e}")
-            return None
+        Returns:
+            Dict mapping ticker to info (None if unknown)
+        """
+        tickers = list(dict.fromkeys(tickers))
+        cached, quotes = await asyncio.gather(
+            self.cache.get_infos(tickers),
+            self.cache.get_quotes(tickers)
+        )
+
+        results: Dict[str, Optional[Dict]] = {}
+        misses = []
+        for ticker in tickers:
+            groups = cached[ticker]
+            if not all(groups.values()):
+                misses.append(ticker)
+                continue
+            if any(entry.stale for entry in groups.values()):
+                self._revalidate(f"info:{ticker}", lambda t=ticker: self._refresh_info(t))
+            results[ticker] = {group: entry.value for group, entry in groups.items()}
+
+        if misses:
+            logger.debug(f"Cache miss: info for {len(misses)} of {len(tickers)} tickers")
+            fetched = await asyncio.gather(*(self._load_info(ticker) for ticker in misses))
+            results.update(zip(misses, fetched))
+
+        return {
+            ticker: _build_info(ticker, results.get(ticker), quotes[ticker].value if quotes[ticker] else None)
+            for ticker in tickers
+        }
 
-    def _detect_currency(self, ticker: str) -> str:
+    async def refresh_infos(self, tickers: List[str]) -> Dict[str, bool]:
         """
-        Detect currency from ticker suffix
+        Fetch info upstream regardless of the cache, and cache it
+
+        Used by the nightly fundamentals prefetch.
 
-        Examples:
-            AAPL → USD
-            ASML.ASX → EUR (Amsterdam)
-            7203.T → JPY (Tokyo)
+        Returns:
+            Dict mapping ticker to whether info was fetched
         """
-        # Mapping of exchanges to currencies
-        exchange_currency = {
-            ".TO": "CAD",  # Toronto
-            ".T": "JPY",   # Tokyo
-            ".DE": "EUR",  # Xetra
-            ".PA": "EUR",  # Paris
-            ".AM": "EUR",  # Amsterdam
-            ".L": "GBP",   # London
+        tickers = list(dict.fromkeys(tickers))
+        fetched = await asyncio.gather(
+            *(self.flight.refresh(f"info:{ticker}", lambda t=ticker: self._refresh_info(t)) for ticker in tickers),
+            return_exceptions=True
+        )
+        return {
+            ticker: bool(groups) and not isinstance(groups, Exception)
+            for ticker, groups in zip(tickers, fetched)
         }
 
-        for suffix, currency in exchange_currency.items():
-            if ticker.endswith(suffix):
-                return currency
+    async def _load_info(self, ticker: str) -> Optional[Dict[str, Dict]]:
+        """Fetch uncached info once across concurrent callers and workers"""
+        async def read_cached():
+            groups = (await self.cache.get_infos([ticker]))[ticker]
+            if not all(groups.values()):
+                return None
+            return {group: entry.value for group, entry in groups.items()}
+
+        return await self.flight.do(f"info:{ticker}", lambda: self._refresh_info(ticker), read_cached)
+
+    async def _refresh_info(self, ticker: str) -> Optional[Dict[str, Dict]]:
+        """Fetch info and cache it by field group"""
+        groups = await self._fetch_info(ticker)
+        if groups:
+            await self.cache.set_info(ticker, groups)
+        return groups
 
-        # Default to USD
-        return "USD"
+    async def _fetch_info(self, ticker: str) -> Optional[Dict[str, Dict]]:
+        """Fetch ticker info from the provider, split into INFO_TTL field groups"""
+        try:
+            with stage("fetch", "info"):
+                info = await self.provider.info(ticker)
+
+            if not info:
+                return None
+
+            # Extract relevant fields
+            return {
+                group: {field: info.get(source) for field, source in fields.items()}
+                for group, fields in INFO_FIELDS.items()
+            }
+
+        except Exception as e:
+            logger.error(f"Error fetching info for {ticker}: {e}")
+            return None
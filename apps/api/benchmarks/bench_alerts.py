@@ -0,0 +1,120 @@
+"""
+Micro-benchmark: indexed alert evaluation vs scanning every alert
+
+Run from apps/api:
+    python -m benchmarks.bench_alerts
+"""
+
+import time
+
+import numpy as np
+
+from app.services.alert_engine import AlertIndex
+
+TYPES = ("RISES_ABOVE", "DROPS_BELOW", "PRICE_TARGET", "PERCENT_CHANGE")
+
+
+def make_alerts(rng, count: int, tickers: int):
+    """Thresholds within +-30% of each ticker's base price (100)"""
+    symbols = rng.integers(0, tickers, count)
+    kinds = rng.integers(0, len(TYPES), count)
+    prices = 100 * (1 + rng.uniform(-0.3, 0.3, count))
+    changes = rng.uniform(-10, 10, count)
+    return [
+        {
+            "id": f"alert-{i}",
+            "ticker": f"T{symbols[i]}",
+            "type": TYPES[kinds[i]],
+            "targetPrice": float(prices[i]),
+            "targetChangePercent": float(changes[i]),
+        }
+        for i in range(count)
+    ]
+
+
+def make_ticks(rng, count: int, tickers: int):
+    """Random-walk quote updates (ticker, price, change percent)"""
+    symbols = rng.integers(0, tickers, count)
+    steps = rng.normal(0, 0.002, count)
+    prices = np.full(tickers, 100.0)
+    ticks = []
+    for symbol, step in zip(symbols.tolist(), steps.tolist()):
+        prices[symbol] *= 1 + step
+        ticks.append((f"T{symbol}", float(prices[symbol]), (prices[symbol] / 100 - 1) * 100))
+    return ticks
+
+
+class ScanEngine:
+    """Baseline: test every active alert on every quote update"""
+
+    def __init__(self, alerts):
+        self.alerts = [dict(alert) for alert in alerts]
+        self.last = {}
+
+    def evaluate(self, ticker, price, change):
+        previous = self.last.get(ticker)
+        self.last[ticker] = price
+        triggered = []
+        for alert in self.alerts:
+            if alert["ticker"] != ticker or alert.get("done"):
+                continue
+            kind, target = alert["type"], alert["targetPrice"]
+            if kind == "RISES_ABOVE":
+                hit = price >= target
+            elif kind == "DROPS_BELOW":
+                hit = price <= target
+            elif kind == "PRICE_TARGET":
+                hit = previous is not None and (previous < target) != (price < target)
+            else:
+                pct = alert["targetChangePercent"]
+                hit = change >= pct if pct >= 0 else change <= pct
+            if hit:
+                alert["done"] = True
+                triggered.append(alert["id"])
+        return triggered
+
+
+def percentiles(samples):
+    values = np.array(samples) * 1e6
+    return np.percentile(values, [50, 99]).tolist() + [values.max()]
+
+
+def run(evaluate, ticks):
+    samples = []
+    triggered = 0
+    clock = time.perf_counter
+    for ticker, price, change in ticks:
+        start = clock()
+        triggered += len(evaluate(ticker, price, change))
+        samples.append(clock() - start)
+    return samples, triggered
+
+
+def main() -> None:
+    rng = np.random.default_rng(42)
+    tickers = 2_000
+
+    print(f"{'case':<36}{'p50 us':>10}{'p99 us':>10}{'max us':>10}{'triggered':>11}")
+    for count in (10_000, 100_000, 500_000):
+        alerts = make_alerts(rng, count, tickers)
+        ticks = make_ticks(rng, 50_000, tickers)
+
+        index = AlertIndex()
+        start = time.perf_counter()
+        index.load(alerts)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        samples, triggered = run(index.evaluate, ticks)
+        p50, p99, worst = percentiles(samples)
+        print(f"{f'index, {count:,} alerts':<36}{p50:>10.2f}{p99:>10.2f}{worst:>10.1f}{triggered:>11,}")
+
+        # The scan is O(alerts) per tick: time a slice of the ticks
+        scan = ScanEngine(alerts)
+        samples, triggered = run(scan.evaluate, ticks[:max(200, 2_000_000 // count)])
+        p50, p99, worst = percentiles(samples)
+        print(f"{f'scan, {count:,} alerts':<36}{p50:>10.2f}{p99:>10.2f}{worst:>10.1f}{'':>11}")
+        print(f"{f'  (index load {load_ms:.0f} ms)':<36}")
+
+
+if __name__ == "__main__":
+    main()
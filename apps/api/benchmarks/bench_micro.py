@@ -0,0 +1,158 @@
+"""
+Micro-benchmarks: every QuantService method and CacheService serialization
+
+Reports p50/p95/p99 per call and the peak memory one call allocates,
+and writes the results as JSON so two commits can be compared with
+benchmarks.compare.
+
+Run from apps/api:
+    python -m benchmarks.bench_micro [--repeat N] [--filter TEXT] [--output PATH]
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.services.cache_service import CacheEntry, CacheService
+from app.services.covariance import CovarianceEstimate
+from app.services.history_frame import HistoryFrame
+from app.services.quant_service import QuantService
+
+from .common import peak_allocated, print_table, summarize, time_calls, write_results
+
+WINDOWS = (30, 90, 252)
+
+
+def make_cash_flows(rng, count: int) -> List[Tuple[datetime, float]]:
+    """Buys and sells over ten years, closed at 1.5x net invested"""
+    start = datetime(2015, 1, 1)
+    days = np.sort(rng.integers(0, 3650, count))
+    amounts = -rng.uniform(100, 1000, count)
+    amounts[rng.random(count) < 0.2] *= -0.8
+    flows = [(start + timedelta(days=int(d)), float(a)) for d, a in zip(days, amounts)]
+    flows.append((start + timedelta(days=3650), float(-amounts.sum() * 1.5)))
+    return flows
+
+
+def make_frame(rng, ticker: str, bars: int) -> HistoryFrame:
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, bars))
+    return HistoryFrame(
+        ticker=ticker,
+        timestamps=1_500_000_000 + 86_400 * np.arange(bars, dtype=np.int64),
+        open=close * 0.999,
+        high=close * 1.01,
+        low=close * 0.99,
+        close=close,
+        volume=rng.integers(1_000, 1_000_000, bars).astype(np.float64),
+        tz="America/New_York",
+    )
+
+
+def quant_cases(rng) -> Dict[str, Callable[[], object]]:
+    """One case per public QuantService method, on a series and on a matrix"""
+    q = QuantService
+    series = 100 * np.cumprod(1 + rng.normal(0, 0.01, 2_520))
+    matrix = 100 * np.cumprod(1 + rng.normal(0, 0.01, (1_260, 500)), axis=0)
+    benchmark = 100 * np.cumprod(1 + rng.normal(0, 0.01, 1_260))
+
+    r_series = q.calculate_returns(series)
+    r_matrix = q.calculate_returns(matrix)
+    r_bench = q.calculate_returns(benchmark)
+    r_bench_long = q.calculate_returns(series)
+    flows_series = np.zeros(len(series))
+    flows_series[::21] = 1_000.0
+    flows_matrix = np.zeros(matrix.shape)
+    flows_matrix[::21] = 1_000.0
+    flow_sets = [make_cash_flows(rng, 120) for _ in range(50)]
+
+    cases = {}
+    for label, prices, returns, bench, flows in (
+        ("2520", series, r_series, r_bench_long, flows_series),
+        ("1260x500", matrix, r_matrix, r_bench, flows_matrix),
+    ):
+        cases.update({
+            f"returns {label}": lambda p=prices: q.calculate_returns(p),
+            f"volatility {label}": lambda r=returns: q.calculate_volatility(r),
+            f"sharpe {label}": lambda r=returns: q.calculate_sharpe_ratio(r),
+            f"sortino {label}": lambda r=returns: q.calculate_sortino_ratio(r),
+            f"max_drawdown {label}": lambda p=prices: q.calculate_max_drawdown(p),
+            f"beta {label}": lambda r=returns, b=bench: q.calculate_beta(r, b),
+            f"var {label}": lambda r=returns: q.calculate_var(r, 1_000_000.0),
+            f"twr {label}": lambda p=prices, f=flows: q.calculate_twr(p, f),
+            f"period_returns {label}": lambda p=prices, f=flows: q.calculate_period_returns(p, f),
+            f"rolling_volatility {label}": lambda r=returns: q.calculate_rolling_volatility(r, WINDOWS),
+            f"rolling_sharpe {label}": lambda r=returns: q.calculate_rolling_sharpe(r, WINDOWS),
+            f"rolling_beta {label}": lambda r=returns, b=bench: q.calculate_rolling_beta(r, b, WINDOWS),
+            f"rolling_correlation {label}": lambda r=returns, b=bench: q.calculate_rolling_correlation(r, b, WINDOWS),
+            f"rolling_drawdown {label}": lambda p=prices: q.calculate_rolling_drawdown(p, WINDOWS),
+        })
+    cases["xirr 120 flows"] = lambda: q.calculate_xirr(flow_sets[0])
+    cases["xirr_batch 50x120 flows"] = lambda: q.calculate_xirr_batch(flow_sets)
+    return cases
+
+
+def cache_cases(rng) -> Dict[str, Callable[[], object]]:
+    """Encode and decode of every value shape the cache stores"""
+    quote = {
+        "ticker": "AAPL", "price": 189.84, "change": 1.23, "changePercent": 0.65,
+        "volume": 51_234_567, "marketCap": 2.95e12, "currency": "USD",
+        "timestamp": "2024-01-02T16:00:00", "stale": False,
+    }
+    frame = make_frame(rng, "AAPL", 2_520)
+    tickers = [f"T{i:03d}" for i in range(100)]
+    cov = rng.normal(0, 0.01, (100, 100))
+    estimate = CovarianceEstimate(tickers, rng.normal(0, 0.001, 100), cov @ cov.T, 252, 0.2, 19_700)
+    series = {
+        "days": list(range(19_000, 19_000 + 1_260)),
+        "values": (1e5 * np.cumprod(1 + rng.normal(0, 0.01, 1_260))).tolist(),
+        "tickers": tickers[:20],
+        "missing": [],
+    }
+
+    cases = {}
+    fresh_until = time.time() + 60
+    for label, value in (
+        ("quote", quote),
+        ("history 2520 bars", frame),
+        ("covariance 100x100", estimate),
+        ("portfolio series 1260", series),
+    ):
+        entry = CacheEntry(value, fresh_until)
+        raw = CacheService._encode(entry)
+        cases[f"encode {label}"] = lambda e=entry: CacheService._encode(e)
+        cases[f"decode {label}"] = lambda r=raw: CacheService._decode(r)
+    return cases
+
+
+def run(cases: Dict[str, Callable[[], object]], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for name, func in cases.items():
+        func()  # warm up
+        result = summarize(time_calls(func, repeat, min_seconds=0.2))
+        result["peak_kb"] = peak_allocated(func) / 1024
+        results[name] = result
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=20, help="Minimum calls per case")
+    parser.add_argument("--filter", default="", help="Only cases whose name contains this")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/micro-<commit>.json)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    cases = {**quant_cases(rng), **cache_cases(rng)}
+    cases = {name: func for name, func in cases.items() if args.filter in name}
+
+    results = run(cases, args.repeat)
+    print_table(results, ["p50_ms", "p95_ms", "p99_ms", "peak_kb"])
+    path = write_results("micro", results, args.output, config={"repeat": args.repeat, "filter": args.filter})
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
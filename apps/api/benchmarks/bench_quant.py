@@ -0,0 +1,177 @@
+"""
+Micro-benchmark: vectorized QuantService vs the previous pure-Python kernels
+
+Run from apps/api:
+    python -m benchmarks.bench_quant
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.quant_service import QuantService
+
+
+# Previous list-based implementations, kept here as the baseline
+def legacy_returns(prices):
+    returns = []
+    for i in range(1, len(prices)):
+        if prices[i-1] != 0:
+            returns.append((prices[i] - prices[i-1]) / prices[i-1])
+    return returns
+
+
+def legacy_twr(values, cash_flows):
+    twr = 1.0
+    bm = values[0]
+    for i in range(1, len(values)):
+        em = values[i]
+        cf = cash_flows.get(i, 0)
+        denominator = bm + cf/2
+        r = (em - bm - cf) / denominator if denominator != 0 else 0
+        twr *= (1 + r)
+        bm = em
+    return twr - 1
+
+
+def legacy_xirr(cash_flows, guess=0.1):
+    rate = guess
+    for _ in range(100):
+        npv = 0
+        dnpv = 0
+        first_date = cash_flows[0][0]
+        for date, amount in cash_flows:
+            days = (date - first_date).days
+            years = days / 365.0
+            npv += amount / ((1 + rate) ** years)
+            dnpv -= years * amount / ((1 + rate) ** (years + 1))
+        if abs(npv) < 1e-6:
+            return rate
+        if dnpv == 0:
+            return None
+        rate = rate - npv / dnpv
+    return None
+
+
+def legacy_rolling(prices, benchmark, windows):
+    """Rolling volatility/Sharpe/beta/drawdown by re-slicing every window"""
+    returns = np.diff(prices, axis=0) / prices[:-1]
+    bench = np.diff(benchmark) / benchmark[:-1]
+    for window in windows:
+        for end in range(window, len(returns) + 1):
+            r = returns[end - window:end]
+            b = bench[end - window:end]
+            std = r.std(axis=0)
+            (r.mean(axis=0) - 0.03 / 252) * 252 / (std * np.sqrt(252))
+            ((r - r.mean(axis=0)) * (b - b.mean())[:, None]).mean(axis=0) / b.var()
+            1 - prices[end] / prices[end - window + 1:end + 1].max(axis=0)
+
+
+def vectorized_rolling(prices, benchmark, windows):
+    returns = QuantService.calculate_returns(prices)
+    bench = QuantService.calculate_returns(benchmark)
+    QuantService.calculate_rolling_volatility(returns, windows)
+    QuantService.calculate_rolling_sharpe(returns, windows)
+    QuantService.calculate_rolling_beta(returns, bench, windows)
+    QuantService.calculate_rolling_drawdown(prices, windows)
+
+
+def make_cash_flows(rng, count: int):
+    """Monthly-ish buys and sells over ten years, closed at 1.5x net invested"""
+    start = datetime(2015, 1, 1)
+    days = np.sort(rng.integers(0, 3650, count))
+    amounts = -rng.uniform(100, 1000, count)
+    amounts[rng.random(count) < 0.2] *= -0.8
+    flows = [(start + timedelta(days=int(d)), float(a)) for d, a in zip(days, amounts)]
+    flows.append((start + timedelta(days=3650), float(-amounts.sum() * 1.5)))
+    return flows
+
+
+def legacy_metrics(prices):
+    """Every metric the old API computed for one series, from a list"""
+    returns = legacy_returns(prices)
+    QuantService.calculate_volatility(np.array(returns))
+    QuantService.calculate_sharpe_ratio(np.array(returns))
+    QuantService.calculate_sortino_ratio(np.array(returns))
+    QuantService.calculate_max_drawdown(np.array(prices))
+    QuantService.calculate_var(np.array(returns), 1.0)
+    legacy_twr(prices, {})
+
+
+def vectorized_metrics(prices):
+    returns = QuantService.calculate_returns(prices)
+    QuantService.calculate_volatility(returns)
+    QuantService.calculate_sharpe_ratio(returns)
+    QuantService.calculate_sortino_ratio(returns)
+    QuantService.calculate_max_drawdown(prices)
+    QuantService.calculate_var(returns, 1.0)
+    QuantService.calculate_twr(prices, {})
+
+
+def timeit(func, *args, repeat: int = 5) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    rng = np.random.default_rng(42)
+
+    series = 100 * np.cumprod(1 + rng.normal(0, 0.01, 10_000))
+    series_list = series.tolist()
+
+    matrix = 100 * np.cumprod(1 + rng.normal(0, 0.01, (1_260, 500)), axis=0)
+    columns = [matrix[:, i].tolist() for i in range(matrix.shape[1])]
+
+    flow_sets = [make_cash_flows(rng, 120) for _ in range(50)]
+
+    benchmark = 100 * np.cumprod(1 + rng.normal(0, 0.01, 1_260))
+    windows = (30, 90, 252)
+
+    cases = [
+        (
+            "returns, 10k points",
+            lambda: legacy_returns(series_list),
+            lambda: QuantService.calculate_returns(series),
+        ),
+        (
+            "twr, 10k points",
+            lambda: legacy_twr(series_list, {}),
+            lambda: QuantService.calculate_twr(series, {}),
+        ),
+        (
+            "all metrics, 10k points",
+            lambda: legacy_metrics(series_list),
+            lambda: vectorized_metrics(series),
+        ),
+        (
+            "all metrics, 1260 x 500 matrix",
+            lambda: [legacy_metrics(column) for column in columns],
+            lambda: vectorized_metrics(matrix),
+        ),
+        (
+            "xirr, 50 positions x 120 flows",
+            lambda: [legacy_xirr(flows) for flows in flow_sets],
+            lambda: QuantService.calculate_xirr_batch(flow_sets),
+        ),
+        (
+            "rolling 30/90/252, 1260 x 500",
+            lambda: legacy_rolling(matrix, benchmark, windows),
+            lambda: vectorized_rolling(matrix, benchmark, windows),
+        ),
+    ]
+
+    print(f"{'case':<34}{'legacy ms':>12}{'vector ms':>12}{'speedup':>10}")
+    for name, legacy, vectorized in cases:
+        before = timeit(legacy, repeat=3)
+        after = timeit(vectorized)
+        print(f"{name:<34}{before:>12.2f}{after:>12.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Shared helpers for the benchmark suite: latency summaries, memory and
+JSON result files
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Latency percentiles of a list of samples in milliseconds"""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if not len(samples):
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(len(samples)),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(samples.max()),
+    }
+
+
+def time_calls(func: Callable[[], Any], repeat: int, min_seconds: float = 0.0) -> List[float]:
+    """
+    Run func repeatedly and return per-call times in milliseconds
+
+    Runs at least repeat times and, with min_seconds, keeps going until
+    that much time has passed (for very fast calls).
+    """
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeat or time.perf_counter() - started < min_seconds:
+        t0 = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def peak_allocated(func: Callable[[], Any]) -> int:
+    """Peak bytes allocated by one call of func (tracemalloc)"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        # Not Linux: fall back to the peak (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def environment() -> Dict[str, Any]:
+    """Commit and runtime the results were measured on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True, text=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(suite: str, results: Dict[str, Dict], output: Optional[str] = None, config: Optional[Dict] = None) -> str:
+    """
+    Store results as JSON (benchmarks/results/<suite>-<commit>.json by default)
+
+    Returns:
+        Path of the written file
+    """
+    env = environment()
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        tag = env["commit"] or datetime.now().strftime("%Y%m%d%H%M%S")
+        if env["dirty"]:
+            tag += "-dirty"
+        output = os.path.join(RESULTS_DIR, f"{suite}-{tag}.json")
+
+    with open(output, "w") as f:
+        json.dump({"suite": suite, "environment": env, "config": config or {}, "results": results}, f, indent=2)
+    return output
+
+
+def print_table(results: Dict[str, Dict], columns: List[str]) -> None:
+    """Print one row per benchmark with the given result columns"""
+    width = max([len(name) for name in results] + [10])
+    print(f"{'':{width}}  " + "  ".join(f"{column:>12}" for column in columns))
+    for name, result in results.items():
+        cells = []
+        for column in columns:
+            value = result.get(column)
+            cells.append(f"{value:>12.3f}" if isinstance(value, float) else f"{str(value):>12}")
+        print(f"{name:{width}}  " + "  ".join(cells))
@@ -0,0 +1,85 @@
+"""
+Compare two benchmark result files (from bench_micro or load_test)
+
+Prints the change of each metric per benchmark and exits 1 if any
+latency percentile got slower, or throughput lower, by more than the
+threshold.
+
+Run from apps/api:
+    python -m benchmarks.compare BASELINE.json CANDIDATE.json [--threshold 0.10]
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+# Metric -> True if higher is better
+METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "throughput_rps": True,
+    "peak_kb": False,
+    "errors": False,
+}
+# Only these fail the comparison; memory and errors are reported
+GATED = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def compare(baseline: Dict, candidate: Dict, threshold: float) -> Tuple[List[Tuple], List[str]]:
+    """
+    Returns:
+        (rows of (benchmark, metric, before, after, change), regressions)
+    """
+    rows, regressions = [], []
+    for name, before in baseline["results"].items():
+        after = candidate["results"].get(name)
+        if after is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in before or metric not in after:
+                continue
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else 0.0
+            rows.append((name, metric, old, new, change))
+            worse = -change if higher_is_better else change
+            if metric in GATED and worse > threshold:
+                regressions.append(f"{name} {metric}: {old:.3f} -> {new:.3f} ({change:+.1%})")
+    return rows, regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"baseline:  {baseline['environment'].get('commit')} ({baseline['environment'].get('timestamp')})")
+    print(f"candidate: {candidate['environment'].get('commit')} ({candidate['environment'].get('timestamp')})\n")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+    width = max([len(row[0]) for row in rows] + [10])
+    for name, metric, old, new, change in rows:
+        print(f"{name:{width}}  {metric:>14}  {old:>12.3f}  {new:>12.3f}  {change:>+8.1%}")
+
+    missing = sorted(set(baseline["results"]) ^ set(candidate["results"]))
+    if missing:
+        print(f"\nIn only one file: {', '.join(missing)}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions over {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
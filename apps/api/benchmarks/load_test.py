@@ -0,0 +1,241 @@
+"""
+Load test: drive the API in-process against Redis and a replay provider
+
+Synthetic bars for a ticker universe (plus the USD FX pairs) are written
+to a temporary replay directory and served through ReplayProvider with
+an injected latency, so the run needs no network. Requests go through
+the full ASGI stack (routing, validation, services, cache) via httpx,
+from a number of concurrent clients per scenario. Redis is fakeredis
+unless --redis-url points at a real server (use a scratch database:
+it is flushed first).
+
+Each scenario reports p50/p95/p99 latency, throughput, errors and RSS
+growth; results are written as JSON for benchmarks.compare.
+
+Run from apps/api (needs fakeredis, or --redis-url):
+    python -m benchmarks.load_test [--requests N] [--concurrency C] [--scenario NAME]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .common import print_table, rss_mb, summarize, write_results
+
+CURRENCIES = ("EUR", "GBP", "JPY", "CHF")
+FX_LEVELS = {"EUR": 0.92, "GBP": 0.79, "JPY": 150.0, "CHF": 0.88}
+
+# (method, path, body factory); body factories take a seeded Random
+Request = Tuple[str, str, Callable[[random.Random], Dict]]
+
+
+def build_replay_data(directory: str, tickers: List[str], days: int, seed: int) -> None:
+    """Write daily bars for tickers and the USD<currency>=X pairs"""
+    from app.services.history_frame import HistoryFrame
+    from app.services.providers import write_bars
+
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=pd.Timestamp.now(tz="America/New_York").normalize(), periods=days)
+    series = [(ticker, 100.0) for ticker in tickers]
+    series += [(f"USD{currency}=X", FX_LEVELS[currency]) for currency in CURRENCIES]
+    for ticker, level in series:
+        close = level * np.cumprod(1 + rng.normal(0.0003, 0.012, days))
+        frame = pd.DataFrame(
+            {
+                "Open": close * 0.998,
+                "High": close * 1.01,
+                "Low": close * 0.99,
+                "Close": close,
+                "Volume": rng.integers(100_000, 10_000_000, days).astype(np.float64),
+            },
+            index=index,
+        )
+        write_bars(directory, HistoryFrame.from_dataframe(ticker, frame))
+
+
+def scenarios(tickers: List[str], basket: int) -> Dict[str, Request]:
+    """Request mix per endpoint; each request draws a random basket"""
+    def pick(rng: random.Random, k: int = basket) -> List[str]:
+        return rng.sample(tickers, k)
+
+    def portfolio(rng: random.Random) -> Dict:
+        return {
+            "baseCurrency": "EUR",
+            "benchmark": "SPY",
+            "positions": [
+                {
+                    "ticker": ticker,
+                    "quantity": 10,
+                    "currentValue": rng.uniform(1_000, 10_000),
+                    "costBasis": rng.uniform(1_000, 10_000),
+                    "dailyChange": rng.uniform(-2, 2),
+                    "currency": rng.choice(("USD",) + CURRENCIES),
+                }
+                for ticker in pick(rng)
+            ],
+        }
+
+    def positions(rng: random.Random) -> Dict:
+        return {
+            "benchmark": "SPY",
+            "positions": [
+                {"ticker": t, "quantity": 10, "avgCost": 90.0, "currentPrice": 100.0}
+                for t in pick(rng)
+            ],
+        }
+
+    def risk(rng: random.Random) -> Dict:
+        return {
+            "positions": [{"ticker": t, "currentValue": rng.uniform(1_000, 10_000)} for t in pick(rng)],
+            "simulations": 10_000,
+        }
+
+    def convert(rng: random.Random) -> Dict:
+        return {
+            "amounts": [rng.uniform(1, 1_000) for _ in range(1_000)],
+            "currencies": [rng.choice(("USD",) + CURRENCIES) for _ in range(1_000)],
+            "to": "EUR",
+        }
+
+    return {
+        "quotes": ("POST", "/api/quotes/", lambda rng: {"tickers": pick(rng)}),
+        "history": ("POST", "/api/history/", lambda rng: {"ticker": rng.choice(tickers), "range": "1y"}),
+        "history_batch": ("POST", "/api/history/batch", lambda rng: {"tickers": pick(rng), "range": "1y"}),
+        "portfolio": ("POST", "/api/calculations/portfolio", portfolio),
+        "positions": ("POST", "/api/calculations/positions", positions),
+        "rolling": ("POST", "/api/calculations/rolling", lambda rng: {"tickers": pick(rng), "range": "1y"}),
+        "risk": ("POST", "/api/calculations/risk", risk),
+        "convert_batch": ("POST", "/api/calculations/convert/batch", convert),
+    }
+
+
+async def drive(client, request: Request, count: int, concurrency: int, seed: int) -> Dict:
+    """Send count requests from concurrency clients; collect latencies"""
+    method, path, body = request
+    rng = random.Random(seed)
+    bodies = [body(rng) for _ in range(count)]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    remaining = iter(bodies)
+
+    async def worker() -> None:
+        for payload in remaining:
+            t0 = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=payload)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies)
+    result.update({
+        "throughput_rps": count / elapsed if elapsed else 0.0,
+        "errors": sum(errors.values()),
+        "error_codes": errors,
+        "rss_mb": rss_mb(),
+        "rss_growth_mb": rss_mb() - rss_before,
+    })
+    return result
+
+
+async def run(args) -> Dict[str, Dict]:
+    import httpx
+
+    from app.config import RedisSettings
+    from app.main import app
+    from app.services.container import ServiceContainer
+    from app.services.providers import ReplayProvider
+
+    if args.redis_url:
+        import redis.asyncio as redis
+
+        redis_client = redis.Redis.from_url(args.redis_url, decode_responses=False)
+        await redis_client.flushdb()
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            sys.exit("fakeredis is not installed: pip install fakeredis, or pass --redis-url")
+        redis_client = fakeredis.FakeAsyncRedis(max_connections=args.concurrency * 100)
+
+    workdir = tempfile.mkdtemp(prefix="load-test-")
+    os.environ.setdefault("SNAPSHOT_DB_PATH", os.path.join(workdir, "snapshots.db"))
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    build_replay_data(workdir, tickers + ["SPY"], args.days, args.seed)
+
+    provider = ReplayProvider(workdir, latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 2, seed=args.seed)
+    services = ServiceContainer(RedisSettings.from_env(), redis_client=redis_client, provider=provider)
+    app.state.services = services
+    await services.start()
+
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=120) as client:
+            selected = {
+                name: request for name, request in scenarios(tickers, args.basket).items()
+                if not args.scenario or name in args.scenario
+            }
+            for i, (name, request) in enumerate(selected.items()):
+                seed = args.seed + i
+                if args.warmup:
+                    # Same seed: the measured run replays warm baskets, as repeat dashboard loads do
+                    await drive(client, request, args.warmup, args.concurrency, seed)
+                results[name] = await drive(client, request, args.requests, args.concurrency, seed)
+                print(f"{name}: p50 {results[name]['p50_ms']:.1f} ms, {results[name]['throughput_rps']:.0f} req/s")
+    finally:
+        await services.close()
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["process"] = {"peak_rss_mb": peak / 2**20 if sys.platform == "darwin" else peak / 2**10}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="Unmeasured requests first (0 = measure cold caches)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--tickers", type=int, default=100, help="Ticker universe size")
+    parser.add_argument("--basket", type=int, default=10, help="Tickers per request")
+    parser.add_argument("--days", type=int, default=1_300, help="Daily bars per ticker")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Replay provider latency per call")
+    parser.add_argument("--scenario", action="append", help="Only these scenarios (repeatable)")
+    parser.add_argument("--redis-url", help="Real Redis to use instead of fakeredis (flushed first)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/load-<commit>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print()
+    print_table(
+        {name: result for name, result in results.items() if name != "process"},
+        ["p50_ms", "p95_ms", "p99_ms", "throughput_rps", "errors", "rss_growth_mb"],
+    )
+    print(f"\nPeak RSS: {results['process']['peak_rss_mb']:.0f} MB")
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "redis_url")}
+    config["redis"] = "redis" if args.redis_url else "fakeredis"
+    path = write_results("load", results, args.output, config=config)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
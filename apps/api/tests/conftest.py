@@ -0,0 +1,25 @@
+"""
+Shared fixtures: fakeredis instead of Redis, a private provider executor
+"""
+
+import fakeredis
+import pytest
+
+from app.services.executor import ProviderExecutor
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeAsyncRedis()
+
+
+@pytest.fixture
+def executor():
+    executor = ProviderExecutor(max_workers=2)
+    yield executor
+    executor.shutdown()
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+from app.services import alert_engine
+from app.services.alert_engine import AlertEngine, AlertIndex
+
+
+def alert(alert_id, ticker="AAA", kind="RISES_ABOVE", price=None, change=None, **extra):
+    return {"id": alert_id, "ticker": ticker, "type": kind, "targetPrice": price, "targetChangePercent": change, **extra}
+
+
+def test_each_alert_type_triggers_once():
+    index = AlertIndex()
+    loaded = index.load([
+        alert("up", price=110),
+        alert("down", kind="DROPS_BELOW", price=90),
+        alert("target", kind="PRICE_TARGET", price=105),
+        alert("fall", kind="PERCENT_CHANGE", change=-3),
+        alert("rise", kind="PERCENT_CHANGE", change=2),
+        alert("inactive", price=1, active=False),
+        alert("done", price=1, triggered=True),
+        alert("no-target"),
+    ])
+    assert loaded == 5 and len(index) == 5
+
+    assert index.evaluate("AAA", 100, 0) == []
+    assert index.evaluate("AAA", 106, 1) == ["target"]
+    assert sorted(index.evaluate("AAA", 111, 2.5)) == ["rise", "up"]
+    assert sorted(index.evaluate("AAA", 80, -4)) == ["down", "fall"]
+    assert len(index) == 0 and index.tickers() == []
+    assert index.evaluate("AAA", 200, 10) == []
+
+
+def test_price_target_watches_the_side_away_from_the_last_price():
+    index = AlertIndex()
+    index.add(alert("warm-up", price=1000))
+    index.evaluate("AAA", 100, 0)
+
+    index.add(alert("below", kind="PRICE_TARGET", price=95))
+    index.add(alert("above", kind="PRICE_TARGET", price=105))
+    assert index.evaluate("AAA", 104, 0) == []
+    assert index.evaluate("AAA", 105, 0) == ["above"]
+    assert index.evaluate("AAA", 95, 0) == ["below"]
+
+
+def test_add_replaces_and_remove_drops():
+    index = AlertIndex()
+    index.add(alert("a", price=110))
+    index.add(alert("a", ticker="BBB", price=50))
+    assert index.tickers() == ["BBB"] and "a" in index
+
+    assert not index.add(alert("a", ticker="BBB", price=50, active=False))
+    assert "a" not in index and index.tickers() == []
+    assert not index.remove("a")
+
+
+def test_matches_a_linear_scan():
+    rng = random.Random(4)
+    tickers = ["AAA", "BBB", "CCC"]
+    alerts = []
+    for i in range(600):
+        kind = rng.choice(alert_engine.ALERT_TYPES)
+        if kind == "PERCENT_CHANGE":
+            alerts.append(alert(str(i), rng.choice(tickers), kind, change=rng.uniform(-5, 5)))
+        else:
+            alerts.append(alert(str(i), rng.choice(tickers), kind, price=rng.uniform(80, 120)))
+
+    index = AlertIndex()
+    index.load(alerts)
+    active = {a["id"]: a for a in alerts}
+    sides = {}  # PRICE_TARGET direction, fixed by the first price seen
+
+    for _ in range(300):
+        ticker = rng.choice(tickers)
+        price, change = rng.uniform(80, 120), rng.uniform(-5, 5)
+        expected = []
+        for a in active.values():
+            if a["ticker"] != ticker:
+                continue
+            kind = a["type"]
+            if kind == "PRICE_TARGET":
+                up = sides.setdefault(a["id"], a["targetPrice"] >= price)
+                hit = price >= a["targetPrice"] if up else price <= a["targetPrice"]
+            elif kind == "RISES_ABOVE":
+                hit = price >= a["targetPrice"]
+            elif kind == "DROPS_BELOW":
+                hit = price <= a["targetPrice"]
+            elif a["targetChangePercent"] >= 0:
+                hit = change >= a["targetChangePercent"]
+            else:
+                hit = change <= a["targetChangePercent"]
+            if hit:
+                expected.append(a["id"])
+
+        assert sorted(index.evaluate(ticker, price, change)) == sorted(expected)
+        for alert_id in expected:
+            del active[alert_id]
+    assert len(index) == len(active)
+
+
+@pytest.mark.anyio
+async def test_triggers_are_written_back_once(redis_client):
+    engine = AlertEngine(redis_client, feed=None)
+    assert await engine.upsert([alert("a", price=110), alert("b", kind="DROPS_BELOW", price=90)]) == 2
+
+    assert engine.evaluate({"ticker": "AAA", "price": 111, "changePercent": 1.0}) == ["a"]
+    assert await engine.flush() == 1
+    assert await engine.flush() == 0
+
+    assert [record["id"] for record in await engine.triggered()] == ["a"]
+    assert list(await redis_client.hkeys(AlertEngine.ACTIVE)) == [b"b"]
+    assert await engine.acknowledge(["a"]) == 1
+    assert await engine.triggered() == []
+
+
+class FakeSubscription:
+    def __init__(self, tickers):
+        self.tickers = set(tickers)
+
+    async def add(self, tickers):
+        self.tickers |= set(tickers)
+
+    def remove(self, tickers):
+        self.tickers -= set(tickers)
+
+
+class BrokenPubSub:
+    """Pub/sub whose connection drops on the first read"""
+
+    def listen(self):
+        async def messages():
+            raise ConnectionError("connection lost")
+            yield
+
+        return messages()
+
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.anyio
+async def test_listener_reconnects_and_resyncs(monkeypatch, redis_client):
+    monkeypatch.setattr(alert_engine, "_RECONNECT_DELAY", 0.01)
+    engine = AlertEngine(redis_client, feed=None)
+    engine.index.load([alert("gone", ticker="OLD", price=1)])
+    engine._subscription = FakeSubscription(["OLD"])
+
+    # Changed by another worker while this one was disconnected
+    await redis_client.hset(AlertEngine.ACTIVE, "new", json.dumps(alert("new", ticker="NEW", price=5)))
+
+    listener = asyncio.create_task(engine._listen(BrokenPubSub()))
+    try:
+        for _ in range(100):
+            if "new" in engine.index:
+                break
+            await asyncio.sleep(0.01)
+        assert "new" in engine.index and "gone" not in engine.index
+        assert engine._subscription.tickers == {"NEW"}
+
+        # The new subscription receives changes again
+        await redis_client.publish(AlertEngine.CHANGES_CHANNEL, json.dumps({
+            "origin": "other-worker", "upsert": [alert("later", ticker="LATER", price=5)], "remove": [],
+        }))
+        for _ in range(100):
+            if "later" in engine.index:
+                break
+            await asyncio.sleep(0.01)
+        assert "later" in engine.index
+        assert engine._subscription.tickers == {"NEW", "LATER"}
+    finally:
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import history_frame
+from app.services.history_frame import HistoryFrame
+
+
+def make_frame(start: str, days: int, ticker: str = "AAA", tz: str = "America/New_York", level: float = 100.0):
+    index = pd.date_range(start, periods=days, freq="B", tz=tz)
+    close = level + np.arange(days, dtype=np.float64)
+    frame = pd.DataFrame(
+        {"Open": close - 0.5, "High": close + 1, "Low": close - 1, "Close": close, "Volume": np.arange(days) * 100},
+        index=index,
+    )
+    return HistoryFrame.from_dataframe(ticker, frame)
+
+
+def assert_same(a: HistoryFrame, b: HistoryFrame) -> None:
+    assert a.ticker == b.ticker and a.tz == b.tz
+    for column in ("timestamps", "open", "high", "low", "close", "volume"):
+        np.testing.assert_array_equal(getattr(a, column), getattr(b, column))
+
+
+def test_encode_decode_round_trip():
+    frame = make_frame("2024-01-01", 300)
+    decoded, fresh_until = history_frame.decode(history_frame.encode(frame, fresh_until=1234.5))
+    assert fresh_until == 1234.5
+    assert_same(decoded, frame)
+    assert decoded.rows(0, 1) == frame.rows(0, 1)
+
+
+def test_encode_decode_empty_frame():
+    frame = HistoryFrame.empty("AAA", tz="Europe/London")
+    decoded, _ = history_frame.decode(history_frame.encode(frame))
+    assert len(decoded) == 0
+    assert decoded.tz == "Europe/London"
+
+
+def test_decode_reads_columns_without_copying():
+    raw = history_frame.encode(make_frame("2024-01-01", 10))
+    decoded, _ = history_frame.decode(raw)
+    assert not decoded.close.flags.owndata
+
+
+def test_decode_rejects_other_versions():
+    raw = bytearray(history_frame.encode(make_frame("2024-01-01", 3)))
+    raw[4] = history_frame.VERSION + 1
+    assert history_frame.decode(bytes(raw)) is None
+    assert history_frame.is_encoded(bytes(raw))
+    assert not history_frame.is_encoded(b'{"ticker": "AAA"}')
+
+
+def test_merge_appends_and_replaces_the_overlap():
+    older = make_frame("2024-01-01", 20)
+    # Starts at the last bar of older, with an updated close
+    newer = make_frame("2024-01-26", 5, level=500.0)
+    merged = older.merge(newer)
+
+    assert len(merged) == 24
+    np.testing.assert_array_equal(merged.timestamps, np.union1d(older.timestamps, newer.timestamps))
+    np.testing.assert_array_equal(merged.close[:19], older.close[:19])
+    np.testing.assert_array_equal(merged.close[19:], newer.close)
+    assert np.all(np.diff(merged.timestamps) > 0)
+
+
+def test_merge_with_empty_frames():
+    frame = make_frame("2024-01-01", 5)
+    assert frame.merge(HistoryFrame.empty("AAA")) is frame
+    assert HistoryFrame.empty("AAA").merge(frame) is frame
+
+
+def test_merge_of_a_decoded_frame():
+    cached, _ = history_frame.decode(history_frame.encode(make_frame("2024-01-01", 20)))
+    merged = cached.merge(make_frame("2024-01-29", 3, level=200.0))
+    assert len(merged) == 23
+    assert merged.close[-1] == 202.0
+
+
+def test_slice_range_sessions_and_spans():
+    frame = make_frame("2023-01-02", 300)
+    last_five = frame.slice_range("5d")
+    assert len(last_five) == 5
+    np.testing.assert_array_equal(last_five.timestamps, frame.timestamps[-5:])
+
+    month = frame.slice_range("1mo")
+    assert 0 < len(month) <= 23
+    assert frame.timestamps[-1] - month.timestamps[0] < 31 * 86400
+
+
+def test_session_days_are_local_calendar_days():
+    frame = make_frame("2024-03-08", 3)  # Across the US DST change
+    days = frame.session_days().astype("datetime64[D]").astype(str).tolist()
+    assert days == ["2024-03-08", "2024-03-11", "2024-03-12"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+def test_iter_rows_matches_rows(chunk_size):
+    frame = make_frame("2024-01-01", 20)
+    assert [row for chunk in frame.iter_rows(chunk_size) for row in chunk] == frame.rows()
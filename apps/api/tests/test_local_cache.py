@@ -0,0 +1,40 @@
+import time
+
+from app.services.local_cache import LocalCache
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = LocalCache(max_entries=2)
+    cache.set("quote:A", 1)
+    cache.set("quote:B", 2)
+    assert cache.get("quote:A") == (True, 1)
+
+    cache.set("quote:C", 3)
+    assert cache.get("quote:B") == (False, None)
+    assert cache.get("quote:A") == (True, 1)
+    assert cache.evictions == 1
+
+
+def test_ttl_follows_namespace_and_is_capped_by_redis(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = LocalCache(namespace_ttls={"quote": 5}, default_ttl=30)
+
+    cache.set("quote:A", 1)
+    cache.set("other:A", 2)
+    cache.set("other:B", 3, redis_ttl=2)
+    now[0] += 3
+    assert cache.get("quote:A") == (True, 1)
+    assert cache.get("other:B") == (False, None)
+
+    now[0] += 3
+    assert cache.get("quote:A") == (False, None)
+    assert cache.get("other:A") == (True, 2)
+
+
+def test_non_positive_ttl_drops_the_entry():
+    cache = LocalCache()
+    cache.set("quote:A", 1)
+    cache.set("quote:A", 2, redis_ttl=0)
+    assert cache.get("quote:A") == (False, None)
+    assert len(cache) == 0
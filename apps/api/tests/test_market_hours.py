@@ -0,0 +1,83 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.services.market_hours import TtlPolicy, exchange_for
+
+SOFT, HARD = 60, 3600
+
+
+def at(local: str, tz: str = "America/New_York") -> float:
+    return datetime.fromisoformat(local).replace(tzinfo=ZoneInfo(tz)).timestamp()
+
+
+@pytest.fixture
+def policy():
+    return TtlPolicy(enabled=True, warmup_seconds=300, settle_seconds=900)
+
+
+def test_exchange_for_suffixes():
+    assert exchange_for("AAPL").currency == "USD"
+    assert exchange_for("SHOP.TO").currency == "CAD"
+    assert exchange_for("7203.T").currency == "JPY"
+    assert exchange_for("ASML.AS").currency == "EUR"
+    assert exchange_for("EURUSD=X").kind == "fx"
+    assert exchange_for("BTC-USD").kind == "crypto"
+
+
+@pytest.mark.parametrize("now", [
+    "2024-01-17T12:00:00",  # Session
+    "2024-01-17T09:26:00",  # Warmup before the open
+    "2024-01-17T16:10:00",  # Settlement after the close
+])
+def test_base_ttls_while_the_market_is_active(policy, now):
+    assert policy.is_active("AAPL", at(now))
+    assert policy.ttl("AAPL", SOFT, HARD, at(now)) == (SOFT, HARD)
+
+
+def test_base_ttls_when_the_warmup_is_within_the_soft_ttl(policy):
+    # One minute to the warmup: extending would not gain anything
+    now = at("2024-01-17T09:24:00")
+    assert not policy.is_active("AAPL", now)
+    assert policy.ttl("AAPL", 120, HARD, now) == (120, HARD)
+
+
+@pytest.mark.parametrize("now, reopens", [
+    ("2024-01-17T16:20:00", "2024-01-18T09:30:00"),  # Overnight
+    ("2024-01-20T12:00:00", "2024-01-22T09:30:00"),  # Weekend
+    ("2024-01-12T17:00:00", "2024-01-16T09:30:00"),  # Martin Luther King Jr. Day weekend
+])
+def test_fresh_until_the_warmup_before_the_next_open(policy, now, reopens):
+    assert not policy.is_active("AAPL", at(now))
+    quiet = int(at(reopens) - 300 - at(now))
+    assert policy.ttl("AAPL", SOFT, HARD, at(now)) == (quiet, quiet + HARD)
+
+
+def test_each_exchange_uses_its_own_calendar(policy):
+    # 10:00 in London is 05:00 in New York
+    now = at("2024-01-17T10:00:00", "Europe/London")
+    assert policy.ttl("VOD.L", SOFT, HARD, now) == (SOFT, HARD)
+    assert policy.ttl("AAPL", SOFT, HARD, now)[0] > SOFT
+
+
+def test_fx_closes_for_the_weekend_only(policy):
+    assert policy.ttl("EURUSD=X", SOFT, HARD, at("2024-01-17T03:00:00")) == (SOFT, HARD)
+    now = at("2024-01-20T12:00:00")
+    quiet = int(at("2024-01-21T17:00:00") - 300 - now)
+    assert policy.ttl("EURUSD=X", SOFT, HARD, now) == (quiet, quiet + HARD)
+
+
+def test_crypto_and_disabled_policy_keep_base_ttls(policy):
+    weekend = at("2024-01-20T12:00:00")
+    assert policy.ttl("BTC-USD", SOFT, HARD, weekend) == (SOFT, HARD)
+    assert TtlPolicy(enabled=False).ttl("AAPL", SOFT, HARD, weekend) == (SOFT, HARD)
+    assert TtlPolicy(enabled=False).is_active("AAPL", weekend)
+
+
+@pytest.mark.parametrize("ticker", ["0700.HK", "BHP.AX", "NESN.SW", "ENI.MI"])
+def test_unknown_exchanges_are_always_active(policy, ticker):
+    assert exchange_for(ticker).kind == "unknown"
+    for now in ("2024-01-17T03:00:00", "2024-01-20T12:00:00"):
+        assert policy.is_active(ticker, at(now))
+        assert policy.ttl(ticker, SOFT, HARD, at(now)) == (SOFT, HARD)
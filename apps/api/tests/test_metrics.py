@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from app.services import metrics
+
+
+def test_concurrent_stages_count_once():
+    timings = metrics.RequestTimings()
+    timings.enter("cache", 0.0)
+    timings.enter("cache", 1.0)
+    timings.exit("cache", 2.0)
+    timings.exit("cache", 3.0)
+    timings.endpoint = (0.0, 5.0)
+    timings.response_started = 5.5
+    timings.totals["io"] = 3.0
+
+    assert timings.stages() == {"cache": 3.0, "compute": 2.0, "serialize": 0.5}
+
+
+@pytest.mark.anyio
+async def test_detached_tasks_do_not_write_into_the_request():
+    timings, token = metrics.begin_request()
+    try:
+        async def refresh():
+            with metrics.stage("fetch"):
+                await asyncio.sleep(0)
+            return metrics.current_timings()
+
+        assert await metrics.detached_task(refresh()) is None
+        await asyncio.create_task(refresh())
+    finally:
+        metrics.end_request(token)
+
+    # Only the attached task was timed
+    assert set(timings.totals) == {"fetch", "io"}
+    assert metrics.current_timings() is None
+
+
+def test_cache_namespace():
+    assert metrics.cache_namespace("quote:AAPL") == "quote"
+    assert metrics.cache_namespace("bars:AAPL:1d") == "history"
+    assert metrics.cache_namespace("bars:AAPL:1d:span") is None
+    assert metrics.cache_namespace("lock:quote:AAPL") == "other"
@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.cache_service import CacheEntry
+from app.services.history_frame import HistoryFrame
+from app.services.portfolio_service import (
+    PortfolioSeries,
+    PortfolioService,
+    align_closes,
+    composition_hash,
+    forward_fill,
+)
+from app.services.single_flight import SingleFlight
+
+nan = np.nan
+
+
+def make_frame(ticker: str, dates, closes, tz: str = "America/New_York") -> HistoryFrame:
+    index = pd.DatetimeIndex(dates).tz_localize(tz)
+    closes = np.asarray(closes, dtype=np.float64)
+    frame = pd.DataFrame(
+        {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": np.zeros(len(closes))},
+        index=index,
+    )
+    return HistoryFrame.from_dataframe(ticker, frame)
+
+
+def days(*dates):
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+def test_forward_fill():
+    values = np.array([
+        [nan, 1.0],
+        [2.0, nan],
+        [nan, nan],
+        [3.0, 4.0],
+        [nan, nan],
+    ])
+    expected = np.array([
+        [nan, 1.0],
+        [2.0, 1.0],
+        [2.0, 1.0],
+        [3.0, 4.0],
+        [3.0, 4.0],
+    ])
+    np.testing.assert_array_equal(forward_fill(values), expected)
+
+
+def test_forward_fill_leaves_all_nan_columns():
+    values = np.array([[nan, 1.0], [nan, 2.0]])
+    np.testing.assert_array_equal(forward_fill(values), values)
+
+
+def test_align_closes_on_the_union_of_session_days():
+    frames = {
+        # US holiday on 2024-01-15 (Martin Luther King Jr. Day)
+        "AAA": make_frame("AAA", ["2024-01-12", "2024-01-16", "2024-01-17"], [10, 11, 12]),
+        "BBB.L": make_frame("BBB.L", ["2024-01-11", "2024-01-12", "2024-01-15", "2024-01-16"], [5, 6, 7, 8], "Europe/London"),
+    }
+    result_days, closes = align_closes(frames, ["AAA", "BBB.L"], trim=False)
+
+    np.testing.assert_array_equal(result_days, days("2024-01-11", "2024-01-12", "2024-01-15", "2024-01-16", "2024-01-17"))
+    np.testing.assert_array_equal(closes, [
+        [nan, 5],
+        [10, 6],
+        [10, 7],   # AAA carried over its holiday
+        [11, 8],
+        [12, 8],   # BBB.L carried forward after its last bar
+    ])
+
+
+def test_align_closes_trims_rows_before_every_ticker_is_priced():
+    frames = {
+        "AAA": make_frame("AAA", ["2024-01-02", "2024-01-03", "2024-01-04"], [1, 2, 3]),
+        "BBB": make_frame("BBB", ["2024-01-04"], [7]),
+    }
+    result_days, closes = align_closes(frames, ["AAA", "BBB"])
+    np.testing.assert_array_equal(result_days, days("2024-01-04"))
+    np.testing.assert_array_equal(closes, [[3, 7]])
+
+
+def test_composition_hash_ignores_order_and_depends_on_inputs():
+    a = composition_hash({"AAA": 1, "BBB": 2}, "1y")
+    assert a == composition_hash({"BBB": 2, "AAA": 1}, "1y")
+    assert a != composition_hash({"AAA": 1, "BBB": 3}, "1y")
+    assert a != composition_hash({"AAA": 1, "BBB": 2}, "5y")
+    assert a != composition_hash({"AAA": 1, "BBB": 2}, "1y", currency="EUR")
+
+
+class FakeCache:
+    """Portfolio series cache holding one entry"""
+
+    def __init__(self, entry=None):
+        self.entry = entry
+
+    async def get_portfolio_series(self, composition):
+        return self.entry
+
+
+class CountingService(PortfolioService):
+    def __init__(self, cache):
+        super().__init__(None, cache, SingleFlight(), fx_service=object())
+        self.builds = 0
+
+    async def _build_series(self, composition, holdings, range, currency=None):
+        self.builds += 1
+        await asyncio.sleep(0.01)
+        return PortfolioSeries.from_dict(SERIES)
+
+
+SERIES = {"days": [19723, 19724], "values": [100.0, 101.0], "tickers": ["AAA"], "missing": []}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("age, builds", [(-60, 0), (60, 1)])
+async def test_cached_series_is_served_and_stale_ones_rebuilt_in_the_background(age, builds):
+    service = CountingService(FakeCache(CacheEntry(SERIES, time.time() - age)))
+    series = await service.get_value_series({"AAA": 1})
+    assert series.values.tolist() == SERIES["values"]
+    assert service.builds == 0
+
+    await asyncio.sleep(0.05)
+    assert service.builds == builds
+    await service.aclose()
+
+
+@pytest.mark.anyio
+async def test_missing_series_is_built_inline():
+    service = CountingService(FakeCache())
+    series = await service.get_value_series({"AAA": 1, "BBB": 0})
+    assert series.values.tolist() == SERIES["values"]
+    assert service.builds == 1
+    assert await service.get_value_series({"AAA": 0}) is None
@@ -0,0 +1,194 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.quant_service import QuantService, _xirr_bisect, _xnpv
+
+q = QuantService
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    prices = 100 * np.cumprod(1 + rng.normal(0.0005, 0.015, (300, 4)), axis=0)
+    prices[:20, 2] = np.nan  # Listed later
+    prices[150, 1] = np.nan  # Missing bar
+    return prices
+
+
+@pytest.fixture
+def benchmark():
+    rng = np.random.default_rng(8)
+    return 100 * np.cumprod(1 + rng.normal(0.0004, 0.01, 300))
+
+
+def columns(matrix):
+    return [matrix[:, i] for i in range(matrix.shape[1])]
+
+
+def test_returns_mask_missing_prices(prices):
+    returns = q.calculate_returns(prices)
+    assert returns.shape == (299, 4)
+    assert np.isnan(returns[:20, 2]).all() and np.isfinite(returns[20:, 2]).all()
+    assert np.isnan(returns[149:151, 1]).all()
+    np.testing.assert_allclose(returns[:, 0], prices[1:, 0] / prices[:-1, 0] - 1)
+    assert np.isnan(q.calculate_returns([0.0, 1.0])[0])  # After a zero price
+
+
+def test_matrix_results_match_each_column(prices, benchmark):
+    returns = q.calculate_returns(prices)
+    bench = q.calculate_returns(benchmark)
+    for method, args in (
+        (q.calculate_volatility, ()),
+        (q.calculate_sharpe_ratio, ()),
+        (q.calculate_sortino_ratio, ()),
+        (q.calculate_var, (1000.0,)),
+    ):
+        matrix = method(returns, *args)
+        assert matrix == pytest.approx([method(column, *args) for column in columns(returns)])
+
+    assert q.calculate_max_drawdown(prices) == pytest.approx(
+        [q.calculate_max_drawdown(column) for column in columns(prices)]
+    )
+    assert q.calculate_beta(returns, bench) == pytest.approx(
+        [q.calculate_beta(column, bench) for column in columns(returns)]
+    )
+
+
+def test_scalar_kernels_match_reference_formulas(prices, benchmark):
+    series = prices[:, 0]
+    returns = q.calculate_returns(series)
+    bench = q.calculate_returns(benchmark)
+
+    assert q.calculate_volatility(returns) == pytest.approx(np.std(returns) * np.sqrt(252))
+    sharpe = (returns.mean() - 0.03 / 252) * 252 / (np.std(returns) * np.sqrt(252))
+    assert q.calculate_sharpe_ratio(returns) == pytest.approx(sharpe)
+    assert q.calculate_var(returns, 1000.0) == pytest.approx(abs(np.percentile(returns, 5)) * 1000)
+
+    # Least-squares slope
+    beta = np.cov(returns, bench)[0, 1] / np.var(bench, ddof=1)
+    assert q.calculate_beta(returns, bench) == pytest.approx(beta)
+
+
+def test_max_drawdown():
+    assert q.calculate_max_drawdown([100, 120, 90, 130, 65]) == pytest.approx(0.5)
+    assert q.calculate_max_drawdown([1, 2, 3]) == 0.0
+    assert q.calculate_max_drawdown([]) == 0.0
+
+
+def test_beta_uses_pairwise_observations():
+    rng = np.random.default_rng(3)
+    bench = rng.normal(0, 0.01, 100)
+    returns = 1.5 * bench + rng.normal(0, 0.001, 100)
+    gappy = returns.copy()
+    gappy[10:20] = np.nan
+    keep = np.isfinite(gappy)
+    assert q.calculate_beta(gappy, bench) == pytest.approx(q.calculate_beta(returns[keep], bench[keep]))
+    assert q.calculate_beta([0.01], [0.02]) == 1.0
+
+
+def test_twr_and_period_returns():
+    values = np.array([100.0, 110.0, 220.0, 200.0])
+    flows = np.array([0.0, 0.0, 100.0, 0.0])
+    expected = np.array([0.1, (220 - 110 - 100) / (110 + 50), (200 - 220) / 220])
+    np.testing.assert_allclose(q.calculate_period_returns(values, flows), expected)
+    assert q.calculate_twr(values, {2: 100.0}) == pytest.approx(np.prod(1 + expected) - 1)
+    assert q.calculate_twr(np.column_stack([values, values]), flows) == pytest.approx([np.prod(1 + expected) - 1] * 2)
+
+
+@pytest.mark.parametrize("window", [5, 30])
+def test_rolling_kernels_match_pandas(prices, benchmark, window):
+    returns = q.calculate_returns(prices)
+    bench = q.calculate_returns(benchmark)
+    frame = pd.DataFrame(returns)
+    bench_series = pd.Series(bench)
+
+    volatility = frame.rolling(window).std(ddof=0) * np.sqrt(252)
+    np.testing.assert_allclose(q.calculate_rolling_volatility(returns, window), volatility, rtol=1e-6, atol=1e-12)
+
+    sharpe = (frame.rolling(window).mean() - 0.03 / 252) * 252 / (frame.rolling(window).std(ddof=0) * np.sqrt(252))
+    np.testing.assert_allclose(q.calculate_rolling_sharpe(returns, window), sharpe, rtol=1e-6, atol=1e-9)
+
+    beta = frame.apply(lambda c: c.rolling(window).cov(bench_series, ddof=0) / bench_series.where(c.notna()).rolling(window).var(ddof=0))
+    np.testing.assert_allclose(q.calculate_rolling_beta(returns, bench, window), beta, rtol=1e-6, atol=1e-9)
+
+    correlation = frame.apply(lambda c: c.rolling(window).corr(bench_series))
+    np.testing.assert_allclose(q.calculate_rolling_correlation(returns, bench, window), correlation, rtol=1e-6, atol=1e-9)
+
+    drawdown = 1 - pd.DataFrame(prices) / pd.DataFrame(prices).rolling(window, min_periods=1).max()
+    np.testing.assert_allclose(q.calculate_rolling_drawdown(prices, window), drawdown, rtol=1e-9, atol=1e-12)
+
+
+def test_rolling_with_several_windows(prices):
+    returns = q.calculate_returns(prices)
+    by_window = q.calculate_rolling_volatility(returns, [5, 30])
+    assert set(by_window) == {5, 30}
+    np.testing.assert_array_equal(by_window[30], q.calculate_rolling_volatility(returns, 30))
+    assert np.isnan(by_window[30][:29]).all()
+
+
+def test_last_rolling_beta_matches_beta_on_that_window(prices, benchmark):
+    returns = q.calculate_returns(prices)
+    bench = q.calculate_returns(benchmark)
+    rolling = q.calculate_rolling_beta(returns, bench, 60)
+    np.testing.assert_allclose(rolling[-1], q.calculate_beta(returns[-60:], bench[-60:]), rtol=1e-9)
+
+
+@pytest.mark.parametrize("window", [0, -5, 2.5, [30, 0]])
+def test_rolling_rejects_invalid_windows(prices, window):
+    returns = q.calculate_returns(prices)
+    with pytest.raises(ValueError, match="Rolling window must be a positive integer"):
+        q.calculate_rolling_volatility(returns, window)
+    with pytest.raises(ValueError, match="Rolling window must be a positive integer"):
+        q.calculate_rolling_drawdown(prices, window)
+
+
+def flows_on(start: date, *pairs):
+    return [(start + timedelta(days=days), amount) for days, amount in pairs]
+
+
+def test_xirr_known_rate():
+    flows = flows_on(date(2023, 1, 1), (0, -1000.0), (365, 1100.0))
+    assert q.calculate_xirr(flows) == pytest.approx(0.1)
+
+
+def test_xirr_edge_cases():
+    assert q.calculate_xirr([]) == 0.0
+    assert q.calculate_xirr(flows_on(date(2023, 1, 1), (0, -100.0))) == 0.0
+    # No sign change: no IRR
+    assert q.calculate_xirr(flows_on(date(2023, 1, 1), (0, -100.0), (30, -50.0))) is None
+
+
+def test_xirr_batch_matches_single_sets():
+    rng = np.random.default_rng(11)
+    start = date(2015, 1, 1)
+    sets = []
+    for _ in range(20):
+        count = int(rng.integers(2, 40))
+        days = np.sort(rng.integers(0, 3000, count - 1))
+        amounts = -rng.uniform(100, 1000, count - 1)
+        pairs = list(zip(days.tolist(), amounts.tolist())) + [(3000, -amounts.sum() * rng.uniform(0.5, 2.5))]
+        sets.append(flows_on(start, *pairs))
+    sets.append(flows_on(start, (0, -100.0)))
+
+    batch = q.calculate_xirr_batch(sets)
+    assert batch == pytest.approx([q.calculate_xirr(flows) for flows in sets])
+    for flows, rate in zip(sets[:-1], batch):
+        years = np.array([(d - start).days for d, _ in flows]) / 365.0
+        amounts = np.array([a for _, a in flows])
+        years -= years.min()
+        assert abs(_xnpv(rate, years, amounts)) < 1e-6 * np.abs(amounts).sum()
+
+
+def test_xirr_bisection_fallback():
+    # Two IRRs (~10.3% and ~19.3%); the scan brackets the lower one
+    years = np.array([0.0, 366 / 365, 731 / 365])
+    amounts = np.array([-100.0, 230.0, -132.0])
+    rate = _xirr_bisect(years, amounts, np.abs(amounts).sum())
+    assert rate == pytest.approx(0.103, abs=1e-3)
+    assert abs(_xnpv(rate, years, amounts)) < 1e-6 * np.abs(amounts).sum()
+
+    # No sign change anywhere on the grid
+    assert _xirr_bisect(years, np.array([-100.0, -50.0, -10.0]), 160.0) is None
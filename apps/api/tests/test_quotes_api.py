@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import quotes
+from app.api.dependencies import get_quote_feed
+
+
+class FakeSubscription:
+    def __init__(self):
+        self.tickers = set()
+        self.closed = False
+        self._queue = asyncio.Queue()
+
+    async def __aiter__(self):
+        while True:
+            yield await self._queue.get()
+
+    async def add(self, tickers):
+        for ticker in tickers:
+            if ticker not in self.tickers:
+                self.tickers.add(ticker)
+                self._queue.put_nowait({"ticker": ticker})
+
+    def remove(self, tickers):
+        self.tickers.difference_update(tickers)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeFeed:
+    max_tickers = 2
+
+    def __init__(self):
+        self.subscriptions = []
+
+    def subscribe(self):
+        self.subscriptions.append(FakeSubscription())
+        return self.subscriptions[-1]
+
+
+@pytest.fixture
+def feed():
+    return FakeFeed()
+
+
+@pytest.fixture
+def client(feed):
+    app = FastAPI()
+    app.include_router(quotes.router, prefix="/api/quotes")
+    app.dependency_overrides[get_quote_feed] = lambda: feed
+    return TestClient(app)
+
+
+def test_subscribe_pushes_quotes(client, feed):
+    with client.websocket_connect("/api/quotes/ws") as socket:
+        socket.send_json({"action": "subscribe", "tickers": ["AAA"]})
+        assert socket.receive_json() == {"event": "quote", "data": {"ticker": "AAA"}}
+    assert feed.subscriptions[0].closed
+
+
+@pytest.mark.parametrize("message", [
+    ["AAA"],
+    "subscribe",
+    {"action": "watch", "tickers": ["AAA"]},
+    {"action": "subscribe", "tickers": "AAA"},
+    {"action": "subscribe", "tickers": [1]},
+])
+def test_malformed_messages_get_an_error_frame(client, message):
+    with client.websocket_connect("/api/quotes/ws") as socket:
+        socket.send_json(message)
+        assert socket.receive_json()["event"] == "error"
+
+        # The connection stays usable
+        socket.send_json({"action": "subscribe", "tickers": ["AAA"]})
+        assert socket.receive_json()["event"] == "quote"
+
+
+def test_subscriptions_are_capped(client, feed):
+    with client.websocket_connect("/api/quotes/ws") as socket:
+        socket.send_json({"action": "subscribe", "tickers": ["AAA", "BBB"]})
+        socket.receive_json()
+        socket.receive_json()
+
+        socket.send_json({"action": "subscribe", "tickers": ["CCC"]})
+        assert socket.receive_json() == {"event": "error", "data": {"error": "At most 2 tickers per connection"}}
+        assert feed.subscriptions[0].tickers == {"AAA", "BBB"}
+
+        socket.send_json({"action": "unsubscribe", "tickers": ["AAA"]})
+        socket.send_json({"action": "subscribe", "tickers": ["CCC"]})
+        assert socket.receive_json() == {"event": "quote", "data": {"ticker": "CCC"}}
+
+
+def test_sse_stream_rejects_too_many_tickers(client):
+    response = client.get("/api/quotes/stream", params={"tickers": "AAA,BBB,CCC"})
+    assert response.status_code == 400
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from app.services.cache_service import CacheService
+from app.services.replay_service import ReplayCheckpoint, ReplayService, TransactionLog, replay_cost_basis
+
+TRANSACTIONS = [
+    {"ticker": "AAA", "type": "BUY", "date": "2024-01-02", "quantity": 10, "price": 100, "fees": 1},
+    {"ticker": "BBB", "type": "BUY", "date": "2024-01-03", "quantity": 5, "price": 50},
+    {"ticker": "AAA", "type": "BUY", "date": "2024-01-10", "quantity": 10, "price": 120, "fees": 1},
+    {"ticker": "AAA", "type": "SELL", "date": "2024-02-01", "quantity": 5, "price": 130, "fees": 2},
+    {"ticker": "BBB", "type": "DIVIDEND", "date": "2024-02-15", "quantity": 5, "price": 0.5},
+    {"ticker": "", "type": "FEE", "date": "2024-03-01", "fees": 3},
+    {"ticker": "", "type": "DEPOSIT", "date": "2024-03-01", "quantity": 1000, "price": 1},
+    {"ticker": "BBB", "type": "SELL", "date": "2024-03-05", "quantity": 5, "price": 60},
+]
+
+
+def test_average_cost_accounting():
+    checkpoint = replay_cost_basis(TransactionLog(TRANSACTIONS), ReplayCheckpoint())
+
+    # AAA: 20 shares for 2202 including fees; selling 5 releases a quarter of the cost
+    aaa_cost = 1001 + 1201
+    released = aaa_cost * 5 / 20
+    assert checkpoint.shares == {"AAA": 15, "BBB": 0}
+    assert checkpoint.cost["AAA"] == pytest.approx(aaa_cost - released)
+    assert checkpoint.cost["BBB"] == pytest.approx(0)
+
+    realized = (5 * 130 - 2 - released) + 2.5 - 3 + (5 * 60 - 250)
+    assert checkpoint.realized == pytest.approx(realized)
+    assert checkpoint.basis_after[-1] == pytest.approx(aaa_cost - released)
+    assert len(checkpoint.basis_after) == len(checkpoint.realized_after) == len(TRANSACTIONS)
+
+
+@pytest.mark.parametrize("split", [0, 1, 3, 5, 8])
+def test_replay_from_a_checkpoint_matches_a_full_replay(split):
+    full = replay_cost_basis(TransactionLog(TRANSACTIONS), ReplayCheckpoint())
+
+    prefix = replay_cost_basis(TransactionLog(TRANSACTIONS[:split]), ReplayCheckpoint())
+    # Through the cache format
+    restored = ReplayCheckpoint.from_dict(prefix.to_dict())
+    resumed = replay_cost_basis(TransactionLog(TRANSACTIONS), restored)
+
+    assert resumed.count == full.count and resumed.fingerprint == full.fingerprint
+    assert resumed.shares == pytest.approx(full.shares)
+    assert resumed.cost == pytest.approx(full.cost)
+    assert resumed.realized == pytest.approx(full.realized)
+    assert resumed.basis_after == pytest.approx(full.basis_after)
+    assert resumed.realized_after == pytest.approx(full.realized_after)
+
+
+def test_fingerprint_covers_the_prefix_only():
+    log = TransactionLog(TRANSACTIONS)
+    later = TransactionLog(TRANSACTIONS + [
+        {"ticker": "CCC", "type": "BUY", "date": "2024-04-01", "quantity": 1, "price": 10},
+    ])
+    assert later.fingerprint(len(log)) == log.fingerprint(len(log))
+    assert later.fingerprint(len(later)) != log.fingerprint(len(log))
+
+    # Input order does not matter
+    assert TransactionLog(TRANSACTIONS[::-1]).fingerprint(len(log)) == log.fingerprint(len(log))
+
+    edited = [dict(t) for t in TRANSACTIONS]
+    edited[0]["price"] = 101
+    assert TransactionLog(edited).fingerprint(3) != log.fingerprint(3)
+
+
+def test_cash_flow_signs():
+    flows = TransactionLog(TRANSACTIONS).cash_flows()
+    # BUY in, SELL and DIVIDEND out, FEE in, DEPOSIT ignored
+    np.testing.assert_allclose(flows, [1001, 250, 1201, 0 - (650 - 2), -2.5, 3, 0, -300])
+
+
+@pytest.mark.anyio
+async def test_checkpoint_is_reused_only_while_it_is_a_prefix(redis_client):
+    cache = CacheService(redis_client)
+    service = ReplayService(None, cache)
+    log = TransactionLog(TRANSACTIONS[:4])
+    await cache.set_replay_checkpoint("p", replay_cost_basis(log, ReplayCheckpoint()).to_dict())
+
+    extended = TransactionLog(TRANSACTIONS)
+    assert (await service._load_checkpoint(extended, "p")).count == 4
+
+    edited = [dict(t) for t in TRANSACTIONS]
+    edited[1]["quantity"] = 6
+    assert (await service._load_checkpoint(TransactionLog(edited), "p")).count == 0
+    assert (await service._load_checkpoint(TransactionLog(TRANSACTIONS[:3]), "p")).count == 0
+    assert (await service._load_checkpoint(extended, None)).count == 0
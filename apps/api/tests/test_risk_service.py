@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from app.services import covariance, risk_service
+from app.services.covariance import CovarianceEstimate, ledoit_wolf
+from app.services.risk_service import monte_carlo_var, parametric_var
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(5)
+    factor = rng.normal(0, 0.01, (250, 1))
+    return factor + rng.normal(0, 0.008, (250, 6))
+
+
+@pytest.fixture
+def portfolio(returns):
+    values = np.array([1000.0, 2500.0, 500.0, 4000.0, 1500.0, 500.0])
+    cov, _ = ledoit_wolf(returns)
+    return values, returns.mean(axis=0), cov
+
+
+def test_ledoit_wolf_matches_the_per_observation_formula(returns):
+    cov, shrinkage = ledoit_wolf(returns)
+
+    t, n = returns.shape
+    x = returns - returns.mean(axis=0)
+    sample = x.T @ x / t
+    target = np.trace(sample) / n * np.eye(n)
+    d2 = np.sum((sample - target) ** 2) / n
+    b2 = sum(np.sum((np.outer(row, row) - sample) ** 2) for row in x) / (t * t * n)
+    expected = min(b2, d2) / d2
+
+    assert shrinkage == pytest.approx(expected)
+    np.testing.assert_allclose(cov, expected * target + (1 - expected) * sample)
+    np.testing.assert_allclose(cov, cov.T)
+    assert np.linalg.eigvalsh(cov).min() > 0
+
+
+def test_ledoit_wolf_of_constant_returns():
+    cov, shrinkage = ledoit_wolf(np.ones((10, 3)))
+    assert shrinkage == 0.0
+    np.testing.assert_array_equal(cov, np.zeros((3, 3)))
+
+
+@pytest.mark.parametrize("dof", [None, 5.0])
+def test_monte_carlo_var_does_not_depend_on_the_chunk_size(monkeypatch, portfolio, dof):
+    values, mean, cov = portfolio
+    results = []
+    for chunk_elements in (6, 600, 60_000, 10_000_000):
+        monkeypatch.setattr(risk_service, "MC_CHUNK_ELEMENTS", chunk_elements)
+        results.append(monte_carlo_var(values, mean, cov, paths=20_000, seed=3, dof=dof))
+    # Same draws whatever the chunking; only BLAS rounding may differ
+    for result in results[1:]:
+        assert result == pytest.approx(results[0], rel=1e-12)
+
+
+def test_monte_carlo_var_depends_on_the_seed(portfolio):
+    values, mean, cov = portfolio
+    assert monte_carlo_var(values, mean, cov, paths=5_000, seed=1) != monte_carlo_var(values, mean, cov, paths=5_000, seed=2)
+
+
+def test_monte_carlo_var_converges_to_parametric_var(portfolio):
+    values, mean, cov = portfolio
+    simulated = monte_carlo_var(values, mean, cov, paths=200_000, seed=9)
+    # Small daily returns: log-normal revaluation is close to the normal model
+    parametric = parametric_var(values, mean, cov)
+    assert simulated["var"] == pytest.approx(parametric["var"], rel=0.03)
+    assert simulated["cvar"] == pytest.approx(parametric["cvar"], rel=0.03)
+    assert simulated["cvar"] > simulated["var"] > 0
+
+
+def test_parametric_components_sum_to_var(portfolio):
+    values, mean, cov = portfolio
+    result = parametric_var(values, mean, cov, confidence=0.99, horizon_days=10)
+    assert result["component"].sum() == pytest.approx(result["var"])
+    assert result["volatility"] == pytest.approx(np.sqrt(values @ cov @ values * 10))
+
+
+def test_covariance_encode_decode_round_trip(portfolio):
+    _, mean, cov = portfolio
+    tickers = [f"T{i}" for i in range(len(mean))]
+    estimate = CovarianceEstimate(tickers, mean, cov, 250, 0.25, 19_800)
+    decoded, fresh_until = covariance.decode(covariance.encode(estimate, fresh_until=99.0))
+
+    assert fresh_until == 99.0
+    assert decoded.tickers == tickers
+    assert (decoded.observations, decoded.shrinkage, decoded.as_of) == (250, 0.25, 19_800)
+    np.testing.assert_array_equal(decoded.cov, cov)
+    sub_mean, sub_cov = decoded.subset(["T3", "T1"])
+    np.testing.assert_array_equal(sub_mean, mean[[3, 1]])
+    np.testing.assert_array_equal(sub_cov, cov[np.ix_([3, 1], [3, 1])])
@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+class Upstream:
+    """Counts calls; each call waits until released"""
+
+    def __init__(self, result="value"):
+        self.calls = 0
+        self.result = result
+        self.release = asyncio.Event()
+
+    async def fetch(self):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+async def test_concurrent_callers_share_one_fetch():
+    flight = SingleFlight()
+    upstream = Upstream()
+    callers = [asyncio.create_task(flight.do("k", upstream.fetch)) for _ in range(10)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+
+    assert await asyncio.gather(*callers) == ["value"] * 10
+    assert upstream.calls == 1
+    assert not flight._inflight
+
+
+async def test_error_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight()
+    upstream = Upstream(result=RuntimeError("down"))
+    callers = [asyncio.create_task(flight.do("k", upstream.fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    # The next call fetches again
+    upstream.result = "recovered"
+    assert await flight.do("k", upstream.fetch) == "recovered"
+    assert upstream.calls == 2
+
+
+async def test_waiter_takes_over_when_the_leader_is_cancelled():
+    flight = SingleFlight()
+    upstream = Upstream()
+    leader = asyncio.create_task(flight.do("k", upstream.fetch))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flight.do("k", upstream.fetch))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    upstream.release.set()
+    assert await waiter == "value"
+    assert upstream.calls == 2
+
+
+async def test_redis_lock_makes_other_workers_wait_for_the_cache(redis_client):
+    # Two processes: separate in-flight maps, one Redis
+    worker_a = SingleFlight(redis_client, lock_ttl_ms=5000, poll_interval=0.01)
+    worker_b = SingleFlight(redis_client, lock_ttl_ms=5000, poll_interval=0.01)
+    upstream = Upstream()
+    cache = {}
+
+    async def fetch():
+        cache["k"] = await upstream.fetch()
+        return cache["k"]
+
+    async def read_cached():
+        return cache.get("k")
+
+    a = asyncio.create_task(worker_a.do("k", fetch, read_cached))
+    await asyncio.sleep(0.02)
+    b = asyncio.create_task(worker_b.do("k", fetch, read_cached))
+    await asyncio.sleep(0.05)
+    assert upstream.calls == 1
+    upstream.release.set()
+
+    assert await asyncio.gather(a, b) == ["value", "value"]
+    assert upstream.calls == 1
+    assert await redis_client.get("lock:k") is None
+
+
+async def test_waiter_fetches_itself_after_the_wait_timeout(redis_client):
+    flight = SingleFlight(redis_client, lock_ttl_ms=5000, poll_interval=0.01, wait_timeout=0.05)
+    await redis_client.set("lock:k", "someone-else", px=5000)
+
+    async def fetch():
+        return "fetched"
+
+    async def read_cached():
+        return None
+
+    assert await flight.do("k", fetch, read_cached) == "fetched"
+    # The lock of the other worker is left alone
+    assert await redis_client.get("lock:k") == b"someone-else"
+
+
+async def test_refresh_is_skipped_while_the_key_is_in_flight(redis_client):
+    flight = SingleFlight(redis_client)
+    upstream = Upstream()
+    leader = asyncio.create_task(flight.do("k", upstream.fetch))
+    await asyncio.sleep(0)
+
+    assert await flight.refresh("k", upstream.fetch) is None
+    upstream.release.set()
+    await leader
+    assert upstream.calls == 1
+
+
+async def test_refresh_is_skipped_while_another_worker_holds_the_lock(redis_client):
+    flight = SingleFlight(redis_client)
+    await redis_client.set("lock:k", "someone-else", px=5000)
+    upstream = Upstream()
+    upstream.release.set()
+
+    assert await flight.refresh("k", upstream.fetch) is None
+    assert upstream.calls == 0
+
+    await redis_client.delete("lock:k")
+    assert await flight.refresh("k", upstream.fetch) == "value"
+    assert await redis_client.get("lock:k") is None
+
+
+async def test_claim_and_resolve():
+    flight = SingleFlight()
+    owned, pending = flight.claim(["a", "b"])
+    assert owned == ["a", "b"] and pending == {}
+
+    owned, pending = flight.claim(["b", "c"])
+    assert owned == ["c"] and list(pending) == ["b"]
+
+    flight.resolve("b", 2)
+    assert await pending["b"] == 2
+    for key in ("a", "c"):
+        flight.resolve(key, None)
+    assert not flight._inflight
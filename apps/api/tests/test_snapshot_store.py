@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+from app.services.replay_service import HoldingsHistory
+from app.services.snapshot_store import SnapshotStore, build_snapshots, period_start
+
+pytestmark = pytest.mark.anyio
+
+# Monday 2024-01-01, as days since the epoch
+MONDAY = 19723
+
+
+def make_history(values, flows=None, first_day=MONDAY) -> HoldingsHistory:
+    """One-ticker history over consecutive calendar days"""
+    values = np.asarray(values, dtype=np.float64)
+    flows = np.zeros(len(values)) if flows is None else np.array(flows, dtype=np.float64)
+    flows[0] = flows[0] or values[0]
+    days = first_day + np.arange(len(values), dtype=np.int64)
+    positions = values[:, None]
+    cost_basis = np.cumsum(flows)
+    return HoldingsHistory(days, ["AAA"], positions / 10, positions, cost_basis, flows, np.zeros(len(values)))
+
+
+def prices(n: int, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 1000 * np.cumprod(1 + rng.normal(0.001, 0.01, n))
+
+
+@pytest.fixture
+def store(executor):
+    store = SnapshotStore(":memory:", executor)
+    yield store
+    store.close()
+
+
+async def test_append_stores_every_row(store):
+    history = make_history(prices(40))
+    assert await store.append("p", build_snapshots(history)) == 40
+
+    rows = await store.query("p")
+    assert [row["day"] for row in rows] == history.days.tolist()
+    np.testing.assert_allclose([row["value"] for row in rows], history.value)
+    assert rows[0]["weights"] == {"AAA": 1.0}
+    assert await store.last_day("p") == int(history.days[-1])
+    assert await store.query("other") == []
+
+
+async def test_append_overwrites_only_the_last_stored_day(store):
+    values = prices(20)
+    await store.append("p", build_snapshots(make_history(values[:10])))
+
+    # Earlier rows differ but are left alone; the last stored day is replaced
+    revised = values.copy()
+    revised[:9] *= 2
+    revised[9] = values[9] + 5
+    assert await store.append("p", build_snapshots(make_history(revised))) == 11
+
+    stored = np.array([row["value"] for row in await store.query("p")])
+    np.testing.assert_allclose(stored[:9], values[:9])
+    np.testing.assert_allclose(stored[9:], revised[9:])
+
+
+async def test_append_without_new_days_rewrites_the_last_day(store):
+    values = prices(10)
+    await store.append("p", build_snapshots(make_history(values)))
+
+    values[-1] += 1
+    assert await store.append("p", build_snapshots(make_history(values))) == 1
+    rows = await store.query("p")
+    assert len(rows) == 10
+    assert rows[-1]["value"] == pytest.approx(values[-1])
+
+
+async def test_changed_from_rewrites_stored_rows(store):
+    values = prices(30)
+    await store.append("p", build_snapshots(make_history(values)))
+
+    # A back-dated transaction changes everything from day 12 on
+    revised = values.copy()
+    revised[12:] *= 1.1
+    changed_from = MONDAY + 12
+    assert await store.append("p", build_snapshots(make_history(revised)), changed_from=changed_from) == 18
+
+    stored = np.array([row["value"] for row in await store.query("p")])
+    np.testing.assert_allclose(stored, revised)
+
+
+async def test_rebuild_replaces_every_row(store):
+    await store.append("p", build_snapshots(make_history(prices(30))))
+    shorter = make_history(prices(10, seed=2), first_day=MONDAY + 5)
+    assert await store.append("p", build_snapshots(shorter), rebuild=True) == 10
+
+    rows = await store.query("p")
+    assert [row["day"] for row in rows] == shorter.days.tolist()
+
+
+async def test_query_between_days(store):
+    await store.append("p", build_snapshots(make_history(prices(30))))
+    rows = await store.query("p", start=MONDAY + 3, end=MONDAY + 6)
+    assert [row["day"] for row in rows] == list(range(MONDAY + 3, MONDAY + 7))
+
+
+@pytest.mark.parametrize("period", ["week", "month"])
+async def test_rollup_returns_chain_to_the_daily_index(store, period):
+    history = make_history(prices(75))
+    snapshots = build_snapshots(history)
+    await store.append("p", snapshots)
+
+    rollups = await store.query("p", granularity=period)
+    starts = period_start(history.days, period)
+    assert [row["start_day"] for row in rollups] == np.unique(starts).tolist()
+
+    twr = snapshots["twr_index"]
+    previous_close, previous_index = history.value[0], 1.0
+    for row in rollups:
+        in_period = starts == row["start_day"]
+        last = np.flatnonzero(in_period)[-1]
+        assert row["end_day"] == history.days[last]
+        assert row["open"] == pytest.approx(previous_close)
+        assert row["close"] == pytest.approx(history.value[last])
+        assert row["high"] == pytest.approx(history.value[in_period].max())
+        assert row["low"] == pytest.approx(history.value[in_period].min())
+        assert row["period_return"] == pytest.approx(twr[last] / previous_index - 1)
+        previous_close, previous_index = history.value[last], twr[last]
+
+    # Compounding the period returns gives the total time-weighted return
+    total = np.prod([1 + row["period_return"] for row in rollups]) - 1
+    assert total == pytest.approx(twr[-1] - 1)
+
+
+async def test_incremental_rollups_match_a_full_build(store):
+    values = prices(75)
+    flows = np.zeros(75)
+    flows[[20, 41]] = [500.0, -300.0]
+    full = build_snapshots(make_history(values, flows))
+
+    # Day by day, each append seeing the history up to that day
+    for end in (10, 11, 26, 40, 58, 75):
+        await store.append("inc", build_snapshots(make_history(values[:end], flows[:end])))
+    await store.append("full", full)
+
+    for period in ("week", "month"):
+        incremental = await store.query("inc", granularity=period)
+        rebuilt = await store.query("full", granularity=period)
+        assert len(incremental) == len(rebuilt)
+        for a, b in zip(incremental, rebuilt):
+            assert a == pytest.approx(b)
+
+
+async def test_held_tickers(store):
+    await store.append("p", build_snapshots(make_history(prices(5))))
+    assert await store.held_tickers() == ["AAA"]